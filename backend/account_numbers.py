@@ -0,0 +1,80 @@
+import os
+import threading
+from sqlalchemy.exc import IntegrityError
+from config import LocalSession
+from dal import SequenceDao
+
+# Numéros de compte : 10 chiffres issus de la séquence t_sequences + 1 chiffre de contrôle Luhn.
+# Les anciens numéros (10 chiffres aléatoires, sans clé) restent valides.
+ACCOUNT_NUMBER_SEQUENCE = "account_number"
+ACCOUNT_NUMBER_PAYLOAD_LENGTH = 10
+LEGACY_ACCOUNT_NUMBER_LENGTH = 10
+# Numéros réservés par processus à chaque passage en base
+ACCOUNT_NUMBER_BLOCK = int(os.getenv("ACCOUNT_NUMBER_BLOCK", "100"))
+
+
+def luhn_check_digit(payload: str) -> str:
+    total = 0
+    for position, char in enumerate(reversed(payload)):
+        digit = int(char)
+        if position % 2 == 0:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return str((10 - total % 10) % 10)
+
+
+def with_check_digit(value: int) -> str:
+    payload = f"{value:0{ACCOUNT_NUMBER_PAYLOAD_LENGTH}d}"
+    return payload + luhn_check_digit(payload)
+
+
+def is_valid_account_number(account_number: str) -> bool:
+    """Contrôle de forme sans base : ancien format à 10 chiffres, ou 11 chiffres avec clé Luhn correcte."""
+    if not account_number.isascii() or not account_number.isdigit():
+        return False
+    if len(account_number) == LEGACY_ACCOUNT_NUMBER_LENGTH:
+        return True
+    return (
+        len(account_number) == ACCOUNT_NUMBER_PAYLOAD_LENGTH + 1
+        and luhn_check_digit(account_number[:-1]) == account_number[-1]
+    )
+
+
+class AccountNumberAllocator:
+    """
+    Distribue les numéros d'un bloc réservé dans t_sequences : une requête par bloc au lieu
+    d'un tirage aléatoire suivi d'un SELECT par tentative. Les numéros d'un bloc non utilisé
+    (redémarrage) sont perdus : la séquence a des trous, jamais de doublons.
+    """
+    def __init__(self, block_size: int = ACCOUNT_NUMBER_BLOCK, sequence: str = ACCOUNT_NUMBER_SEQUENCE):
+        self.block_size = block_size
+        self.sequence = sequence
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _allocate_block(self) -> None:
+        # Transaction courte et séparée : le verrou sur la ligne de séquence n'attend pas la requête HTTP
+        for attempt in range(2):
+            try:
+                with LocalSession() as session:
+                    start = SequenceDao.allocate(session, self.sequence, self.block_size)
+                    session.commit()
+                break
+            except IntegrityError:
+                if attempt:
+                    raise
+        self._next, self._end = start, start + self.block_size
+
+    def next_number(self) -> str:
+        with self._lock:
+            if self._next >= self._end:
+                self._allocate_block()
+            value = self._next
+            self._next += 1
+        return with_check_digit(value)
+
+
+account_number_allocator = AccountNumberAllocator()
@@ -0,0 +1,123 @@
+"""
+Calcul des intérêts journaliers (Account.interest_rate, taux annuel en %), à lancer chaque nuit.
+
+Les comptes sont lus par blocs de colonnes (id, solde, taux), les intérêts calculés avec NumPy,
+puis chaque bloc est écrit en un UPDATE groupé et un INSERT groupé de transactions 'interest',
+validés avec le point de reprise : un traitement interrompu reprend après le dernier bloc validé
+et un traitement terminé n'est jamais rejoué pour la même date. Les dates se traitent dans l'ordre :
+une date antérieure au dernier traitement terminé est refusée (le point de reprise ne garde que lui).
+
+Les transactions sont datées de la fin du jour run_date, même lors d'un rattrapage : elles comptent
+dans le solde, les instantanés et les agrégats mensuels de ce jour. Un jour dont les instantanés
+sont déjà calculés (snapshot_balances.py) est refusé : lancer les intérêts avant les instantanés.
+
+Usage : python accrue_interest.py [--date AAAA-MM-JJ] [--chunk-size N] [--dry-run]
+"""
+import argparse
+import json
+import sys
+from datetime import date, datetime, time
+from typing import Dict, Optional
+import numpy as np
+from config import LocalSession
+from dal import AccountDao, JobCheckpointDao
+from services import SNAPSHOT_JOB, insert_movements
+
+INTEREST_JOB = "interest_accrual"
+INTEREST_CHUNK_SIZE = 10000
+# Convention exact/365 : intérêt du jour = solde x taux annuel / 365
+DAYS_PER_YEAR = 365
+
+
+def compute_accruals(balances: np.ndarray, rates: np.ndarray) -> np.ndarray:
+    """Intérêts du jour arrondis au centime inférieur (jamais de centime versé en trop)."""
+    daily = balances * rates / 100.0 / DAYS_PER_YEAR
+    # Marge contre les erreurs de représentation (0.29999... -> 0.30)
+    return np.floor(daily * 100.0 + 1e-6) / 100.0
+
+
+def _load_checkpoint(session) -> Optional[Dict]:
+    position = JobCheckpointDao.get(session, INTEREST_JOB)
+    return json.loads(position) if position else None
+
+
+def accrue_interest(run_date: date, chunk_size: int = INTEREST_CHUNK_SIZE, dry_run: bool = False) -> Dict:
+    """Applique les intérêts du jour run_date ; retourne les totaux du traitement."""
+    with LocalSession() as session:
+        checkpoint = _load_checkpoint(session)
+        snapshots_through = JobCheckpointDao.get(session, SNAPSHOT_JOB)
+    if snapshots_through and run_date.isoformat() <= snapshots_through:
+        raise ValueError(f"Instantanés des soldes déjà calculés jusqu'au {snapshots_through} : {run_date} refusé")
+    if checkpoint and checkpoint["run_date"] == run_date.isoformat():
+        if checkpoint["done"]:
+            print(f"Intérêts du {run_date} déjà appliqués")
+            return checkpoint
+    elif checkpoint and not checkpoint["done"]:
+        raise ValueError(f"Traitement du {checkpoint['run_date']} inachevé : le relancer avant le {run_date}")
+    elif checkpoint and run_date.isoformat() < checkpoint["run_date"]:
+        # Rien ne dit si cette date a déjà été créditée avant le dernier traitement
+        raise ValueError(f"Intérêts déjà appliqués jusqu'au {checkpoint['run_date']} : {run_date} refusé")
+    else:
+        checkpoint = None
+    # Dernière seconde du jour de valeur : les intérêts du jour suivent ses autres mouvements
+    value_time = datetime.combine(run_date, time(23, 59, 59))
+    # En simulation, même parcours mais aucune écriture ni point de reprise
+    state = checkpoint or {"run_date": run_date.isoformat(), "last_id": 0, "accounts": 0, "total": 0.0, "done": False}
+
+    while True:
+        with LocalSession() as session:
+            rows = AccountDao.get_interest_chunk(session, state["last_id"], chunk_size)
+            if not rows:
+                state["done"] = True
+                if not dry_run:
+                    JobCheckpointDao.set(session, INTEREST_JOB, json.dumps(state))
+                    session.commit()
+                return state
+            columns = np.array(rows, dtype=np.float64)
+            ids = columns[:, 0].astype(np.int64)
+            accruals = compute_accruals(columns[:, 1], columns[:, 2])
+            paid = accruals > 0
+            paid_ids = ids[paid].tolist()
+            paid_amounts = accruals[paid].tolist()
+            rates = columns[paid, 2].tolist()
+            state["last_id"] = int(ids[-1])
+            state["accounts"] += len(paid_ids)
+            state["total"] = round(state["total"] + float(accruals[paid].sum()), 2)
+            if dry_run:
+                continue
+            AccountDao.bulk_credit(session, [
+                {"b_id": account_id, "b_amount": amount} for account_id, amount in zip(paid_ids, paid_amounts)
+            ])
+            rows = [
+                {
+                    "account_id": account_id,
+                    "transaction_type": "interest",
+                    "amount": amount,
+                    "description": f"Interest {rate}% ({run_date})",
+                    "created_at": value_time,
+                }
+                for account_id, amount, rate in zip(paid_ids, paid_amounts, rates)
+            ]
+            insert_movements(session, rows)
+            JobCheckpointDao.set(session, INTEREST_JOB, json.dumps(state))
+            session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intérêts journaliers des comptes rémunérés")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today(), help="date de valeur (défaut : aujourd'hui)")
+    parser.add_argument("--chunk-size", type=int, default=INTEREST_CHUNK_SIZE, help="comptes par bloc")
+    parser.add_argument("--dry-run", action="store_true", help="calcule sans rien écrire")
+    args = parser.parse_args()
+    try:
+        result = accrue_interest(args.date, args.chunk_size, args.dry_run)
+        prefix = "[simulation] " if args.dry_run else ""
+        print(f"✅ {prefix}{result['accounts']} compte(s) crédité(s), {result['total']:.2f} d'intérêts")
+    except Exception as e:
+        print(f"❌ Erreur calcul des intérêts: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Archive froide de t_transactions : les mois clos anciens quittent la base pour des fichiers locaux
+(job archive_transactions.py), relus de façon transparente par TransactionService et BalanceService.
+
+ARCHIVE_DIR/transactions/
+  AAAA-MM.ndjson.gz   lignes JSON [id, created_at, transaction_type, amount, description], triées par
+                      (account_id, created_at, id), un membre gzip par compte : l'historique d'un compte
+                      se relit sans décompresser le reste du mois
+  AAAA-MM.index.json  {account_id: [offset, longueur, nombre, somme]} et bornes d'id du mois
+  manifest.json       {"horizon": "AAAA-MM-01", "months": [...]} : l'horizon est le premier mois servi
+                      par la base. Avant l'horizon tout se lit dans l'archive, à partir de l'horizon tout
+                      se lit en base : une requête sur l'historique récent n'ouvre aucun fichier.
+  forgotten.json      {"accounts": {account_id: "AAAA-MM-01"}} : comptes supprimés, leurs mois archivés
+                      avant cette date ne sont plus servis (écrit par la suppression du compte)
+
+ARCHIVE_DIR est obligatoire pour archiver : un chemin absolu sur un stockage persistant et partagé,
+monté sur chaque instance de l'API (volume). Les lignes archivées ne sont plus qu'ici ; un répertoire
+local au conteneur les perdrait au redéploiement et les autres instances ne les serviraient pas.
+Sans ARCHIVE_DIR, rien n'est archivé et tout l'historique est lu en base.
+
+Chaque fichier est écrit sous un nom temporaire puis renommé ; le manifeste n'est avancé qu'une fois
+le mois complet, et les lignes du mois ne sont supprimées de la base qu'ensuite. Les fichiers d'un mois
+ne sont jamais réécrits : les lignes archivées d'un compte supprimé y restent, masquées par forgotten.json
+même si l'id du compte est réattribué (les mois archivés ensuite n'ont que les lignes du nouveau compte).
+"""
+import fcntl
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from exports import dumps, loads
+
+# Pas de valeur par défaut : un répertoire relatif serait propre à chaque conteneur
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "")
+# Mois clos conservés en base avant archivage
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", "12"))
+# Segments (compte, mois) décodés gardés en mémoire : une pagination profonde relit le même segment
+ARCHIVE_CACHE_SEGMENTS = int(os.getenv("ARCHIVE_CACHE_SEGMENTS", "64"))
+
+ARCHIVE_COLUMNS = ("id", "created_at", "transaction_type", "amount", "description")
+
+# Mêmes champs (et même ordre) que TransactionResponse et les lignes projetées de la base
+ArchivedTransaction = namedtuple(
+    "ArchivedTransaction", ("id", "account_id", "transaction_type", "amount", "description", "created_at")
+)
+
+
+def _month_key(month: date) -> str:
+    return month.strftime("%Y-%m")
+
+
+def _replace(path: str, data: bytes) -> None:
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+class TransactionArchive:
+    """Lecture et écriture des mois archivés ; les index (immuables) sont gardés en mémoire."""
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[tuple, Dict]] = {}
+        self._indexes: Dict[date, Dict] = {}
+        self._segments: "OrderedDict[Tuple[date, int], Tuple[ArchivedTransaction, ...]]" = OrderedDict()
+
+    def check_directory(self) -> None:
+        """Refuse d'archiver sans répertoire absolu : les lignes supprimées de la base seraient perdues."""
+        if not self.directory or not os.path.isabs(self.directory):
+            raise ValueError(
+                f"ARCHIVE_DIR doit être un chemin absolu sur un volume partagé par les instances (actuel : {self.directory!r})"
+            )
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, "transactions", name)
+
+    def data_file(self, month: date) -> str:
+        return self._path(f"{_month_key(month)}.ndjson.gz")
+
+    def _load(self, name: str) -> Dict:
+        # Un stat par appel : un fichier republié par un autre processus est relu sans redémarrer les workers
+        if not self.directory:
+            # Archive non configurée : rien n'a été archivé par cette instance
+            return {}
+        path = self._path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return {}
+        # os.replace donne un nouvel inode à chaque publication
+        version = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._files.get(name)
+            if cached is None or cached[0] != version:
+                with open(path, "rb") as f:
+                    cached = (version, json.load(f))
+                self._files[name] = cached
+            return cached[1]
+
+    def _load_manifest(self) -> Dict:
+        return self._load("manifest.json")
+
+    def _forgotten(self, month: date, account_id: int) -> bool:
+        before = self._load("forgotten.json").get("accounts", {}).get(str(account_id))
+        return before is not None and month.isoformat() < before
+
+    def horizon(self) -> Optional[datetime]:
+        """Début du premier mois servi par la base ; None si rien n'est archivé."""
+        horizon = self._load_manifest().get("horizon")
+        return datetime.fromisoformat(horizon) if horizon else None
+
+    def months(self, first: Optional[date] = None, last: Optional[date] = None) -> List[date]:
+        """Mois archivés entre first et last inclus, du plus ancien au plus récent."""
+        return [
+            month for month in map(date.fromisoformat, self._load_manifest().get("months", []))
+            if (first is None or month >= first) and (last is None or month <= last)
+        ]
+
+    def index(self, month: date) -> Dict:
+        cached = self._indexes.get(month)
+        if cached is None:
+            with open(self._path(f"{_month_key(month)}.index.json"), "rb") as f:
+                cached = json.load(f)
+            self._indexes[month] = cached
+        return cached
+
+    def account_rows(self, month: date, account_id: int) -> Tuple[ArchivedTransaction, ...]:
+        """Transactions du compte pour le mois, par (created_at, id) croissant (tuple partagé, non modifiable)."""
+        if self._forgotten(month, account_id):
+            return ()
+        key = (month, account_id)
+        with self._lock:
+            rows = self._segments.get(key)
+            if rows is not None:
+                self._segments.move_to_end(key)
+                return rows
+        segment = self.index(month)["accounts"].get(str(account_id))
+        if segment is None:
+            return ()
+        offset, length = segment[0], segment[1]
+        with open(self.data_file(month), "rb") as f:
+            f.seek(offset)
+            data = gzip.decompress(f.read(length))
+        # Un seul décodage JSON pour tout le segment : les sauts de ligne ne séparent que les lignes
+        rows = tuple(
+            ArchivedTransaction(row_id, account_id, transaction_type, amount, description, datetime.fromisoformat(created_at))
+            for row_id, created_at, transaction_type, amount, description in loads(b"[" + b",".join(data.splitlines()) + b"]")
+        )
+        with self._lock:
+            self._segments[key] = rows
+            while len(self._segments) > ARCHIVE_CACHE_SEGMENTS:
+                self._segments.popitem(last=False)
+        return rows
+
+    def account_totals(self, month: date, account_id: int) -> Optional[Sequence[float]]:
+        """(nombre, somme) des transactions du compte pour le mois, lus dans l'index."""
+        if self._forgotten(month, account_id):
+            return None
+        segment = self.index(month)["accounts"].get(str(account_id))
+        return segment[2:] if segment else None
+
+    def sum_amounts(self, account_id: int, start: Optional[datetime], end: Optional[datetime]) -> float:
+        """Somme des montants archivés du compte avec start <= created_at < end (bornes facultatives)."""
+        total = 0.0
+        first = date(start.year, start.month, 1) if start else None
+        last = date(end.year, end.month, 1) if end else None
+        for month in self.months(first, last):
+            month_begin = datetime(month.year, month.month, 1)
+            month_end = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+            totals = self.account_totals(month, account_id)
+            if totals is None or (end is not None and end <= month_begin):
+                continue
+            if (start is None or start <= month_begin) and (end is None or end >= month_end):
+                # Mois entier dans l'intervalle : la somme de l'index suffit
+                total += totals[1]
+                continue
+            total += sum(
+                row.amount for row in self.account_rows(month, account_id)
+                if (start is None or row.created_at >= start) and (end is None or row.created_at < end)
+            )
+        return total
+
+    def write_month(self, month: date, chunks: Iterable[Sequence]) -> Dict:
+        """
+        Écrit le mois à partir de blocs de lignes (account_id, id, created_at, transaction_type, amount,
+        description) triées par (account_id, created_at, id). Retourne l'index écrit.
+        """
+        os.makedirs(self._path(""), exist_ok=True)
+        data_path = self.data_file(month)
+        accounts: Dict[str, List] = {}
+        count, min_id, max_id = 0, None, None
+        with open(data_path + ".tmp", "wb") as raw:
+            member, current = None, None
+            for chunk in chunks:
+                for row in chunk:
+                    if row.account_id != current:
+                        if member is not None:
+                            member.close()
+                            accounts[str(current)][1] = raw.tell() - accounts[str(current)][0]
+                        current = row.account_id
+                        accounts[str(current)] = [raw.tell(), 0, 0, 0.0]
+                        # mtime=0 : un mois réécrit après interruption donne le même fichier
+                        member = gzip.GzipFile(fileobj=raw, mode="wb", mtime=0)
+                    line = [row.id, row.created_at.isoformat(), row.transaction_type, row.amount, row.description]
+                    member.write(dumps(line) + b"\n")
+                    segment = accounts[str(current)]
+                    segment[2] += 1
+                    segment[3] += row.amount
+                    count += 1
+                    min_id = row.id if min_id is None else min(min_id, row.id)
+                    max_id = row.id if max_id is None else max(max_id, row.id)
+            if member is not None:
+                member.close()
+                accounts[str(current)][1] = raw.tell() - accounts[str(current)][0]
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(data_path + ".tmp", data_path)
+        index = {
+            "month": month.isoformat(),
+            "columns": list(ARCHIVE_COLUMNS),
+            "rows": count,
+            "min_id": min_id,
+            "max_id": max_id,
+            "accounts": accounts,
+        }
+        _replace(self._path(f"{_month_key(month)}.index.json"), json.dumps(index).encode())
+        with self._lock:
+            self._indexes.pop(month, None)
+            for key in [key for key in self._segments if key[0] == month]:
+                del self._segments[key]
+        return index
+
+    def set_horizon(self, horizon: date, months: List[date]) -> None:
+        """Publie les mois archivés : à partir de cet appel, les lectures avant horizon passent par l'archive."""
+        manifest = {"horizon": horizon.isoformat(), "months": [month.isoformat() for month in months]}
+        _replace(self._path("manifest.json"), json.dumps(manifest).encode())
+
+    def forget_accounts(self, account_ids: Iterable[int]) -> None:
+        """Masque les mois archivés des comptes supprimés (avant le mois en cours, seuls à contenir leurs lignes)."""
+        account_ids = list(account_ids)
+        if not account_ids or not self._load_manifest():
+            return
+        before = date.today().replace(day=1).isoformat()
+        path = self._path("forgotten.json")
+        # Plusieurs workers suppriment des comptes : lecture-modification-écriture sous verrou de fichier
+        with open(path + ".lock", "ab") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(path, "rb") as f:
+                    forgotten = json.load(f)
+            except FileNotFoundError:
+                forgotten = {"accounts": {}}
+            for account_id in account_ids:
+                forgotten["accounts"][str(account_id)] = max(forgotten["accounts"].get(str(account_id), before), before)
+            _replace(path, json.dumps(forgotten).encode())
+
+
+transaction_archive = TransactionArchive(ARCHIVE_DIR)
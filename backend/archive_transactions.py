@@ -0,0 +1,103 @@
+"""
+Archivage des mois clos de t_transactions dans ARCHIVE_DIR (format décrit dans archive.py), à lancer
+une fois par mois. Chaque mois antérieur aux N derniers mois clos est :
+  1. écrit dans son fichier et son index, lus en base par (account_id, created_at, id) ;
+  2. agrégé dans t_monthly_rollups pour ses comptes (plus calculable en base ensuite) ;
+  3. publié dans le manifeste : à partir de là, les lectures de ce mois passent par l'archive ;
+  4. supprimé de la base par lots, un commit par lot.
+Un job interrompu termine d'abord la suppression du dernier mois publié puis reprend au mois suivant.
+Les soldes de fin de journée doivent couvrir les mois archivés (snapshot_balances.py d'abord).
+ARCHIVE_DIR est obligatoire (chemin absolu sur un volume partagé) : sans lui, aucune ligne n'est supprimée.
+
+Usage : python archive_transactions.py [--months N] [--chunk-size N]
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from config import LocalSession
+from dal import TransactionDao, JobCheckpointDao
+from archive import transaction_archive, ARCHIVE_AFTER_MONTHS
+from services import AnalyticsService, SNAPSHOT_JOB, day_start, month_start, next_month
+
+ARCHIVE_CHUNK_SIZE = 20000
+
+
+def archive_cutoff(today: date, keep_months: int) -> date:
+    """Premier mois conservé en base : les keep_months derniers mois clos et le mois en cours restent."""
+    months = today.year * 12 + today.month - 1 - keep_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def delete_month(month: date, index: Dict, chunk_size: int) -> int:
+    """Supprime de la base les lignes du mois archivé, compte par compte ; retourne leur nombre."""
+    before = day_start(next_month(month))
+    total = 0
+    for account_id in map(int, index["accounts"]):
+        deleted = chunk_size
+        while deleted == chunk_size:
+            with LocalSession() as session:
+                deleted = TransactionDao.delete_oldest(session, account_id, chunk_size, before)
+                session.commit()
+            total += deleted
+    return total
+
+
+def archive_transactions(keep_months: int = ARCHIVE_AFTER_MONTHS, chunk_size: int = ARCHIVE_CHUNK_SIZE, today: Optional[date] = None) -> List[date]:
+    """Archive les mois antérieurs à archive_cutoff ; retourne les mois archivés par ce traitement."""
+    transaction_archive.check_directory()
+    cutoff = archive_cutoff(today or date.today(), keep_months)
+    archived = transaction_archive.months()
+    if archived:
+        # Suppression éventuellement interrompue du dernier mois publié
+        delete_month(archived[-1], transaction_archive.index(archived[-1]), chunk_size)
+    with LocalSession() as session:
+        first_day = TransactionDao.get_first_day(session)
+        position = JobCheckpointDao.get(session, SNAPSHOT_JOB)
+    if first_day is None:
+        return []
+    month = month_start(first_day)
+    horizon = transaction_archive.horizon()
+    if horizon is not None:
+        month = max(month, horizon.date())
+    watermark = date.fromisoformat(position) if position else None
+    done = []
+    while month < cutoff:
+        following = next_month(month)
+        if watermark is None or watermark < following - timedelta(days=1):
+            print(f"Soldes de fin de journée incomplets pour {month:%Y-%m} : lancer snapshot_balances.py")
+            break
+        with LocalSession() as session:
+            index = transaction_archive.write_month(
+                month, TransactionDao.iter_archive_chunks(session, day_start(month), day_start(following), chunk_size)
+            )
+        account_ids = list(map(int, index["accounts"]))
+        AnalyticsService().build_rollups(account_ids, month)
+        archived.append(month)
+        transaction_archive.set_horizon(following, archived)
+        deleted = delete_month(month, index, chunk_size)
+        size = os.path.getsize(transaction_archive.data_file(month))
+        print(f"Mois {month:%Y-%m} : {index['rows']} transactions, {len(account_ids)} comptes, "
+              f"{size / 1024:.0f} Ko, {deleted} lignes supprimées")
+        done.append(month)
+        month = following
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archivage des transactions des mois anciens")
+    parser.add_argument("--months", type=int, default=ARCHIVE_AFTER_MONTHS, help="mois clos conservés en base")
+    parser.add_argument("--chunk-size", type=int, default=ARCHIVE_CHUNK_SIZE, help="lignes lues ou supprimées par lot")
+    args = parser.parse_args()
+    try:
+        months = archive_transactions(args.months, args.chunk_size)
+        print(f"✅ {len(months)} mois archivé(s)")
+    except Exception as e:
+        print(f"❌ Erreur archivage des transactions: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,89 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import asyncio
+import hashlib
 import os
+import threading
 from dotenv import load_dotenv
+from cache import TTLCache
+from config import request_user_id
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Nombre de jetons vérifiés gardés en mémoire (0 = pas de cache)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Coût bcrypt : les hachages d'un autre coût sont mis à niveau à la connexion suivante
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Pool dédié au hachage : nombre de hachages simultanés et file d'attente au-delà de laquelle on répond 503.
+# Les routes sync attendent le résultat dans un thread du threadpool (40 par défaut) :
+# workers + file doit rester nettement en dessous pour laisser des threads aux autres routes.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", str(4 * PASSWORD_WORKERS)))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 security = HTTPBearer()
 
-def get_password_hash(password: str) -> str:
+def _truncate(password: str) -> str:
     # Encode en UTF-8 et tronque à 72 bytes si nécessaire
-    password_bytes = password.encode('utf-8')[:72]
-    return pwd_context.hash(password_bytes.decode('utf-8', errors='ignore'))
+    return password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
+
+def get_password_hash(password: str) -> str:
+    return pwd_context.hash(_truncate(password))
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    plain_password_bytes = plain_password.encode('utf-8')[:72]
-    return pwd_context.verify(plain_password_bytes.decode('utf-8', errors='ignore'), hashed_password)
+    return pwd_context.verify(_truncate(plain_password), hashed_password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Vérifie le mot de passe ; retourne aussi un nouveau hachage si le coût configuré a changé."""
+    return pwd_context.verify_and_update(_truncate(plain_password), hashed_password)
+
+
+class PasswordPoolSaturated(Exception):
+    """File d'attente du hachage pleine : la requête est refusée (503) au lieu d'attendre."""
+
+
+# bcrypt libère le GIL pendant le calcul : un pool de threads borné suffit, sans processus
+# à forker (ni connexions DB à dupliquer). Les threads des requêtes ne font plus qu'attendre.
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE_LIMIT)
+
+def configure_password_pool(workers: int, queue_limit: int) -> None:
+    """Remplace le pool de hachage (benchmarks, réglage au démarrage)."""
+    global _password_executor, _password_slots
+    previous = _password_executor
+    _password_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+    _password_slots = threading.BoundedSemaphore(workers + queue_limit)
+    previous.shutdown(wait=False)
+
+def _submit_password_task(func, *args) -> Future:
+    slots = _password_slots
+    if not slots.acquire(blocking=False):
+        raise PasswordPoolSaturated()
+    future = _password_executor.submit(func, *args)
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+def run_password_task(func, *args):
+    """Exécute func (get_password_hash, verify_password...) dans le pool de hachage et attend le résultat."""
+    return _submit_password_task(func, *args).result()
+
+async def arun_password_task(func, *args):
+    return await asyncio.wrap_future(_submit_password_task(func, *args))
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
@@ -47,8 +107,17 @@ def decode_access_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
-def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> int:
-    token = credentials.credentials
+# Jetons déjà vérifiés : empreinte SHA-256 du jeton -> user_id, jusqu'à l'exp du jeton
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE)
+
+def _token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+def invalidate_user_tokens(user_id: int) -> int:
+    """Oublie les jetons vérifiés d'un utilisateur (changement de mot de passe, suppression)."""
+    return token_cache.invalidate(lambda _, cached_user_id: cached_user_id == user_id)
+
+def _user_id_from_token(token: str) -> int:
     payload = decode_access_token(token)
     
     if not payload:
@@ -74,4 +143,41 @@ def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(secu
             detail="Token invalide"
         )
 
-    return user_id
\ No newline at end of file
+    # Seuls les jetons valides sont mis en cache, et jamais au-delà de leur expiration
+    if TOKEN_CACHE_SIZE and payload.get("exp"):
+        token_cache.set(_token_digest(token), user_id, expires_at=float(payload["exp"]))
+    return user_id
+
+def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> int:
+    token = credentials.credentials
+    if TOKEN_CACHE_SIZE:
+        user_id = token_cache.get(_token_digest(token), None)
+        if user_id is not None:
+            return user_id
+    return _user_id_from_token(token)
+
+class RequestUserMiddleware:
+    """
+    Middleware ASGI : expose l'utilisateur du jeton Bearer (s'il est valide) dans
+    config.request_user_id, pour la fenêtre read-your-writes du routage vers les réplicas.
+    L'authentification reste faite par get_current_user_id dans les routes.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        user_id = None
+        authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                user_id = get_current_user_id(HTTPAuthorizationCredentials(scheme=scheme, credentials=token))
+            except HTTPException:
+                pass
+        reset = request_user_id.set(user_id)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_user_id.reset(reset)
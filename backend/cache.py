@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Cache des métadonnées (metadata_cache.py) : memory (par processus), redis (partagé) ou none
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", "10000"))
+
+# Sentinelle : permet de mettre None en cache
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Cache LRU borné en mémoire, avec une date d'expiration par entrée (epoch, secondes).
+    Au-delà de maxsize, l'entrée la moins récemment utilisée est évincée.
+    Sûr entre threads (routes sync exécutées dans le threadpool).
+    """
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        if expires_at is None and self.ttl is not None:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Supprime les entrées pour lesquelles predicate(clé, valeur) est vrai ; retourne leur nombre."""
+        with self._lock:
+            keys = [key for key, (value, _) in self._entries.items() if predicate(key, value)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Backends du cache des métadonnées : valeurs str (JSON), interface get / set / delete.
+
+class NullBackend:
+    """Cache désactivé : toutes les lectures vont en base."""
+    def get(self, key: str) -> Optional[str]:
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        pass
+
+    def delete(self, *keys: str) -> None:
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class MemoryBackend:
+    """Cache local au processus (TTL + LRU). Avec plusieurs workers, l'invalidation reste locale : le TTL borne l'écart."""
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key, None)
+
+    def set(self, key: str, value: str) -> None:
+        self._cache.set(key, value)
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._cache.delete(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+
+class SharedBackend:
+    """
+    Cache partagé entre processus. `client` suit l'API redis-py (get, set(ex=...), delete) :
+    n'importe quel substitut local offrant ces trois méthodes convient pour les tests.
+    Une panne du cache n'est jamais bloquante : l'entrée est traitée comme absente.
+    """
+    def __init__(self, client, ttl: float = CACHE_TTL, prefix: str = "bank:"):
+        self.client = client
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            print(f"Erreur cache partagé: {e}")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return raw.decode() if isinstance(raw, bytes) else raw
+
+    def set(self, key: str, value: str) -> None:
+        try:
+            self.client.set(self.prefix + key, value, ex=self.ttl)
+        except Exception as e:
+            print(f"Erreur cache partagé: {e}")
+
+    def delete(self, *keys: str) -> None:
+        try:
+            self.client.delete(*(self.prefix + key for key in keys))
+        except Exception as e:
+            print(f"Erreur cache partagé: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def create_backend(name: str = CACHE_BACKEND):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "none":
+        return NullBackend()
+    if name == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis nécessite le paquet redis (pip install redis)")
+        return SharedBackend(redis.Redis.from_url(CACHE_URL))
+    raise ValueError(f"CACHE_BACKEND inconnu: {name}")
@@ -0,0 +1,162 @@
+"""
+Flux des mouvements (t_events) pour les systèmes aval : GET /events (long-poll) et /events/stream (SSE).
+
+Les événements sont écrits dans la transaction du mouvement (EventDao.append) ; le commit réveille
+le séquenceur du processus, qui numérote puis réveille les long-polls. Les autres workers ne sont pas
+notifiés : leur séquenceur et leurs attentes relisent la base toutes les EVENT_POLL_SECONDS.
+
+Le curseur est seq, pas l'id : un id est attribué à l'insertion, et une transaction longue (gros lot
+de virements, bloc d'intérêts) peut valider le sien après des ids plus grands. Le séquenceur (thread
+de fond, pas les lectures : GET /events n'écrit jamais) numérote les événements validés sans seq
+(EventDao.sequence_pending) : un événement validé en retard reçoit un seq supérieur à tous les
+curseurs déjà rendus et reste livré (au moins une fois).
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Awaitable, Callable, List
+from sqlalchemy import event
+from config import RoutingSession
+from dto import EventPage
+
+EVENTS_MAX_LIMIT = 1000
+EVENT_MAX_WAIT = 30.0
+EVENT_POLL_SECONDS = float(os.getenv("EVENT_POLL_SECONDS", "1"))
+EVENT_KEEPALIVE_SECONDS = 15.0
+# Événements numérotés au plus par passe du séquenceur
+EVENT_SEQUENCE_BATCH = 5000
+
+
+class _Listener:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.changed = asyncio.Event()
+
+    async def wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.changed.clear()
+
+
+class EventNotifier:
+    """Réveille les attentes du processus (boucle asyncio) depuis le thread qui a validé des événements."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = set()
+
+    @contextmanager
+    def listen(self):
+        listener = _Listener(asyncio.get_running_loop())
+        with self._lock:
+            self._listeners.add(listener)
+        try:
+            yield listener
+        finally:
+            with self._lock:
+                self._listeners.discard(listener)
+
+    def notify(self) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener.loop.call_soon_threadsafe(listener.changed.set)
+            except RuntimeError:
+                # Boucle fermée entre-temps
+                pass
+
+
+notifier = EventNotifier()
+
+
+class EventSequencer:
+    """
+    Thread de fond qui numérote les événements validés : au réveil après un commit du processus, et
+    toutes les EVENT_POLL_SECONDS pour ceux des autres workers et des jobs.
+    """
+    def __init__(self):
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, sequence: Callable[[], int]) -> None:
+        """sequence numérote une passe (au plus EVENT_SEQUENCE_BATCH événements) et rend leur nombre."""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(sequence,), name="event-sequencer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self, sequence: Callable[[], int]) -> None:
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                numbered = sequence()
+            except Exception as e:
+                # Base indisponible : nouvel essai à la prochaine passe
+                print(f"Erreur numérotation des événements: {e}")
+                numbered = 0
+            if numbered:
+                notifier.notify()
+            # Passe complète : d'autres événements attendent sans doute
+            if numbered < EVENT_SEQUENCE_BATCH:
+                self._wake.wait(EVENT_POLL_SECONDS)
+
+
+sequencer = EventSequencer()
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _wake_sequencer(session):
+    if session.info.pop("events_appended", False):
+        sequencer.wake()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_events(session):
+    session.info.pop("events_appended", None)
+
+
+async def long_poll(fetch: Callable[[], Awaitable[EventPage]], wait: float) -> EventPage:
+    """Relit le flux jusqu'à obtenir des événements ou jusqu'à l'échéance de wait secondes."""
+    deadline = time.monotonic() + wait
+    # Abonné avant la lecture : un commit entre la lecture et l'attente n'est pas perdu
+    with notifier.listen() as listener:
+        while True:
+            page = await fetch()
+            remaining = deadline - time.monotonic()
+            if page.items or remaining <= 0:
+                return page
+            await listener.wait(min(remaining, EVENT_POLL_SECONDS))
+
+
+async def sse_stream(fetch: Callable[[int], Awaitable[EventPage]], after: int) -> AsyncIterator[str]:
+    """Flux SSE : un message par événement (id = seq, repris par Last-Event-ID), commentaire de maintien sinon."""
+    with notifier.listen() as listener:
+        idle_since = time.monotonic()
+        while True:
+            page = await fetch(after)
+            lines: List[str] = [
+                f"id: {item.seq}\nevent: {item.transaction_type}\ndata: {item.json()}\n\n" for item in page.items
+            ]
+            if lines:
+                after = page.next_cursor
+                idle_since = time.monotonic()
+                yield "".join(lines)
+                continue
+            if time.monotonic() - idle_since >= EVENT_KEEPALIVE_SECONDS:
+                idle_since = time.monotonic()
+                yield ": keep-alive\n\n"
+            await listener.wait(EVENT_POLL_SECONDS)
@@ -1,15 +1,24 @@
-from fastapi import APIRouter, HTTPException, Response, Depends
-from dto import UserResponse, UserRequest, AccountRequest, AccountResponse, TransactionResponse
-from services import UserService, AccountService, TransactionService, AuthService
-from auth import create_access_token, get_current_user_id
+from fastapi import APIRouter, HTTPException, Response, Depends, Query, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from config import get_session
+from dto import UserResponse, UserRequest, UserFilter, UserPage, AccountRequest, AccountResponse, AccountInfo, TransactionResponse, TransactionFilter, TransactionPage, BatchTransferRequest, BatchTransferResponse, BalanceAtResponse, BalanceHistoryResponse, DailyBalance, AccountAnalyticsResponse, EventPage
+from entities import Account
+from services import UserService, AccountService, TransactionService, AuthService, BalanceService, AnalyticsService, EventService, STATEMENT_COLUMNS, USER_EXPORT_COLUMNS, BALANCE_HISTORY_MAX_DAYS
+from exports import MEDIA_TYPES, FastJSONResponse, encode_chunks, gzip_stream
+from change_feed import EVENTS_MAX_LIMIT, EVENT_MAX_WAIT, long_poll, sse_stream
+from starlette.concurrency import run_in_threadpool
+from account_numbers import is_valid_account_number
+from auth import create_access_token, get_current_user_id, PasswordPoolSaturated
 from pydantic import BaseModel
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import List, Optional
 
 router_users = APIRouter(prefix="/users")
 router_accounts = APIRouter(prefix="/accounts")
 router_transactions = APIRouter(prefix="/transactions")
 router_auth = APIRouter(prefix="/auth")
+router_events = APIRouter(prefix="/events")
 
 class LoginRequest(BaseModel):
     email: str
@@ -24,15 +33,66 @@ class TokenResponse(BaseModel):
     token_type: str = "bearer"
     user: UserResponse
 
-@router_users.get("/", response_model=List[UserResponse])
-def get_users():
-    service = UserService()
-    users = service.get_all()
-    return [UserResponse.from_orm(user) for user in users]
+
+def get_owned_account(
+    session: Session, account_id: int, current_user_id: int, not_found_detail: str = "Compte non trouvé"
+) -> AccountInfo:
+    # Le compte porte déjà user_id (clé étrangère vers t_users) : ses métadonnées suffisent
+    # pour vérifier l'existence et la propriété, servies par le cache sans requête SQL.
+    account = AccountService(session).get_account_info(account_id)
+    if not account:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+    if account.user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="Accès refusé")
+    return account
+
+def get_current_admin_id(current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)) -> int:
+    user = UserService(session).get_user_info(current_user_id)
+    if not user or not user.is_admin:
+        raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs")
+    return current_user_id
+
+def export_response(body, format: str, filename: str, gzip: bool) -> StreamingResponse:
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        body = gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router_users.get("/", response_model=UserPage)
+def get_users(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    order: str = Query("desc", regex="^(asc|desc)$"),
+    is_admin: Optional[bool] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    format: str = Query("json", regex="^(json|ndjson)$"),
+    gzip: bool = False,
+    current_admin_id: int = Depends(get_current_admin_id),
+    session: Session = Depends(get_session),
+):
+    filters = UserFilter(is_admin=is_admin, start_date=start_date, end_date=end_date)
+    service = UserService(session)
+    descending = order == "desc"
+    if format == "ndjson":
+        # Export complet filtré, diffusé par blocs : limit et cursor ne s'appliquent pas
+        body = encode_chunks(service.iter_users(filters, descending), format, USER_EXPORT_COLUMNS)
+        return export_response(body, format, "users.ndjson", gzip)
+    try:
+        items, next_cursor = service.get_users_page(filters, limit, cursor, descending)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor})
 
 @router_users.post("/", response_model=UserResponse)
-def register_user(user_request: UserRequest):
-    service = UserService()
+def register_user(user_request: UserRequest, session: Session = Depends(get_session)):
+    service = UserService(session)
     try:
         user_created = service.create_user(user_request)
         if user_created:
@@ -42,27 +102,29 @@ def register_user(user_request: UserRequest):
         if "EMAIL_ALREADY_EXISTS" in str(e):
             raise HTTPException(status_code=400, detail="Email déjà existant")
         raise HTTPException(status_code=400, detail="Erreur de validation")
+    except PasswordPoolSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail="Erreur serveur lors de la création du compte")
 
 @router_users.delete("/{email}")
-def delete_user(email: str):
-    service = UserService()
+def delete_user(email: str, session: Session = Depends(get_session)):
+    service = UserService(session)
     if service.delete_user(email):
         return Response(content="Utilisateur supprimé avec succès", status_code=200)
     raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
 @router_users.get("/{email}", response_model=UserResponse)
-def search_by_email(email: str):
-    service = UserService()
+def search_by_email(email: str, session: Session = Depends(get_session)):
+    service = UserService(session)
     user = service.search_by_email(email)
     if user:
         return UserResponse.from_orm(user)
     raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
 @router_auth.post("/login", response_model=TokenResponse)
-def login(login_request: LoginRequest):
-    auth_service = AuthService()
+def login(login_request: LoginRequest, session: Session = Depends(get_session)):
+    auth_service = AuthService(session)
     user = auth_service.authenticate_user(login_request.email, login_request.password)
     if not user:
         raise HTTPException(
@@ -81,142 +143,205 @@ def login(login_request: LoginRequest):
     )
 
 @router_auth.get("/me", response_model=UserResponse)
-def get_current_user(current_user_id: int = Depends(get_current_user_id)):
-    user_service = UserService()
-    user = user_service.get_by_id(current_user_id)
+def get_current_user(current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    user_service = UserService(session)
+    user = user_service.get_user_info(current_user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    return UserResponse.from_orm(user)
+    return user
 
 @router_auth.put("/change-password")
-def change_password(password_request: ChangePasswordRequest, current_user_id: int = Depends(get_current_user_id)):
-    auth_service = AuthService()
+def change_password(password_request: ChangePasswordRequest, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    auth_service = AuthService(session)
     if auth_service.change_password(current_user_id, password_request.current_password, password_request.new_password):
         return {"message": "Mot de passe modifié avec succès"}
     raise HTTPException(status_code=400, detail="Mot de passe actuel incorrect ou erreur lors de la modification")
 
 @router_accounts.post("/", response_model=AccountResponse)
-def create_account(account_request: AccountRequest, current_user_id: int = Depends(get_current_user_id)):
-    user_service = UserService()
-    current_user = user_service.get_by_id(current_user_id)
-    if not current_user or current_user.id != account_request.user_id:
+def create_account(account_request: AccountRequest, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    if current_user_id != account_request.user_id:
         raise HTTPException(status_code=403, detail="Accès refusé")
-    service = AccountService()
+    if account_request.account_number and not is_valid_account_number(account_request.account_number):
+        raise HTTPException(status_code=400, detail="Numéro de compte invalide")
+    service = AccountService(session)
     account = service.create_account(account_request)
     if account:
         return AccountResponse.from_orm(account)
     raise HTTPException(status_code=400, detail="Échec de la création du compte")
 
 @router_accounts.get("/user/{user_id}", response_model=List[AccountResponse])
-def get_accounts_by_user(user_id: int, current_user_id: int = Depends(get_current_user_id)):
-    user_service = UserService()
-    current_user = user_service.get_by_id(current_user_id)
-    if not current_user or current_user.id != user_id:
+def get_accounts_by_user(user_id: int, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    if current_user_id != user_id:
         raise HTTPException(status_code=403, detail="Accès refusé")
-    service = AccountService()
+    service = AccountService(session)
     accounts = service.get_accounts_by_user(user_id)
-    return [AccountResponse.from_orm(acc) for acc in accounts]
+    return FastJSONResponse(accounts)
 
 @router_accounts.get("/{account_id}", response_model=AccountResponse)
-def get_account_by_id(account_id: int, current_user_id: int = Depends(get_current_user_id)):
-    service = AccountService()
-    account = service.get_account_by_id(account_id)
+def get_account_by_id(account_id: int, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    get_owned_account(session, account_id, current_user_id)
+    # Le solde n'est jamais en cache : lecture en base
+    account = AccountService(session).get_account_by_id(account_id)
     if not account:
         raise HTTPException(status_code=404, detail="Compte non trouvé")
-    user_service = UserService()
-    current_user = user_service.get_by_id(current_user_id)
-    if not current_user or current_user.id != account.user_id:
-        raise HTTPException(status_code=403, detail="Accès refusé")
     return AccountResponse.from_orm(account)
 
 @router_accounts.delete("/{account_id}")
-def delete_account(account_id: int, current_user_id: int = Depends(get_current_user_id)):
-    account_service = AccountService()
-    account = account_service.get_account_by_id(account_id)
-    if not account:
-        raise HTTPException(status_code=404, detail="Compte non trouvé")
-    user_service = UserService()
-    current_user = user_service.get_by_id(current_user_id)
-    if not current_user or current_user.id != account.user_id:
-        raise HTTPException(status_code=403, detail="Accès refusé")
+def delete_account(account_id: int, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    get_owned_account(session, account_id, current_user_id)
+    account_service = AccountService(session)
     if account_service.delete_account(account_id):
         return Response(content="Compte supprimé avec succès", status_code=200)
     raise HTTPException(status_code=400, detail="Échec de la suppression")
 
 @router_accounts.post("/{account_id}/deposit")
-def deposit(account_id: int, amount: float, current_user_id: int = Depends(get_current_user_id)):
-    account_service = AccountService()
-    account = account_service.get_account_by_id(account_id)
-    if not account:
-        raise HTTPException(status_code=404, detail="Compte non trouvé")
-    user_service = UserService()
-    current_user = user_service.get_by_id(current_user_id)
-    if not current_user or current_user.id != account.user_id:
-        raise HTTPException(status_code=403, detail="Accès refusé")
+def deposit(account_id: int, amount: float, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    get_owned_account(session, account_id, current_user_id)
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Montant invalide")
+    account_service = AccountService(session)
     if account_service.deposit(account_id, amount):
         return Response(content=f"Dépôt de {amount} effectué avec succès", status_code=200)
     raise HTTPException(status_code=400, detail="Échec du dépôt")
 
 @router_accounts.post("/{account_id}/withdraw")
-def withdraw(account_id: int, amount: float, current_user_id: int = Depends(get_current_user_id)):
-    account_service = AccountService()
-    account = account_service.get_account_by_id(account_id)
-    if not account:
-        raise HTTPException(status_code=404, detail="Compte non trouvé")
-    user_service = UserService()
-    current_user = user_service.get_by_id(current_user_id)
-    if not current_user or current_user.id != account.user_id:
-        raise HTTPException(status_code=403, detail="Accès refusé")
+def withdraw(account_id: int, amount: float, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    get_owned_account(session, account_id, current_user_id)
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Montant invalide")
+    account_service = AccountService(session)
     if account_service.withdraw(account_id, amount):
         return Response(content=f"Retrait de {amount} effectué avec succès", status_code=200)
     raise HTTPException(status_code=400, detail="Fonds insuffisants ou montant invalide")
 
 @router_accounts.post("/{account_id}/transfer")
-def transfer(account_id: int, to_account_number: str, amount: float, current_user_id: int = Depends(get_current_user_id)):
+def transfer(account_id: int, to_account_number: str, amount: float, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Montant invalide")
-    account_service = AccountService()
-    from_account = account_service.get_account_by_id(account_id)
-    if not from_account:
-        raise HTTPException(status_code=404, detail="Compte source non trouvé")
-    user_service = UserService()
-    current_user = user_service.get_by_id(current_user_id)
-    if not current_user or current_user.id != from_account.user_id:
-        raise HTTPException(status_code=403, detail="Accès refusé")
+    # Clé de contrôle : un numéro mal saisi est refusé sans requête SQL
+    if not is_valid_account_number(to_account_number):
+        raise HTTPException(status_code=400, detail="Numéro de compte destinataire invalide")
+    get_owned_account(session, account_id, current_user_id, "Compte source non trouvé")
+    account_service = AccountService(session)
     if account_service.transfer(account_id, to_account_number, amount):
         return Response(content=f"Virement de {amount} vers le compte {to_account_number} effectué avec succès", status_code=200)
     raise HTTPException(status_code=400, detail="Échec du virement : compte destinataire introuvable ou solde insuffisant")
 
-@router_transactions.get("/account/{account_id}", response_model=List[TransactionResponse])
-def get_transactions_by_account(account_id: int, current_user_id: int = Depends(get_current_user_id)):
-    account_service = AccountService()
-    account = account_service.get_account_by_id(account_id)
-    if not account:
+@router_accounts.post("/{account_id}/transfers/batch", response_model=BatchTransferResponse)
+def batch_transfer(account_id: int, batch: BatchTransferRequest, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    get_owned_account(session, account_id, current_user_id, "Compte source non trouvé")
+    result = AccountService(session).batch_transfer(account_id, batch)
+    if result is None:
+        raise HTTPException(status_code=500, detail="Échec du lot de virements")
+    return result
+
+@router_accounts.get("/{account_id}/balance", response_model=BalanceAtResponse)
+def get_balance_at(account_id: int, at: Optional[datetime] = None, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    get_owned_account(session, account_id, current_user_id)
+    at = at or datetime.now()
+    balance = BalanceService(session).get_balance_at(account_id, at)
+    if balance is None:
         raise HTTPException(status_code=404, detail="Compte non trouvé")
-    user_service = UserService()
-    current_user = user_service.get_by_id(current_user_id)
-    if not current_user or current_user.id != account.user_id:
-        raise HTTPException(status_code=403, detail="Accès refusé")
-    service = TransactionService()
-    transactions = service.get_transactions_by_account(account_id)
-    return [TransactionResponse.from_orm(t) for t in transactions]
+    return BalanceAtResponse(account_id=account_id, at=at, balance=balance)
+
+@router_accounts.get("/{account_id}/balance/history", response_model=BalanceHistoryResponse)
+def get_balance_history(account_id: int, start_date: date, end_date: date, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    if start_date > end_date or (end_date - start_date).days >= BALANCE_HISTORY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Intervalle invalide (au plus {BALANCE_HISTORY_MAX_DAYS} jours)")
+    get_owned_account(session, account_id, current_user_id)
+    balances = BalanceService(session).get_balance_history(account_id, start_date, end_date)
+    return BalanceHistoryResponse(
+        account_id=account_id,
+        start_date=start_date,
+        end_date=end_date,
+        items=[DailyBalance(day=day, balance=balance) for day, balance in balances],
+    )
+
+@router_accounts.get("/{account_id}/analytics", response_model=AccountAnalyticsResponse)
+def get_account_analytics(account_id: int, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    get_owned_account(session, account_id, current_user_id)
+    months = AnalyticsService(session).get_account_analytics(account_id)
+    return AccountAnalyticsResponse(account_id=account_id, months=months)
+
+@router_accounts.get("/{account_id}/statement")
+def export_statement(
+    account_id: int,
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    gzip: bool = False,
+    current_user_id: int = Depends(get_current_user_id),
+    session: Session = Depends(get_session),
+):
+    account = get_owned_account(session, account_id, current_user_id)
+    chunks = TransactionService(session).iter_statement(account_id, start_date, end_date)
+    body = encode_chunks(chunks, format, STATEMENT_COLUMNS)
+    return export_response(body, format, f"statement-{account.account_number}.{format}", gzip)
+
+@router_transactions.get("/account/{account_id}", response_model=TransactionPage)
+def get_transactions_by_account(
+    account_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    transaction_type: Optional[List[str]] = Query(None),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    current_user_id: int = Depends(get_current_user_id),
+    session: Session = Depends(get_session),
+):
+    get_owned_account(session, account_id, current_user_id)
+    filters = TransactionFilter(
+        transaction_types=transaction_type,
+        start_date=start_date,
+        end_date=end_date,
+        min_amount=min_amount,
+        max_amount=max_amount,
+    )
+    try:
+        items, next_cursor, prev_cursor = TransactionService(session).get_transactions_page(
+            account_id, filters, limit, before, after
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor, "prev_cursor": prev_cursor})
 
 @router_transactions.get("/{transaction_id}", response_model=TransactionResponse)
-def get_transaction_by_id(transaction_id: int, current_user_id: int = Depends(get_current_user_id)):
-    service = TransactionService()
-    transaction = service.get_transaction_by_id(transaction_id)
-    if not transaction:
+def get_transaction_by_id(transaction_id: int, current_user_id: int = Depends(get_current_user_id), session: Session = Depends(get_session)):
+    service = TransactionService(session)
+    found = service.get_transaction_with_owner(transaction_id)
+    if not found:
         raise HTTPException(status_code=404, detail="Transaction non trouvée")
-    account_service = AccountService()
-    account = account_service.get_account_by_id(transaction.account_id)
-    if not account:
-        raise HTTPException(status_code=404, detail="Compte non trouvé")
-    user_service = UserService()
-    current_user = user_service.get_by_id(current_user_id)
-    if not current_user or current_user.id != account.user_id:
+    transaction, owner_id = found
+    if owner_id != current_user_id:
         raise HTTPException(status_code=403, detail="Accès refusé")
     return TransactionResponse.from_orm(transaction)
+
+# Routes async : l'attente (long-poll, flux) n'occupe pas de thread, seules les lectures passent par le threadpool
+@router_events.get("", response_model=EventPage)
+async def get_events(
+    after: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=EVENTS_MAX_LIMIT),
+    wait: float = Query(0, ge=0, le=EVENT_MAX_WAIT),
+    current_admin_id: int = Depends(get_current_admin_id),
+):
+    """Événements après le curseur after ; wait > 0 : attend jusqu'à wait secondes qu'il y en ait (long-poll)."""
+    service = EventService()
+    return await long_poll(lambda: run_in_threadpool(service.get_events, after, limit), wait)
+
+@router_events.get("/stream")
+async def stream_events(
+    after: int = Query(0, ge=0),
+    last_event_id: Optional[int] = Header(None),
+    current_admin_id: int = Depends(get_current_admin_id),
+):
+    """Flux SSE des événements ; reprise par l'en-tête Last-Event-ID envoyé par EventSource."""
+    service = EventService()
+    return StreamingResponse(
+        sse_stream(lambda cursor: run_in_threadpool(service.get_events, cursor, EVENTS_MAX_LIMIT),
+                   after if last_event_id is None else last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
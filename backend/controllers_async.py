@@ -0,0 +1,325 @@
+from fastapi import APIRouter, HTTPException, Response, Depends, Query, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import AsyncLocalSession, get_async_session
+from dto import UserResponse, UserRequest, UserFilter, UserPage, AccountRequest, AccountResponse, AccountInfo, TransactionResponse, TransactionFilter, TransactionPage, BatchTransferRequest, BatchTransferResponse, BalanceAtResponse, BalanceHistoryResponse, DailyBalance, AccountAnalyticsResponse, EventPage
+from entities import Account
+from exports import MEDIA_TYPES, FastJSONResponse, aencode_chunks, agzip_stream
+from change_feed import EVENTS_MAX_LIMIT, EVENT_MAX_WAIT, long_poll, sse_stream
+from services import STATEMENT_COLUMNS, USER_EXPORT_COLUMNS, BALANCE_HISTORY_MAX_DAYS
+from services_async import AsyncUserService, AsyncAccountService, AsyncTransactionService, AsyncAuthService, AsyncBalanceService, AsyncAnalyticsService, AsyncEventService
+from account_numbers import is_valid_account_number
+from auth import create_access_token, get_current_user_id, PasswordPoolSaturated
+from controllers import LoginRequest, ChangePasswordRequest, TokenResponse
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+# Mêmes routes que controllers.py, en async def sur AsyncLocalSession (activées par DB_ASYNC=true)
+router_users = APIRouter(prefix="/users")
+router_accounts = APIRouter(prefix="/accounts")
+router_transactions = APIRouter(prefix="/transactions")
+router_auth = APIRouter(prefix="/auth")
+router_events = APIRouter(prefix="/events")
+
+
+async def get_owned_account(
+    session: AsyncSession, account_id: int, current_user_id: int, not_found_detail: str = "Compte non trouvé"
+) -> AccountInfo:
+    account = await AsyncAccountService(session).get_account_info(account_id)
+    if not account:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+    if account.user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="Accès refusé")
+    return account
+
+async def get_current_admin_id(current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)) -> int:
+    user = await AsyncUserService(session).get_user_info(current_user_id)
+    if not user or not user.is_admin:
+        raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs")
+    return current_user_id
+
+def export_response(body, format: str, filename: str, gzip: bool) -> StreamingResponse:
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        body = agzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router_users.get("/", response_model=UserPage)
+async def get_users(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    order: str = Query("desc", regex="^(asc|desc)$"),
+    is_admin: Optional[bool] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    format: str = Query("json", regex="^(json|ndjson)$"),
+    gzip: bool = False,
+    current_admin_id: int = Depends(get_current_admin_id),
+    session: AsyncSession = Depends(get_async_session),
+):
+    filters = UserFilter(is_admin=is_admin, start_date=start_date, end_date=end_date)
+    service = AsyncUserService(session)
+    descending = order == "desc"
+    if format == "ndjson":
+        # Export complet filtré, diffusé par blocs : limit et cursor ne s'appliquent pas
+        body = aencode_chunks(service.iter_users(filters, descending), format, USER_EXPORT_COLUMNS)
+        return export_response(body, format, "users.ndjson", gzip)
+    try:
+        items, next_cursor = await service.get_users_page(filters, limit, cursor, descending)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor})
+
+@router_users.post("/", response_model=UserResponse)
+async def register_user(user_request: UserRequest, session: AsyncSession = Depends(get_async_session)):
+    service = AsyncUserService(session)
+    try:
+        user_created = await service.create_user(user_request)
+        if user_created:
+            return UserResponse.from_orm(user_created)
+        raise HTTPException(status_code=400, detail="Erreur lors de la création du compte")
+    except ValueError as e:
+        if "EMAIL_ALREADY_EXISTS" in str(e):
+            raise HTTPException(status_code=400, detail="Email déjà existant")
+        raise HTTPException(status_code=400, detail="Erreur de validation")
+    except PasswordPoolSaturated:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Erreur serveur lors de la création du compte")
+
+@router_users.delete("/{email}")
+async def delete_user(email: str, session: AsyncSession = Depends(get_async_session)):
+    if await AsyncUserService(session).delete_user(email):
+        return Response(content="Utilisateur supprimé avec succès", status_code=200)
+    raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+
+@router_users.get("/{email}", response_model=UserResponse)
+async def search_by_email(email: str, session: AsyncSession = Depends(get_async_session)):
+    user = await AsyncUserService(session).search_by_email(email)
+    if user:
+        return UserResponse.from_orm(user)
+    raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+
+@router_auth.post("/login", response_model=TokenResponse)
+async def login(login_request: LoginRequest, session: AsyncSession = Depends(get_async_session)):
+    user = await AsyncAuthService(session).authenticate_user(login_request.email, login_request.password)
+    if not user:
+        raise HTTPException(
+            status_code=401,
+            detail="Email ou mot de passe incorrect",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    access_token = create_access_token(
+        data={"sub": str(user.id), "email": user.email},
+        expires_delta=timedelta(minutes=30)
+    )
+    return TokenResponse(
+        access_token=access_token,
+        token_type="bearer",
+        user=UserResponse.from_orm(user)
+    )
+
+@router_auth.get("/me", response_model=UserResponse)
+async def get_current_user(current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    user = await AsyncUserService(session).get_user_info(current_user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    return user
+
+@router_auth.put("/change-password")
+async def change_password(password_request: ChangePasswordRequest, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    auth_service = AsyncAuthService(session)
+    if await auth_service.change_password(current_user_id, password_request.current_password, password_request.new_password):
+        return {"message": "Mot de passe modifié avec succès"}
+    raise HTTPException(status_code=400, detail="Mot de passe actuel incorrect ou erreur lors de la modification")
+
+@router_accounts.post("/", response_model=AccountResponse)
+async def create_account(account_request: AccountRequest, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    if current_user_id != account_request.user_id:
+        raise HTTPException(status_code=403, detail="Accès refusé")
+    if account_request.account_number and not is_valid_account_number(account_request.account_number):
+        raise HTTPException(status_code=400, detail="Numéro de compte invalide")
+    account = await AsyncAccountService(session).create_account(account_request)
+    if account:
+        return AccountResponse.from_orm(account)
+    raise HTTPException(status_code=400, detail="Échec de la création du compte")
+
+@router_accounts.get("/user/{user_id}", response_model=List[AccountResponse])
+async def get_accounts_by_user(user_id: int, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    if current_user_id != user_id:
+        raise HTTPException(status_code=403, detail="Accès refusé")
+    accounts = await AsyncAccountService(session).get_accounts_by_user(user_id)
+    return FastJSONResponse(accounts)
+
+@router_accounts.get("/{account_id}", response_model=AccountResponse)
+async def get_account_by_id(account_id: int, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    await get_owned_account(session, account_id, current_user_id)
+    account = await AsyncAccountService(session).get_account_by_id(account_id)
+    if not account:
+        raise HTTPException(status_code=404, detail="Compte non trouvé")
+    return AccountResponse.from_orm(account)
+
+@router_accounts.delete("/{account_id}")
+async def delete_account(account_id: int, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    await get_owned_account(session, account_id, current_user_id)
+    if await AsyncAccountService(session).delete_account(account_id):
+        return Response(content="Compte supprimé avec succès", status_code=200)
+    raise HTTPException(status_code=400, detail="Échec de la suppression")
+
+@router_accounts.post("/{account_id}/deposit")
+async def deposit(account_id: int, amount: float, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    await get_owned_account(session, account_id, current_user_id)
+    if amount <= 0:
+        raise HTTPException(status_code=400, detail="Montant invalide")
+    if await AsyncAccountService(session).deposit(account_id, amount):
+        return Response(content=f"Dépôt de {amount} effectué avec succès", status_code=200)
+    raise HTTPException(status_code=400, detail="Échec du dépôt")
+
+@router_accounts.post("/{account_id}/withdraw")
+async def withdraw(account_id: int, amount: float, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    await get_owned_account(session, account_id, current_user_id)
+    if amount <= 0:
+        raise HTTPException(status_code=400, detail="Montant invalide")
+    if await AsyncAccountService(session).withdraw(account_id, amount):
+        return Response(content=f"Retrait de {amount} effectué avec succès", status_code=200)
+    raise HTTPException(status_code=400, detail="Fonds insuffisants ou montant invalide")
+
+@router_accounts.post("/{account_id}/transfer")
+async def transfer(account_id: int, to_account_number: str, amount: float, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    if amount <= 0:
+        raise HTTPException(status_code=400, detail="Montant invalide")
+    # Clé de contrôle : un numéro mal saisi est refusé sans requête SQL
+    if not is_valid_account_number(to_account_number):
+        raise HTTPException(status_code=400, detail="Numéro de compte destinataire invalide")
+    await get_owned_account(session, account_id, current_user_id, "Compte source non trouvé")
+    if await AsyncAccountService(session).transfer(account_id, to_account_number, amount):
+        return Response(content=f"Virement de {amount} vers le compte {to_account_number} effectué avec succès", status_code=200)
+    raise HTTPException(status_code=400, detail="Échec du virement : compte destinataire introuvable ou solde insuffisant")
+
+@router_accounts.post("/{account_id}/transfers/batch", response_model=BatchTransferResponse)
+async def batch_transfer(account_id: int, batch: BatchTransferRequest, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    await get_owned_account(session, account_id, current_user_id, "Compte source non trouvé")
+    result = await AsyncAccountService(session).batch_transfer(account_id, batch)
+    if result is None:
+        raise HTTPException(status_code=500, detail="Échec du lot de virements")
+    return result
+
+@router_accounts.get("/{account_id}/balance", response_model=BalanceAtResponse)
+async def get_balance_at(account_id: int, at: Optional[datetime] = None, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    await get_owned_account(session, account_id, current_user_id)
+    at = at or datetime.now()
+    balance = await AsyncBalanceService(session).get_balance_at(account_id, at)
+    if balance is None:
+        raise HTTPException(status_code=404, detail="Compte non trouvé")
+    return BalanceAtResponse(account_id=account_id, at=at, balance=balance)
+
+@router_accounts.get("/{account_id}/balance/history", response_model=BalanceHistoryResponse)
+async def get_balance_history(account_id: int, start_date: date, end_date: date, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    if start_date > end_date or (end_date - start_date).days >= BALANCE_HISTORY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Intervalle invalide (au plus {BALANCE_HISTORY_MAX_DAYS} jours)")
+    await get_owned_account(session, account_id, current_user_id)
+    balances = await AsyncBalanceService(session).get_balance_history(account_id, start_date, end_date)
+    return BalanceHistoryResponse(
+        account_id=account_id,
+        start_date=start_date,
+        end_date=end_date,
+        items=[DailyBalance(day=day, balance=balance) for day, balance in balances],
+    )
+
+@router_accounts.get("/{account_id}/analytics", response_model=AccountAnalyticsResponse)
+async def get_account_analytics(account_id: int, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    await get_owned_account(session, account_id, current_user_id)
+    months = await AsyncAnalyticsService(session).get_account_analytics(account_id)
+    return AccountAnalyticsResponse(account_id=account_id, months=months)
+
+@router_accounts.get("/{account_id}/statement")
+async def export_statement(
+    account_id: int,
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    gzip: bool = False,
+    current_user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_async_session),
+):
+    account = await get_owned_account(session, account_id, current_user_id)
+    chunks = AsyncTransactionService(session).iter_statement(account_id, start_date, end_date)
+    body = aencode_chunks(chunks, format, STATEMENT_COLUMNS)
+    return export_response(body, format, f"statement-{account.account_number}.{format}", gzip)
+
+@router_transactions.get("/account/{account_id}", response_model=TransactionPage)
+async def get_transactions_by_account(
+    account_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    transaction_type: Optional[List[str]] = Query(None),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    current_user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_async_session),
+):
+    await get_owned_account(session, account_id, current_user_id)
+    filters = TransactionFilter(
+        transaction_types=transaction_type,
+        start_date=start_date,
+        end_date=end_date,
+        min_amount=min_amount,
+        max_amount=max_amount,
+    )
+    try:
+        items, next_cursor, prev_cursor = await AsyncTransactionService(session).get_transactions_page(
+            account_id, filters, limit, before, after
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor, "prev_cursor": prev_cursor})
+
+@router_transactions.get("/{transaction_id}", response_model=TransactionResponse)
+async def get_transaction_by_id(transaction_id: int, current_user_id: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_async_session)):
+    found = await AsyncTransactionService(session).get_transaction_with_owner(transaction_id)
+    if not found:
+        raise HTTPException(status_code=404, detail="Transaction non trouvée")
+    transaction, owner_id = found
+    if owner_id != current_user_id:
+        raise HTTPException(status_code=403, detail="Accès refusé")
+    return TransactionResponse.from_orm(transaction)
+
+async def fetch_events(after: int, limit: int) -> EventPage:
+    # Session courte par lecture : aucune connexion gardée pendant l'attente
+    async with AsyncLocalSession() as session:
+        return await AsyncEventService(session).get_events(after, limit)
+
+@router_events.get("", response_model=EventPage)
+async def get_events(
+    after: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=EVENTS_MAX_LIMIT),
+    wait: float = Query(0, ge=0, le=EVENT_MAX_WAIT),
+    current_admin_id: int = Depends(get_current_admin_id),
+    session: AsyncSession = Depends(get_async_session),
+):
+    # Termine la lecture de get_current_admin_id : la connexion retourne au pool avant l'attente
+    await session.commit()
+    return await long_poll(lambda: fetch_events(after, limit), wait)
+
+@router_events.get("/stream")
+async def stream_events(
+    after: int = Query(0, ge=0),
+    last_event_id: Optional[int] = Header(None),
+    current_admin_id: int = Depends(get_current_admin_id),
+    session: AsyncSession = Depends(get_async_session),
+):
+    await session.commit()
+    return StreamingResponse(
+        sse_stream(lambda cursor: fetch_events(cursor, EVENTS_MAX_LIMIT), after if last_event_id is None else last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,8 +1,391 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import select
-from entities import User, Account, Transaction
-from typing import List, Optional
+from sqlalchemy import select, update, insert, delete, bindparam, and_, or_, func, case, extract
+from entities import User, Account, Transaction, Sequence, BalanceSnapshot, JobCheckpoint, MonthlyRollup, Event
+from dto import TransactionFilter, UserFilter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import date, datetime
+
+
+# Requêtes partagées entre les DAO synchrones et asynchrones (dal_async.py)
+
+def after_key(created_at: datetime, row_id: int, entity=Transaction):
+    # La borne redondante created_at >= ... donne à MySQL un parcours d'intervalle sur l'index
+    # composite, qu'il ne déduit pas seul de la disjonction.
+    return and_(
+        entity.created_at >= created_at,
+        or_(entity.created_at > created_at, and_(entity.created_at == created_at, entity.id > row_id)),
+    )
+
+
+def before_key(created_at: datetime, row_id: int, entity=Transaction):
+    return and_(
+        entity.created_at <= created_at,
+        or_(entity.created_at < created_at, and_(entity.created_at == created_at, entity.id < row_id)),
+    )
+
+
+def credit_stmt(account_id: int, amount: float):
+    # Mise à jour atomique côté base : pas de lecture-modification-écriture en Python
+    return (
+        update(Account)
+        .where(Account.id == account_id)
+        .values(balance=Account.balance + amount)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def debit_stmt(account_id: int, amount: float):
+    # Le contrôle du découvert fait partie du WHERE : 0 ligne modifiée = fonds insuffisants
+    return (
+        update(Account)
+        .where(Account.id == account_id, Account.balance + Account.overdraft_limit >= amount)
+        .values(balance=Account.balance - amount)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def account_ids_by_number_stmt(account_numbers: Iterable[str]):
+    return select(Account.account_number, Account.id).where(Account.account_number.in_(list(account_numbers)))
+
+
+def owners_and_balances_stmt(account_ids: Iterable[int]):
+    return select(Account.id, Account.user_id, Account.balance).where(Account.id.in_(list(account_ids)))
+
+
+def oldest_transaction_ids_stmt(account_id: int, limit: int, before: Optional[datetime] = None):
+    # Parcours de ix_transactions_account_created_id seul (index couvrant), du plus ancien au plus récent
+    stmt = select(Transaction.id).where(Transaction.account_id == account_id)
+    if before is not None:
+        stmt = stmt.where(Transaction.created_at < before)
+    return stmt.order_by(Transaction.created_at, Transaction.id).limit(limit)
+
+
+def archive_chunk_stmt(start: datetime, end: datetime, limit: int, after: Optional[Tuple[int, datetime, int]] = None):
+    # Ordre de ix_transactions_account_created_id : un seul parcours de l'index pour tout le mois,
+    # chaque bloc reprenant après la clé (account_id, created_at, id) du précédent
+    stmt = select(
+        Transaction.account_id,
+        Transaction.id,
+        Transaction.created_at,
+        Transaction.transaction_type,
+        Transaction.amount,
+        Transaction.description,
+    ).where(Transaction.created_at >= start, Transaction.created_at < end)
+    if after is not None:
+        account_id, created_at, row_id = after
+        stmt = stmt.where(or_(
+            Transaction.account_id > account_id,
+            and_(Transaction.account_id == account_id, after_key(created_at, row_id)),
+        ))
+    return stmt.order_by(Transaction.account_id, Transaction.created_at, Transaction.id).limit(limit)
+
+
+def delete_by_ids_stmt(entity, ids: List[int]):
+    return delete(entity).where(entity.id.in_(ids)).execution_options(synchronize_session=False)
+
+
+def lock_funds_stmt(account_id: int):
+    # SELECT ... FOR UPDATE : le solde reste figé jusqu'au commit du lot (ignoré par SQLite)
+    return select(Account.balance, Account.overdraft_limit).where(Account.id == account_id).with_for_update()
+
+
+# Crédit de plusieurs comptes en un seul executemany : paramètres [{"b_id": ..., "b_amount": ...}]
+bulk_credit_stmt = (
+    update(Account.__table__)
+    .where(Account.__table__.c.id == bindparam("b_id"))
+    .values(balance=Account.__table__.c.balance + bindparam("b_amount"))
+)
+
+bulk_insert_transactions_stmt = insert(Transaction.__table__)
+bulk_insert_events_stmt = insert(Event.__table__)
+max_transaction_id_stmt = select(func.coalesce(func.max(Transaction.id), 0))
+
+
+def events_from_transactions_stmt(after_id: int):
+    """
+    Événements des transactions d'id supérieur à after_id qui n'en ont pas encore. Les lignes
+    d'une autre transaction encore ouverte sont invisibles, celles déjà validées ont leur événement :
+    seules restent les lignes insérées par la transaction en cours.
+    """
+    transactions, events = Transaction.__table__, Event.__table__
+    columns = ("id", "account_id", "transaction_type", "amount", "description", "created_at")
+    return insert(events).from_select(
+        ["transaction_id", *columns[1:]],
+        select(*(transactions.c[name] for name in columns))
+        .where(transactions.c.id > after_id)
+        .where(~select(events.c.id).where(events.c.transaction_id == transactions.c.id).exists())
+        .order_by(transactions.c.id),
+    )
+
+
+# Numérotation du flux : la ligne de t_sequences sert aussi de verrou (un seul numéroteur à la fois)
+EVENT_SEQUENCE = "events"
+sequence_events_stmt = (
+    update(Event.__table__)
+    .where(Event.__table__.c.id == bindparam("b_id"))
+    .values(seq=bindparam("b_seq"))
+)
+
+
+def unsequenced_events_stmt(limit: int):
+    # Entrées NULL de ix_events_seq, rangées par clé primaire : pas de tri
+    return select(Event.id).where(Event.seq.is_(None)).order_by(Event.id).limit(limit)
+
+
+def event_sequence(ids: List[int], next_value: int) -> Tuple[List[Dict], int]:
+    """
+    Numéros des événements ids (ordre croissant) et prochaine valeur de la séquence. seq = id tant que
+    possible (curseurs des consommateurs stables), sinon la valeur suivante : un événement validé après
+    des ids plus grands est numéroté après eux, jamais derrière un curseur déjà rendu.
+    """
+    params = []
+    for event_id in ids:
+        seq = max(event_id, next_value)
+        params.append({"b_id": event_id, "b_seq": seq})
+        next_value = seq + 1
+    return params, next_value
+
+
+def events_after_stmt(after_seq: int, limit: int):
+    # Parcours de ix_events_seq : un seul range scan quel que soit le volume du flux
+    return select(Event.__table__).where(Event.seq > after_seq).order_by(Event.seq).limit(limit)
+
+
+def transaction_with_owner_stmt(transaction_id: int):
+    return (
+        select(Transaction, Account.user_id)
+        .join(Account, Account.id == Transaction.account_id)
+        .where(Transaction.id == transaction_id)
+    )
+
+
+# Colonnes de TransactionResponse : les listes sont servies sans hydrater d'objets ORM
+TRANSACTION_LIST_COLUMNS = (
+    Transaction.id, Transaction.account_id, Transaction.transaction_type, Transaction.amount,
+    Transaction.description, Transaction.created_at,
+)
+
+
+def transaction_page_stmt(
+    account_id: int,
+    filters: TransactionFilter,
+    limit: int,
+    before: Optional[Tuple[datetime, int]] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+):
+    """
+    Page d'historique par clé (created_at, id), servie par ix_transactions_account_created_id.
+    Ordre décroissant par défaut ; avec `after` l'ordre est croissant (à inverser par l'appelant).
+    limit + 1 lignes sont demandées pour savoir s'il reste une page.
+    """
+    stmt = select(*TRANSACTION_LIST_COLUMNS).where(Transaction.account_id == account_id)
+    if filters.transaction_types:
+        stmt = stmt.where(Transaction.transaction_type.in_(filters.transaction_types))
+    if filters.start_date is not None:
+        stmt = stmt.where(Transaction.created_at >= filters.start_date)
+    if filters.end_date is not None:
+        stmt = stmt.where(Transaction.created_at <= filters.end_date)
+    if filters.min_amount is not None:
+        stmt = stmt.where(Transaction.amount >= filters.min_amount)
+    if filters.max_amount is not None:
+        stmt = stmt.where(Transaction.amount <= filters.max_amount)
+    if after is not None:
+        stmt = stmt.where(after_key(*after))
+        return stmt.order_by(Transaction.created_at.asc(), Transaction.id.asc()).limit(limit + 1)
+    if before is not None:
+        stmt = stmt.where(before_key(*before))
+    return stmt.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(limit + 1)
+
+
+# Colonnes de UserResponse : la liste ne charge jamais le hash du mot de passe
+USER_LIST_COLUMNS = (
+    User.id, User.email, User.first_name, User.last_name, User.phone, User.is_admin, User.created_at, User.updated_at,
+)
+
+
+# Colonnes de AccountResponse
+ACCOUNT_LIST_COLUMNS = (
+    Account.id, Account.user_id, Account.account_number, Account.account_type, Account.balance,
+    Account.overdraft_limit, Account.interest_rate, Account.created_at,
+)
+
+
+def accounts_by_user_stmt(user_id: int):
+    return select(*ACCOUNT_LIST_COLUMNS).where(Account.user_id == user_id).order_by(Account.id)
+
+
+def user_page_stmt(
+    filters: UserFilter,
+    limit: int,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    descending: bool = True,
+):
+    """Page d'utilisateurs par clé (created_at, id), servie par ix_users_created_id."""
+    stmt = select(*USER_LIST_COLUMNS)
+    if filters.is_admin is not None:
+        stmt = stmt.where(User.is_admin == filters.is_admin)
+    if filters.start_date is not None:
+        stmt = stmt.where(User.created_at >= filters.start_date)
+    if filters.end_date is not None:
+        stmt = stmt.where(User.created_at <= filters.end_date)
+    if descending:
+        if cursor is not None:
+            stmt = stmt.where(before_key(*cursor, entity=User))
+        return stmt.order_by(User.created_at.desc(), User.id.desc()).limit(limit)
+    if cursor is not None:
+        stmt = stmt.where(after_key(*cursor, entity=User))
+    return stmt.order_by(User.created_at.asc(), User.id.asc()).limit(limit)
+
+
+def opening_balance_stmt(account_id: int, start_date: Optional[datetime] = None):
+    # Solde d'ouverture = solde courant - mouvements depuis start_date, en une seule requête
+    # pour que le solde et la somme proviennent du même instantané.
+    moved = select(func.coalesce(func.sum(Transaction.amount), 0.0)).where(Transaction.account_id == account_id)
+    if start_date is not None:
+        moved = moved.where(Transaction.created_at >= start_date)
+    return select(Account.balance - moved.scalar_subquery()).where(Account.id == account_id)
+
+
+def interest_chunk_stmt(after_id: int, limit: int):
+    # Colonnes seules (pas d'objets ORM), parcours par clé primaire
+    return (
+        select(Account.id, Account.balance, Account.interest_rate)
+        .where(Account.id > after_id, Account.interest_rate > 0, Account.balance > 0)
+        .order_by(Account.id)
+        .limit(limit)
+    )
+
+
+def as_date(value) -> date:
+    # DATE() rend une chaîne sous SQLite, un objet date sous MySQL
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def latest_snapshot_stmt(account_id: int, before_day: date):
+    return (
+        select(BalanceSnapshot.day, BalanceSnapshot.balance)
+        .where(BalanceSnapshot.account_id == account_id, BalanceSnapshot.day < before_day)
+        .order_by(BalanceSnapshot.day.desc())
+        .limit(1)
+    )
+
+
+def snapshot_range_stmt(account_id: int, start_day: date, end_day: date):
+    return (
+        select(BalanceSnapshot.day, BalanceSnapshot.balance)
+        .where(BalanceSnapshot.account_id == account_id, BalanceSnapshot.day.between(start_day, end_day))
+        .order_by(BalanceSnapshot.day)
+    )
+
+
+def latest_snapshots_stmt(account_ids: List[int], before_day: date):
+    # Dernier solde connu de chaque compte avant before_day (report du solde par le job)
+    latest = (
+        select(BalanceSnapshot.account_id, func.max(BalanceSnapshot.day).label("day"))
+        .where(BalanceSnapshot.account_id.in_(account_ids), BalanceSnapshot.day < before_day)
+        .group_by(BalanceSnapshot.account_id)
+        .subquery()
+    )
+    return select(BalanceSnapshot.account_id, BalanceSnapshot.balance).join(
+        latest, and_(BalanceSnapshot.account_id == latest.c.account_id, BalanceSnapshot.day == latest.c.day)
+    )
+
+
+def amount_sum_stmt(account_id: int, start: Optional[datetime], end: datetime):
+    # Parcours de la queue de l'historique via l'index (account_id, created_at, id)
+    stmt = select(func.coalesce(func.sum(Transaction.amount), 0.0)).where(
+        Transaction.account_id == account_id, Transaction.created_at < end
+    )
+    if start is not None:
+        stmt = stmt.where(Transaction.created_at >= start)
+    return stmt
+
+
+def daily_sums_stmt(start: datetime, end: datetime, account_id: Optional[int] = None):
+    day = func.date(Transaction.created_at)
+    stmt = (
+        select(Transaction.account_id, day.label("day"), func.sum(Transaction.amount).label("amount"))
+        .where(Transaction.created_at >= start, Transaction.created_at < end)
+        .group_by(Transaction.account_id, day)
+        .order_by(Transaction.account_id, day)
+    )
+    if account_id is not None:
+        stmt = stmt.where(Transaction.account_id == account_id)
+    return stmt
+
+
+def monthly_aggregates_stmt(account_id: int, start: Optional[datetime], end: Optional[datetime]):
+    # GROUP BY sur l'intervalle de l'index (account_id, created_at, id) ; EXTRACT est portable MySQL / SQLite
+    year = extract("year", Transaction.created_at)
+    month = extract("month", Transaction.created_at)
+    stmt = (
+        select(
+            year.label("year"),
+            month.label("month"),
+            Transaction.transaction_type,
+            func.count(Transaction.id).label("count"),
+            func.sum(Transaction.amount).label("total"),
+            func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0.0)).label("credits"),
+            func.sum(case((Transaction.amount < 0, Transaction.amount), else_=0.0)).label("debits"),
+            func.min(Transaction.amount).label("min_amount"),
+            func.max(Transaction.amount).label("max_amount"),
+        )
+        .where(Transaction.account_id == account_id)
+        .group_by(year, month, Transaction.transaction_type)
+    )
+    if start is not None:
+        stmt = stmt.where(Transaction.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(Transaction.created_at < end)
+    return stmt
+
+
+def monthly_rows(result) -> List[Dict]:
+    return [
+        {
+            "month": date(int(row.year), int(row.month), 1),
+            "transaction_type": row.transaction_type,
+            "count": row.count,
+            "total": row.total,
+            "credits": row.credits,
+            "debits": row.debits,
+            "min_amount": row.min_amount,
+            "max_amount": row.max_amount,
+        }
+        for row in result
+    ]
+
+
+def rollups_stmt(account_id: int):
+    return (
+        select(MonthlyRollup.__table__)
+        .where(MonthlyRollup.account_id == account_id)
+        .order_by(MonthlyRollup.month, MonthlyRollup.transaction_type)
+    )
+
+
+def statement_chunk_stmt(
+    account_id: int,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    chunk_size: int,
+    after: Optional[Tuple[datetime, int]] = None,
+):
+    stmt = select(
+        Transaction.id,
+        Transaction.created_at,
+        Transaction.transaction_type,
+        Transaction.amount,
+        Transaction.description,
+    ).where(Transaction.account_id == account_id)
+    if start_date is not None:
+        stmt = stmt.where(Transaction.created_at >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(Transaction.created_at <= end_date)
+    if after is not None:
+        stmt = stmt.where(after_key(*after))
+    return stmt.order_by(Transaction.created_at.asc(), Transaction.id.asc()).limit(chunk_size)
 
 
 class UserDao:
@@ -25,26 +408,145 @@ class UserDao:
 
     @staticmethod
     def get_by_id(session: Session, user_id: int) -> Optional[User]:
-        stmt = select(User).where(User.id == user_id)
-        result = session.execute(stmt)
-        return result.scalar_one_or_none()
+        return session.get(User, user_id)
 
     @staticmethod
     def delete_user(session: Session, email: str) -> bool:
-        stmt = select(User).where(User.email == email)
-        result = session.execute(stmt)
-        user = result.scalar_one_or_none()
-        if user:
-            session.delete(user)
-            session.commit()
-            return True
-        return False
+        # Comptes et leurs dépendances supprimés par la base (ON DELETE CASCADE), sans chargement ORM
+        stmt = delete(User).where(User.email == email).execution_options(synchronize_session=False)
+        deleted = session.execute(stmt).rowcount == 1
+        session.commit()
+        return deleted
 
     @staticmethod
-    def get_all_users(session: Session) -> List[User]:
-        stmt = select(User)
-        result = session.execute(stmt)
-        return list(result.scalars())
+    def update_password(session: Session, user_id: int, password_hash: str) -> None:
+        session.execute(update(User).where(User.id == user_id).values(password=password_hash))
+
+    @staticmethod
+    def get_page(
+        session: Session,
+        filters: UserFilter,
+        limit: int,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        descending: bool = True,
+    ) -> list:
+        return session.execute(user_page_stmt(filters, limit, cursor, descending)).all()
+
+    @staticmethod
+    def iter_chunks(session: Session, filters: UserFilter, chunk_size: int, descending: bool = True) -> Iterator[list]:
+        # Même parcours par clé que iter_statement_chunks : mémoire bornée sans curseur côté serveur
+        cursor = None
+        while True:
+            rows = session.execute(user_page_stmt(filters, chunk_size, cursor, descending)).all()
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            cursor = (rows[-1].created_at, rows[-1].id)
+
+
+class SequenceDao:
+    @staticmethod
+    def allocate(session: Session, name: str, count: int) -> int:
+        """
+        Réserve `count` valeurs consécutives de la séquence et retourne la première.
+        L'UPDATE verrouille la ligne jusqu'au commit : deux réservations ne se chevauchent jamais.
+        """
+        updated = session.execute(
+            update(Sequence).where(Sequence.name == name).values(next_value=Sequence.next_value + count)
+        ).rowcount
+        if not updated:
+            # Première réservation : IntegrityError si un autre processus crée la ligne en même temps
+            session.add(Sequence(name=name, next_value=1 + count))
+            session.flush()
+            return 1
+        return session.execute(select(Sequence.next_value).where(Sequence.name == name)).scalar_one() - count
+
+
+class JobCheckpointDao:
+    @staticmethod
+    def get(session: Session, name: str) -> Optional[str]:
+        checkpoint = session.get(JobCheckpoint, name)
+        return checkpoint.position if checkpoint else None
+
+    @staticmethod
+    def set(session: Session, name: str, position: str) -> None:
+        checkpoint = session.get(JobCheckpoint, name)
+        if checkpoint:
+            checkpoint.position = position
+        else:
+            session.add(JobCheckpoint(name=name, position=position))
+
+
+class EventDao:
+    @staticmethod
+    def append(session: Session, rows: List[Dict]) -> None:
+        """Ajoute au flux, dans la transaction en cours, des lignes au format des transactions."""
+        if rows:
+            session.execute(bulk_insert_events_stmt, rows)
+            # Lu par change_feed après le commit pour réveiller les long-polls
+            session.info["events_appended"] = True
+
+    @staticmethod
+    def append_inserted(session: Session, after_id: int) -> None:
+        """Ajoute au flux les transactions insérées en masse par la transaction en cours après after_id."""
+        if session.execute(events_from_transactions_stmt(after_id)).rowcount:
+            session.info["events_appended"] = True
+
+    @staticmethod
+    def get_after(session: Session, after_seq: int, limit: int) -> list:
+        return session.execute(events_after_stmt(after_seq, limit)).all()
+
+    @staticmethod
+    def has_unsequenced(session: Session) -> bool:
+        return session.execute(unsequenced_events_stmt(1)).first() is not None
+
+    @staticmethod
+    def sequence_pending(session: Session, limit: int) -> int:
+        """
+        Numérote (seq) au plus limit événements validés pas encore numérotés, dans l'ordre des ids ;
+        retourne leur nombre. Le verrou de la séquence est pris en premier : les événements d'un
+        numéroteur précédent sont validés, et sous SQLite la transaction commence par son écriture.
+        """
+        start = SequenceDao.allocate(session, EVENT_SEQUENCE, 0)
+        ids = session.execute(unsequenced_events_stmt(limit)).scalars().all()
+        if not ids:
+            return 0
+        params, next_value = event_sequence(ids, start)
+        session.execute(sequence_events_stmt, params)
+        SequenceDao.allocate(session, EVENT_SEQUENCE, next_value - start)
+        return len(ids)
+
+
+class BalanceSnapshotDao:
+    @staticmethod
+    def get_latest_before(session: Session, account_id: int, before_day: date) -> Optional[Tuple[date, float]]:
+        row = session.execute(latest_snapshot_stmt(account_id, before_day)).one_or_none()
+        return (row.day, row.balance) if row else None
+
+    @staticmethod
+    def get_range(session: Session, account_id: int, start_day: date, end_day: date) -> Dict[date, float]:
+        return dict(session.execute(snapshot_range_stmt(account_id, start_day, end_day)).all())
+
+    @staticmethod
+    def get_latest_balances(session: Session, account_ids: List[int], before_day: date) -> Dict[int, float]:
+        return dict(session.execute(latest_snapshots_stmt(account_ids, before_day)).all())
+
+    @staticmethod
+    def bulk_insert(session: Session, rows: List[Dict]) -> None:
+        if rows:
+            session.execute(insert(BalanceSnapshot.__table__), rows)
+
+
+class MonthlyRollupDao:
+    @staticmethod
+    def get_all(session: Session, account_id: int) -> List[Dict]:
+        return [dict(row) for row in session.execute(rollups_stmt(account_id)).mappings()]
+
+    @staticmethod
+    def bulk_insert(session: Session, account_id: int, rows: List[Dict]) -> None:
+        if rows:
+            session.execute(insert(MonthlyRollup.__table__), [{**row, "account_id": account_id} for row in rows])
 
 
 class AccountDao:
@@ -57,9 +559,8 @@ class AccountDao:
 
     @staticmethod
     def get_by_id(session: Session, account_id: int) -> Optional[Account]:
-        stmt = select(Account).where(Account.id == account_id)
-        result = session.execute(stmt)
-        return result.scalar_one_or_none()
+        # session.get réutilise l'identity map : pas de requête si le compte est déjà chargé
+        return session.get(Account, account_id)
 
     @staticmethod
     def get_by_account_number(session: Session, account_number: str) -> Optional[Account]:
@@ -73,26 +574,48 @@ class AccountDao:
         result = session.execute(stmt)
         return list(result.scalars())
 
+    @staticmethod
+    def get_rows_by_user_id(session: Session, user_id: int) -> list:
+        """Comptes de l'utilisateur en lignes (colonnes de AccountResponse), sans objets ORM."""
+        return session.execute(accounts_by_user_stmt(user_id)).all()
+
     @staticmethod
     def delete_account(session: Session, account_id: int) -> bool:
-        stmt = select(Account).where(Account.id == account_id)
-        result = session.execute(stmt)
-        account = result.scalar_one_or_none()
-        if account:
-            session.delete(account)
-            session.commit()
-            return True
-        return False
+        # Transactions, soldes journaliers et agrégats mensuels : ON DELETE CASCADE
+        deleted = session.execute(delete_by_ids_stmt(Account, [account_id])).rowcount == 1
+        session.commit()
+        return deleted
 
     @staticmethod
-    def update_balance(session: Session, account_id: int, new_balance: float) -> bool:
-        stmt = select(Account).where(Account.id == account_id)
-        result = session.execute(stmt)
-        account = result.scalar_one_or_none()
-        if account:
-            account.balance = new_balance
-            return True
-        return False
+    def get_ids_by_account_numbers(session: Session, account_numbers: Iterable[str]) -> Dict[str, int]:
+        result = session.execute(account_ids_by_number_stmt(account_numbers))
+        return dict(result.all())
+
+    @staticmethod
+    def get_owners_and_balances(session: Session, account_ids: Iterable[int]) -> List[Tuple[int, int, float]]:
+        return session.execute(owners_and_balances_stmt(account_ids)).all()
+
+    @staticmethod
+    def lock_funds(session: Session, account_id: int) -> Optional[Tuple[float, float]]:
+        row = session.execute(lock_funds_stmt(account_id)).one_or_none()
+        return (row.balance, row.overdraft_limit) if row else None
+
+    @staticmethod
+    def bulk_credit(session: Session, credits: List[Dict]) -> None:
+        if credits:
+            session.execute(bulk_credit_stmt, credits)
+
+    @staticmethod
+    def get_interest_chunk(session: Session, after_id: int, limit: int) -> List[Tuple[int, float, float]]:
+        return session.execute(interest_chunk_stmt(after_id, limit)).all()
+
+    @staticmethod
+    def credit(session: Session, account_id: int, amount: float) -> bool:
+        return session.execute(credit_stmt(account_id, amount)).rowcount == 1
+
+    @staticmethod
+    def debit(session: Session, account_id: int, amount: float) -> bool:
+        return session.execute(debit_stmt(account_id, amount)).rowcount == 1
 
 
 class TransactionDao:
@@ -101,11 +624,38 @@ class TransactionDao:
         session.add(transaction)
         return transaction
 
+    @staticmethod
+    def bulk_insert(session: Session, rows: List[Dict]) -> None:
+        if rows:
+            session.execute(bulk_insert_transactions_stmt, rows)
+
+    @staticmethod
+    def get_max_id(session: Session) -> int:
+        return session.execute(max_transaction_id_stmt).scalar_one()
+
+    @staticmethod
+    def delete_oldest(session: Session, account_id: int, limit: int, before: Optional[datetime] = None) -> int:
+        """Supprime au plus limit transactions du compte (les plus anciennes, antérieures à before) ; retourne leur nombre."""
+        ids = list(session.execute(oldest_transaction_ids_stmt(account_id, limit, before)).scalars())
+        if ids:
+            session.execute(delete_by_ids_stmt(Transaction, ids))
+        return len(ids)
+
+    @staticmethod
+    def get_monthly_aggregates(
+        session: Session, account_id: int, start: Optional[datetime], end: Optional[datetime]
+    ) -> List[Dict]:
+        return monthly_rows(session.execute(monthly_aggregates_stmt(account_id, start, end)))
+
     @staticmethod
     def get_by_id(session: Session, transaction_id: int) -> Optional[Transaction]:
-        stmt = select(Transaction).where(Transaction.id == transaction_id)
-        result = session.execute(stmt)
-        return result.scalar_one_or_none()
+        return session.get(Transaction, transaction_id)
+
+    @staticmethod
+    def get_with_owner(session: Session, transaction_id: int) -> Optional[Tuple[Transaction, int]]:
+        result = session.execute(transaction_with_owner_stmt(transaction_id))
+        row = result.one_or_none()
+        return (row[0], row[1]) if row else None
 
     @staticmethod
     def get_by_account_id(session: Session, account_id: int) -> List[Transaction]:
@@ -114,13 +664,63 @@ class TransactionDao:
         return list(result.scalars())
 
     @staticmethod
-    def get_by_account_id_and_date_range(
-        session: Session, account_id: int, start_date, end_date
-    ) -> List[Transaction]:
-        stmt = select(Transaction).where(
-            Transaction.account_id == account_id,
-            Transaction.created_at >= start_date,
-            Transaction.created_at <= end_date
-        )
-        result = session.execute(stmt)
-        return list(result.scalars())
\ No newline at end of file
+    def get_page(
+        session: Session,
+        account_id: int,
+        filters: TransactionFilter,
+        limit: int,
+        before: Optional[Tuple[datetime, int]] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> list:
+        return session.execute(transaction_page_stmt(account_id, filters, limit, before, after)).all()
+
+    @staticmethod
+    def get_opening_balance(session: Session, account_id: int, start_date: Optional[datetime] = None) -> Optional[float]:
+        return session.execute(opening_balance_stmt(account_id, start_date)).scalar_one_or_none()
+
+    @staticmethod
+    def get_first_day(session: Session) -> Optional[date]:
+        first = session.execute(select(func.min(Transaction.created_at))).scalar_one()
+        return first.date() if first else None
+
+    @staticmethod
+    def sum_amounts(session: Session, account_id: int, start: Optional[datetime], end: datetime) -> float:
+        return session.execute(amount_sum_stmt(account_id, start, end)).scalar_one()
+
+    @staticmethod
+    def get_daily_sums(session: Session, start: datetime, end: datetime, account_id: Optional[int] = None) -> List[Tuple[int, date, float]]:
+        return [
+            (row.account_id, as_date(row.day), row.amount)
+            for row in session.execute(daily_sums_stmt(start, end, account_id))
+        ]
+
+    @staticmethod
+    def iter_archive_chunks(session: Session, start: datetime, end: datetime, chunk_size: int) -> Iterator[list]:
+        """Transactions de [start, end) par blocs, triées par (account_id, created_at, id)."""
+        after = None
+        while True:
+            rows = session.execute(archive_chunk_stmt(start, end, chunk_size, after)).all()
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            after = (rows[-1].account_id, rows[-1].created_at, rows[-1].id)
+
+    @staticmethod
+    def iter_statement_chunks(
+        session: Session,
+        account_id: int,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        chunk_size: int,
+    ) -> Iterator[list]:
+        # Parcours par clé (created_at, id) bloc par bloc : mysql-connector ne propose pas de
+        # curseur côté serveur (stream_results serait bufferisé), la mémoire reste ainsi bornée.
+        after = None
+        while True:
+            rows = session.execute(statement_chunk_stmt(account_id, start_date, end_date, chunk_size, after)).all()
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            after = (rows[-1].created_at, rows[-1].id)
@@ -0,0 +1,274 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, update, insert, delete
+from entities import User, Account, Transaction, JobCheckpoint, MonthlyRollup
+from dal import (
+    credit_stmt, debit_stmt, transaction_with_owner_stmt, transaction_page_stmt,
+    opening_balance_stmt, statement_chunk_stmt, account_ids_by_number_stmt, lock_funds_stmt, owners_and_balances_stmt,
+    bulk_credit_stmt, bulk_insert_transactions_stmt, latest_snapshot_stmt, snapshot_range_stmt,
+    amount_sum_stmt, daily_sums_stmt, as_date, monthly_aggregates_stmt, monthly_rows, rollups_stmt,
+    user_page_stmt, accounts_by_user_stmt, oldest_transaction_ids_stmt, delete_by_ids_stmt, bulk_insert_events_stmt, events_after_stmt,
+    max_transaction_id_stmt, events_from_transactions_stmt,
+)
+from dto import TransactionFilter, UserFilter
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from datetime import date, datetime
+
+
+class AsyncUserDao:
+    @staticmethod
+    async def create_user(session: AsyncSession, user: User) -> User:
+        try:
+            session.add(user)
+            await session.commit()
+            await session.refresh(user)
+            return user
+        except IntegrityError:
+            await session.rollback()
+            raise ValueError("EMAIL_ALREADY_EXISTS")
+
+    @staticmethod
+    async def search_by_email(session: AsyncSession, email: str) -> Optional[User]:
+        stmt = select(User).where(User.email == email)
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_by_id(session: AsyncSession, user_id: int) -> Optional[User]:
+        return await session.get(User, user_id)
+
+    @staticmethod
+    async def delete_user(session: AsyncSession, email: str) -> bool:
+        stmt = delete(User).where(User.email == email).execution_options(synchronize_session=False)
+        result = await session.execute(stmt)
+        await session.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    async def update_password(session: AsyncSession, user_id: int, password_hash: str) -> None:
+        await session.execute(update(User).where(User.id == user_id).values(password=password_hash))
+
+    @staticmethod
+    async def get_page(
+        session: AsyncSession,
+        filters: UserFilter,
+        limit: int,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        descending: bool = True,
+    ) -> list:
+        result = await session.execute(user_page_stmt(filters, limit, cursor, descending))
+        return result.all()
+
+    @staticmethod
+    async def iter_chunks(
+        session: AsyncSession, filters: UserFilter, chunk_size: int, descending: bool = True
+    ) -> AsyncIterator[list]:
+        cursor = None
+        while True:
+            result = await session.execute(user_page_stmt(filters, chunk_size, cursor, descending))
+            rows = result.all()
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            cursor = (rows[-1].created_at, rows[-1].id)
+
+
+class AsyncJobCheckpointDao:
+    @staticmethod
+    async def get(session: AsyncSession, name: str) -> Optional[str]:
+        checkpoint = await session.get(JobCheckpoint, name)
+        return checkpoint.position if checkpoint else None
+
+
+class AsyncEventDao:
+    @staticmethod
+    async def append(session: AsyncSession, rows: List[Dict]) -> None:
+        if rows:
+            await session.execute(bulk_insert_events_stmt, rows)
+            session.info["events_appended"] = True
+
+    @staticmethod
+    async def append_inserted(session: AsyncSession, after_id: int) -> None:
+        result = await session.execute(events_from_transactions_stmt(after_id))
+        if result.rowcount:
+            session.info["events_appended"] = True
+
+    @staticmethod
+    async def get_after(session: AsyncSession, after_seq: int, limit: int) -> list:
+        result = await session.execute(events_after_stmt(after_seq, limit))
+        return result.all()
+
+
+class AsyncBalanceSnapshotDao:
+    @staticmethod
+    async def get_latest_before(session: AsyncSession, account_id: int, before_day: date) -> Optional[Tuple[date, float]]:
+        result = await session.execute(latest_snapshot_stmt(account_id, before_day))
+        row = result.one_or_none()
+        return (row.day, row.balance) if row else None
+
+    @staticmethod
+    async def get_range(session: AsyncSession, account_id: int, start_day: date, end_day: date) -> Dict[date, float]:
+        result = await session.execute(snapshot_range_stmt(account_id, start_day, end_day))
+        return dict(result.all())
+
+
+class AsyncMonthlyRollupDao:
+    @staticmethod
+    async def get_all(session: AsyncSession, account_id: int) -> List[Dict]:
+        result = await session.execute(rollups_stmt(account_id))
+        return [dict(row) for row in result.mappings()]
+
+    @staticmethod
+    async def bulk_insert(session: AsyncSession, account_id: int, rows: List[Dict]) -> None:
+        if rows:
+            await session.execute(insert(MonthlyRollup.__table__), [{**row, "account_id": account_id} for row in rows])
+
+
+class AsyncAccountDao:
+    @staticmethod
+    async def create_account(session: AsyncSession, account: Account) -> Account:
+        session.add(account)
+        await session.commit()
+        await session.refresh(account)
+        return account
+
+    @staticmethod
+    async def get_by_id(session: AsyncSession, account_id: int) -> Optional[Account]:
+        return await session.get(Account, account_id)
+
+    @staticmethod
+    async def get_by_account_number(session: AsyncSession, account_number: str) -> Optional[Account]:
+        stmt = select(Account).where(Account.account_number == account_number)
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_by_user_id(session: AsyncSession, user_id: int) -> List[Account]:
+        stmt = select(Account).where(Account.user_id == user_id)
+        result = await session.execute(stmt)
+        return list(result.scalars())
+
+    @staticmethod
+    async def get_rows_by_user_id(session: AsyncSession, user_id: int) -> list:
+        result = await session.execute(accounts_by_user_stmt(user_id))
+        return result.all()
+
+    @staticmethod
+    async def delete_account(session: AsyncSession, account_id: int) -> bool:
+        result = await session.execute(delete_by_ids_stmt(Account, [account_id]))
+        await session.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    async def credit(session: AsyncSession, account_id: int, amount: float) -> bool:
+        result = await session.execute(credit_stmt(account_id, amount))
+        return result.rowcount == 1
+
+    @staticmethod
+    async def debit(session: AsyncSession, account_id: int, amount: float) -> bool:
+        result = await session.execute(debit_stmt(account_id, amount))
+        return result.rowcount == 1
+
+    @staticmethod
+    async def get_ids_by_account_numbers(session: AsyncSession, account_numbers: Iterable[str]) -> Dict[str, int]:
+        result = await session.execute(account_ids_by_number_stmt(account_numbers))
+        return dict(result.all())
+
+    @staticmethod
+    async def get_owners_and_balances(session: AsyncSession, account_ids: Iterable[int]) -> List[Tuple[int, int, float]]:
+        result = await session.execute(owners_and_balances_stmt(account_ids))
+        return result.all()
+
+    @staticmethod
+    async def lock_funds(session: AsyncSession, account_id: int) -> Optional[Tuple[float, float]]:
+        result = await session.execute(lock_funds_stmt(account_id))
+        row = result.one_or_none()
+        return (row.balance, row.overdraft_limit) if row else None
+
+    @staticmethod
+    async def bulk_credit(session: AsyncSession, credits: List[Dict]) -> None:
+        if credits:
+            await session.execute(bulk_credit_stmt, credits)
+
+
+class AsyncTransactionDao:
+    @staticmethod
+    def create_transaction(session: AsyncSession, transaction: Transaction) -> Transaction:
+        session.add(transaction)
+        return transaction
+
+    @staticmethod
+    async def bulk_insert(session: AsyncSession, rows: List[Dict]) -> None:
+        if rows:
+            await session.execute(bulk_insert_transactions_stmt, rows)
+
+    @staticmethod
+    async def get_max_id(session: AsyncSession) -> int:
+        result = await session.execute(max_transaction_id_stmt)
+        return result.scalar_one()
+
+    @staticmethod
+    async def delete_oldest(session: AsyncSession, account_id: int, limit: int) -> int:
+        result = await session.execute(oldest_transaction_ids_stmt(account_id, limit))
+        ids = list(result.scalars())
+        if ids:
+            await session.execute(delete_by_ids_stmt(Transaction, ids))
+        return len(ids)
+
+    @staticmethod
+    async def get_monthly_aggregates(
+        session: AsyncSession, account_id: int, start: Optional[datetime], end: Optional[datetime]
+    ) -> List[Dict]:
+        return monthly_rows(await session.execute(monthly_aggregates_stmt(account_id, start, end)))
+
+    @staticmethod
+    async def get_with_owner(session: AsyncSession, transaction_id: int) -> Optional[Tuple[Transaction, int]]:
+        result = await session.execute(transaction_with_owner_stmt(transaction_id))
+        row = result.one_or_none()
+        return (row[0], row[1]) if row else None
+
+    @staticmethod
+    async def get_page(
+        session: AsyncSession,
+        account_id: int,
+        filters: TransactionFilter,
+        limit: int,
+        before: Optional[Tuple[datetime, int]] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> list:
+        result = await session.execute(transaction_page_stmt(account_id, filters, limit, before, after))
+        return result.all()
+
+    @staticmethod
+    async def get_opening_balance(session: AsyncSession, account_id: int, start_date: Optional[datetime] = None) -> Optional[float]:
+        result = await session.execute(opening_balance_stmt(account_id, start_date))
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def sum_amounts(session: AsyncSession, account_id: int, start: Optional[datetime], end: datetime) -> float:
+        result = await session.execute(amount_sum_stmt(account_id, start, end))
+        return result.scalar_one()
+
+    @staticmethod
+    async def get_daily_sums(session: AsyncSession, start: datetime, end: datetime, account_id: Optional[int] = None) -> List[Tuple[int, date, float]]:
+        result = await session.execute(daily_sums_stmt(start, end, account_id))
+        return [(row.account_id, as_date(row.day), row.amount) for row in result]
+
+    @staticmethod
+    async def iter_statement_chunks(
+        session: AsyncSession,
+        account_id: int,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        chunk_size: int,
+    ) -> AsyncIterator[list]:
+        after = None
+        while True:
+            result = await session.execute(statement_chunk_stmt(account_id, start_date, end_date, chunk_size, after))
+            rows = result.all()
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            after = (rows[-1].created_at, rows[-1].id)
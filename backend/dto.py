@@ -1,6 +1,6 @@
-from datetime import datetime
-from pydantic import BaseModel
-from typing import Optional
+from datetime import date, datetime
+from pydantic import BaseModel, Field
+from typing import Optional, List
 
 class UserRequest(BaseModel):
     email: str
@@ -22,6 +22,16 @@ class UserResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class UserFilter(BaseModel):
+    is_admin: Optional[bool] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+
+class UserPage(BaseModel):
+    items: List[UserResponse]
+    # Curseur de la page suivante (paramètre cursor), dans l'ordre demandé
+    next_cursor: Optional[str] = None
+
 class AccountRequest(BaseModel):
     user_id: int
     account_number: Optional[str] = None
@@ -42,6 +52,19 @@ class AccountResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class AccountInfo(BaseModel):
+    """Métadonnées d'un compte mises en cache : jamais le solde, toujours lu en base."""
+    id: int
+    user_id: int
+    account_number: str
+    account_type: str
+    overdraft_limit: float
+    interest_rate: float
+    created_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
 class TransactionRequest(BaseModel):
     account_id: int
     transaction_type: str
@@ -57,4 +80,103 @@ class TransactionResponse(BaseModel):
     created_at: datetime
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class TransactionFilter(BaseModel):
+    transaction_types: Optional[List[str]] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+
+class TransactionPage(BaseModel):
+    items: List[TransactionResponse]
+    # next_cursor -> éléments plus anciens (paramètre before), prev_cursor -> plus récents (after)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+class BalanceAtResponse(BaseModel):
+    account_id: int
+    at: datetime
+    balance: float
+
+class DailyBalance(BaseModel):
+    day: date
+    balance: float
+
+class BalanceHistoryResponse(BaseModel):
+    account_id: int
+    start_date: date
+    end_date: date
+    # Solde de fin de journée pour chaque jour de l'intervalle
+    items: List[DailyBalance]
+
+# Nombre maximal de virements par lot
+BATCH_TRANSFER_MAX_ITEMS = 10000
+
+class TypeTotals(BaseModel):
+    transaction_type: str
+    count: int
+    total: float
+    min_amount: float
+    max_amount: float
+
+class MonthlyAnalytics(BaseModel):
+    month: date
+    count: int
+    income: float
+    spending: float
+    net: float
+    min_amount: float
+    max_amount: float
+    by_type: List[TypeTotals]
+
+class AccountAnalyticsResponse(BaseModel):
+    account_id: int
+    # Mois avec au moins une transaction, du plus ancien au mois en cours
+    months: List[MonthlyAnalytics]
+
+class BatchTransferItem(BaseModel):
+    to_account_number: str
+    amount: float
+    description: Optional[str] = None
+
+class BatchTransferRequest(BaseModel):
+    transfers: List[BatchTransferItem] = Field(..., min_items=1, max_items=BATCH_TRANSFER_MAX_ITEMS)
+    # atomic=True : tout ou rien ; False : les virements valides passent, les autres sont rejetés
+    atomic: bool = True
+
+class BatchTransferRejection(BaseModel):
+    index: int
+    to_account_number: str
+    amount: float
+    reason: str
+
+class BatchTransferResponse(BaseModel):
+    accepted: int
+    rejected: int
+    total_amount: float
+    # Code d'échec du lot entier (mode atomique ou fonds insuffisants), sinon None
+    error: Optional[str] = None
+    # Seuls les virements rejetés sont détaillés : les autres sont acceptés
+    rejections: List[BatchTransferRejection] = []
+
+class EventResponse(BaseModel):
+    id: int
+    # Position dans le flux (curseur after, id des messages SSE)
+    seq: int
+    # Ligne de t_transactions du mouvement (absente des événements antérieurs à la colonne)
+    transaction_id: Optional[int] = None
+    account_id: int
+    transaction_type: str
+    amount: float
+    description: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class EventPage(BaseModel):
+    items: List[EventResponse]
+    # Curseur à repasser dans after : seq du dernier événement livré (inchangé si la page est vide)
+    next_cursor: int
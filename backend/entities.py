@@ -1,8 +1,16 @@
 from config import Base
-from sqlalchemy import Column, Integer, String, Float, DateTime, func, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, func, Boolean, ForeignKey, Index
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from typing import Optional
 
+# Sous SQLite, CURRENT_TIMESTAMP n'a pas de microsecondes : les paramètres Python doivent
+# être rendus au même format pour que les comparaisons d'égalité (curseurs) fonctionnent.
+Timestamp = DateTime().with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
 class User(Base):
     __tablename__ = 't_users'
 
@@ -13,10 +21,18 @@ class User(Base):
     last_name = Column(String(128), nullable=True)
     phone = Column(String(20), nullable=True)
     is_admin = Column(Boolean, default=False)
-    created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Liste des utilisateurs paginée par clé (created_at, id)
+        Index('ix_users_created_id', 'created_at', 'id'),
+        # SQLite : sans AUTOINCREMENT, l'id d'un utilisateur supprimé serait réattribué (et ses jetons avec)
+        {'sqlite_autoincrement': True},
+    )
 
-    accounts = relationship("Account", back_populates="user", cascade="all, delete-orphan")
+    # ON DELETE CASCADE en base : la suppression ne charge pas les comptes (passive_deletes)
+    accounts = relationship("Account", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
 
     def __init__(
         self, 
@@ -37,18 +53,22 @@ class User(Base):
 
 class Account(Base):
     __tablename__ = 't_accounts'
+    # SQLite : jamais d'id réattribué, l'archive et le cache de métadonnées sont indexés par id
+    __table_args__ = {'sqlite_autoincrement': True}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey('t_users.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('t_users.id', ondelete='CASCADE'), nullable=False)
     account_number = Column(String(20), unique=True, index=True, nullable=False)
     account_type = Column(String(20), nullable=False)
     balance = Column(Float, default=0.0)
     overdraft_limit = Column(Float, default=0.0)
     interest_rate = Column(Float, default=0.0)
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
 
     user = relationship("User", back_populates="accounts")
-    transactions = relationship("Transaction", back_populates="account", cascade="all, delete-orphan")
+    transactions = relationship("Transaction", back_populates="account", cascade="all, delete-orphan", passive_deletes=True)
+    balance_snapshots = relationship("BalanceSnapshot", cascade="all, delete-orphan", passive_deletes=True)
+    monthly_rollups = relationship("MonthlyRollup", cascade="all, delete-orphan", passive_deletes=True)
 
     def __init__(
         self,
@@ -69,13 +89,19 @@ class Account(Base):
 
 class Transaction(Base):
     __tablename__ = 't_transactions'
+    __table_args__ = (
+        # Historique paginé par curseur (created_at, id) pour un compte
+        Index('ix_transactions_account_created_id', 'account_id', 'created_at', 'id'),
+        # SQLite : ids jamais réattribués, ceux des lignes archivées compris
+        {'sqlite_autoincrement': True},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    account_id = Column(Integer, ForeignKey('t_accounts.id'), nullable=False)
+    account_id = Column(Integer, ForeignKey('t_accounts.id', ondelete='CASCADE'), nullable=False)
     transaction_type = Column(String(20), nullable=False)
     amount = Column(Float, nullable=False)
     description = Column(String(255), nullable=True)
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
 
     account = relationship("Account", back_populates="transactions")
 
@@ -89,4 +115,96 @@ class Transaction(Base):
         self.account_id = account_id
         self.transaction_type = transaction_type
         self.amount = amount
-        self.description = description
\ No newline at end of file
+        self.description = description
+
+
+class Sequence(Base):
+    """Compteurs applicatifs (numéros de compte...) distribués par blocs."""
+    __tablename__ = 't_sequences'
+
+    name = Column(String(64), primary_key=True)
+    next_value = Column(BigInteger, nullable=False)
+
+    def __init__(self, name: str, next_value: int = 1):
+        self.name = name
+        self.next_value = next_value
+
+
+class BalanceSnapshot(Base):
+    """Solde de fin de journée d'un compte, uniquement pour les jours avec des mouvements."""
+    __tablename__ = 't_balance_snapshots'
+
+    account_id = Column(Integer, ForeignKey('t_accounts.id', ondelete='CASCADE'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    balance = Column(Float, nullable=False)
+
+    def __init__(self, account_id: int, day, balance: float):
+        self.account_id = account_id
+        self.day = day
+        self.balance = balance
+
+
+class MonthlyRollup(Base):
+    """Agrégats d'un mois clos par type de transaction : calculés une fois, jamais recalculés."""
+    __tablename__ = 't_monthly_rollups'
+
+    account_id = Column(Integer, ForeignKey('t_accounts.id', ondelete='CASCADE'), primary_key=True)
+    month = Column(Date, primary_key=True)
+    transaction_type = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    credits = Column(Float, nullable=False)
+    debits = Column(Float, nullable=False)
+    min_amount = Column(Float, nullable=False)
+    max_amount = Column(Float, nullable=False)
+
+
+class Event(Base):
+    """
+    Flux des mouvements (outbox), écrit dans la transaction du mouvement. Append-only, sans clé
+    étrangère : survit à la suppression du compte. transaction_id relie l'événement à sa ligne de
+    t_transactions (NULL pour les événements antérieurs à la colonne). Le curseur de GET /events est
+    seq, attribué après le commit dans l'ordre où les événements deviennent visibles (voir
+    EventDao.sequence_pending) : l'id, attribué à l'insertion, peut devenir visible après des ids plus grands.
+    """
+    __tablename__ = 't_events'
+    __table_args__ = (
+        # Lecture du flux par seq ; les événements pas encore numérotés (NULL) se trouvent par id
+        Index('ix_events_seq', 'seq', unique=True),
+        # Rapprochement avec le grand livre, et événements déjà copiés d'une insertion groupée
+        Index('ix_events_transaction', 'transaction_id'),
+    )
+
+    # BIGINT en MySQL ; INTEGER sous SQLite, seul type alias du rowid auto-incrémenté
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    account_id = Column(Integer, nullable=False)
+    transaction_type = Column(String(20), nullable=False)
+    amount = Column(Float, nullable=False)
+    description = Column(String(255), nullable=True)
+    created_at = Column(Timestamp, server_default=func.now())
+    seq = Column(BigInteger, nullable=True)
+    transaction_id = Column(Integer, nullable=True)
+
+
+class JobCheckpoint(Base):
+    """Point de reprise des traitements batch (dernier jour traité, dernière clé...)."""
+    __tablename__ = 't_job_checkpoints'
+
+    name = Column(String(64), primary_key=True)
+    position = Column(String(255), nullable=False)
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now())
+
+    def __init__(self, name: str, position: str):
+        self.name = name
+        self.position = position
+
+
+class SchemaMigration(Base):
+    """Migrations appliquées par migrate.py, avec la position du backfill tant qu'il n'est pas terminé."""
+    __tablename__ = 't_schema_migrations'
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(128), nullable=False)
+    applied_at = Column(Timestamp, server_default=func.now())
+    backfill_done = Column(Boolean, nullable=False, default=True)
+    backfill_position = Column(String(255), nullable=True)
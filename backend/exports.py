@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Sequence
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Encodage des exports par blocs : chaque bloc de lignes lu en base devient un bloc d'octets,
+# la mémoire reste bornée par la taille d'un bloc quelle que soit la taille de l'export.
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Type non sérialisable: {type(value)!r}")
+
+
+def dumps(value: Any) -> bytes:
+    """JSON compact ; orjson (datetimes natifs, même format ISO 8601) s'il est installé."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class FastJSONResponse(Response):
+    """
+    Réponse des listes : dicts de lignes projetées (colonnes du schéma de réponse) encodés tels quels,
+    sans objets pydantic ni jsonable_encoder. Le response_model de la route reste le contrat documenté.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def encode_csv(rows: List[Dict], columns: Sequence[str], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def encode_ndjson(rows: List[Dict]) -> bytes:
+    return b"".join(dumps(row) + b"\n" for row in rows)
+
+
+def encode_chunks(chunks: Iterable[List[Dict]], fmt: str, columns: Sequence[str]) -> Iterator[bytes]:
+    if fmt == "csv":
+        yield encode_csv([], columns, header=True)
+    for rows in chunks:
+        yield encode_csv(rows, columns) if fmt == "csv" else encode_ndjson(rows)
+
+
+async def aencode_chunks(chunks: AsyncIterable[List[Dict]], fmt: str, columns: Sequence[str]) -> AsyncIterator[bytes]:
+    if fmt == "csv":
+        yield encode_csv([], columns, header=True)
+    async for rows in chunks:
+        yield encode_csv(rows, columns) if fmt == "csv" else encode_ndjson(rows)
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 31 = en-tête et somme de contrôle gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def agzip_stream(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,218 @@
+"""
+Test de charge HTTP de l'API bancaire : main.app en processus (httpx, ASGI), sur une base
+SQLite jetable peuplée d'utilisateurs, de comptes et de transactions.
+
+Des utilisateurs virtuels enchaînent un mélange réaliste (connexion, /auth/me, liste des comptes,
+dépôt, retrait, virement, historique) ; le rapport JSON donne par endpoint le débit, les latences
+p50 / p95 / p99 et le taux d'erreur, et peut être comparé à une référence stockée (code 1 si régression).
+
+Usage : python loadtest.py [--users N] [--concurrency N] [--duration S] [--output r.json] [--baseline ref.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+# benchmarks positionne DATABASE_URL avant l'import de config
+from benchmarks import use_database, seed_transactions, percentile
+import httpx
+from sqlalchemy import insert, select
+from config import LocalSession
+from entities import User, Account
+from auth import get_password_hash
+
+PASSWORD = "LoadTest-2024!"
+# Poids du mélange : majoritairement des lectures, comme le trafic du frontend
+MIX = {
+    "login": 2,
+    "me": 15,
+    "accounts": 20,
+    "deposit": 12,
+    "withdraw": 10,
+    "transfer": 10,
+    "history": 25,
+}
+
+
+def seed(users: int, accounts_per_user: int, transactions: int) -> List[Dict]:
+    """Utilisateurs (même mot de passe, haché une fois), comptes et historiques ; retourne leurs identifiants."""
+    password_hash = get_password_hash(PASSWORD)
+    with LocalSession() as session:
+        session.execute(insert(User), [
+            {"email": f"load{i}@example.com", "password": password_hash} for i in range(users)
+        ])
+        user_ids = list(session.execute(select(User.id).order_by(User.id)).scalars())
+        # Numéros au format historique (10 chiffres) : hors de la plage de la séquence
+        session.execute(insert(Account), [
+            {"user_id": user_id, "account_number": f"{k + 1}{user_id:09d}", "account_type": "current",
+             "balance": 1_000_000.0}
+            for user_id in user_ids for k in range(accounts_per_user)
+        ])
+        rows = session.execute(select(Account.user_id, Account.id, Account.account_number).order_by(Account.id)).all()
+        session.commit()
+    seeded = {user_id: {"user_id": user_id, "email": f"load{i}@example.com", "accounts": []}
+              for i, user_id in enumerate(user_ids)}
+    for user_id, account_id, account_number in rows:
+        seeded[user_id]["accounts"].append((account_id, account_number))
+        if transactions:
+            seed_transactions(account_id, transactions)
+    return list(seeded.values())
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, elapsed: float, ok: bool) -> None:
+        self.latencies[endpoint].append(elapsed)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def report(self, elapsed: float) -> Dict:
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            endpoints[endpoint] = summarize(values, self.errors[endpoint], elapsed)
+        everything = [value for values in self.latencies.values() for value in values]
+        return {"endpoints": endpoints, "total": summarize(everything, sum(self.errors.values()), elapsed)}
+
+
+def summarize(values: List[float], errors: int, elapsed: float) -> Dict:
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "error_rate": round(errors / len(values), 4) if values else 0.0,
+        "rps": round(len(values) / elapsed, 1),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+    }
+
+
+async def virtual_user(client: httpx.AsyncClient, users: List[Dict], recorder: Recorder, rng: random.Random,
+                       deadline: float, remaining: List[int], delay: float) -> None:
+    await asyncio.sleep(delay)
+    user = rng.choice(users)
+    names, weights = list(MIX), list(MIX.values())
+    headers = {}
+    operation = "login"
+    while time.perf_counter() < deadline and remaining[0] > 0:
+        remaining[0] -= 1
+        account_id, _ = rng.choice(user["accounts"])
+        started = time.perf_counter()
+        if operation == "login":
+            response = await client.post("/auth/login", json={"email": user["email"], "password": PASSWORD})
+            if response.status_code == 200:
+                headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        elif operation == "me":
+            response = await client.get("/auth/me", headers=headers)
+        elif operation == "accounts":
+            response = await client.get(f"/accounts/user/{user['user_id']}", headers=headers)
+        elif operation == "deposit":
+            response = await client.post(f"/accounts/{account_id}/deposit", params={"amount": 10.0}, headers=headers)
+        elif operation == "withdraw":
+            response = await client.post(f"/accounts/{account_id}/withdraw", params={"amount": 5.0}, headers=headers)
+        elif operation == "transfer":
+            _, target_number = rng.choice(rng.choice(users)["accounts"])
+            response = await client.post(f"/accounts/{account_id}/transfer",
+                                         params={"to_account_number": target_number, "amount": 1.0}, headers=headers)
+        else:
+            response = await client.get(f"/transactions/account/{account_id}", params={"limit": 20}, headers=headers)
+        recorder.record(operation, time.perf_counter() - started, response.status_code < 400)
+        # Délestage (503) : comme un vrai client, attendre Retry-After avant de réessayer
+        if response.status_code == 503 and "retry-after" in response.headers:
+            await asyncio.sleep(min(float(response.headers["retry-after"]), max(deadline - time.perf_counter(), 0)))
+        # Sans jeton (connexion refusée), l'utilisateur retente de se connecter
+        operation = rng.choices(names, weights)[0] if headers else "login"
+
+
+async def run(users: List[Dict], concurrency: int, duration: float, max_requests: int, seed_value: int,
+              ramp_up: float) -> Dict:
+    from main import app
+
+    recorder = Recorder()
+    remaining = [max_requests]
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(app=app, base_url="http://loadtest", limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            virtual_user(client, users, recorder, random.Random(seed_value + i), deadline, remaining,
+                         ramp_up * i / concurrency)
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    return recorder.report(elapsed)
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Régressions par rapport à la référence : débit en baisse, p95 en hausse, erreurs en hausse."""
+    regressions = []
+    for endpoint, reference in baseline["endpoints"].items():
+        current = report["endpoints"].get(endpoint)
+        if current is None:
+            regressions.append(f"{endpoint} : absent du test")
+            continue
+        if current["rps"] < reference["rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint} : débit {reference['rps']} -> {current['rps']} req/s")
+        if current["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint} : p95 {reference['p95_ms']} -> {current['p95_ms']} ms")
+        if current["error_rate"] > reference["error_rate"] + 0.01:
+            regressions.append(f"{endpoint} : erreurs {reference['error_rate']:.2%} -> {current['error_rate']:.2%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge HTTP de l'API bancaire")
+    parser.add_argument("--users", type=int, default=200, help="utilisateurs créés")
+    parser.add_argument("--accounts-per-user", type=int, default=2, choices=range(1, 10), metavar="1-9")
+    parser.add_argument("--transactions", type=int, default=50, help="transactions par compte")
+    parser.add_argument("--concurrency", type=int, default=20, help="utilisateurs virtuels simultanés")
+    parser.add_argument("--duration", type=float, default=15.0, help="durée maximale (secondes)")
+    parser.add_argument("--ramp-up", type=float, default=3.0, help="démarrage échelonné des utilisateurs (secondes)")
+    parser.add_argument("--requests", type=int, default=sys.maxsize, help="nombre maximal de requêtes")
+    parser.add_argument("--seed", type=int, default=42, help="graine du mélange (reproductible)")
+    parser.add_argument("--output", help="écrit le rapport JSON dans ce fichier")
+    parser.add_argument("--baseline", help="rapport de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="écart toléré (0.2 = 20 %%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = use_database(os.path.join(tmp, "loadtest.db"), pool_size=args.concurrency)
+        started = time.perf_counter()
+        users = seed(args.users, args.accounts_per_user, args.transactions)
+        print(f"Base peuplée en {time.perf_counter() - started:.1f}s : {args.users} utilisateurs, "
+              f"{args.users * args.accounts_per_user} comptes, {args.transactions} transactions par compte")
+        report = asyncio.run(run(users, args.concurrency, args.duration, args.requests, args.seed,
+                                args.ramp_up))
+        engine.dispose()
+    report["config"] = {key: getattr(args, key) for key in
+                        ("users", "accounts_per_user", "transactions", "concurrency", "duration", "ramp_up", "seed")}
+
+    print(f"{'endpoint':10} {'requêtes':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erreurs':>8}")
+    for name, stats in list(report["endpoints"].items()) + [("total", report["total"])]:
+        print(f"{name:10} {stats['requests']:>9} {stats['rps']:>8} {stats['p50_ms']:>8} {stats['p95_ms']:>8} "
+              f"{stats['p99_ms']:>8} {stats['error_rate']:>8.2%}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"❌ {regression}")
+        if regressions:
+            return 1
+        print(f"✅ Aucune régression par rapport à {args.baseline} (tolérance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,25 @@
-from config import Base, engine
-from fastapi import FastAPI
-from controllers import router_users, router_accounts, router_transactions, router_auth
+from config import LocalSession, DB_ASYNC
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from auth import PasswordPoolSaturated, RequestUserMiddleware, token_cache
+from metadata_cache import metadata_cache
+import metrics
+import query_log
+from push import router_live
+from migrate import check_schema
+from change_feed import sequencer
+from services import EventService
+if DB_ASYNC:
+    from controllers_async import router_users, router_accounts, router_transactions, router_auth, router_events
+else:
+    from controllers import router_users, router_accounts, router_transactions, router_auth, router_events
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 
-def init_db():
-    metadata = getattr(Base, 'metadata')
-    metadata.create_all(bind=engine)
-
 app = FastAPI(title="Banking API", version="1.0")
+app.add_middleware(RequestUserMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:5173"],
@@ -16,24 +27,70 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if query_log.QUERY_LOG_ENABLED:
+    app.add_middleware(query_log.QueryLogMiddleware, routes=app.routes)
+# Ajouté en dernier : enveloppe tous les autres middlewares dans la mesure de latence
+app.add_middleware(metrics.MetricsMiddleware, routes=app.routes)
+metrics.register_cache("tokens", token_cache.stats)
+metrics.register_cache("metadata", lambda: metadata_cache.backend.stats())
+
+@app.exception_handler(PasswordPoolSaturated)
+async def password_pool_saturated(request: Request, exc: PasswordPoolSaturated):
+    # Rejet immédiat plutôt qu'une file d'attente qui bloquerait les threads des requêtes
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Serveur saturé, réessayez dans quelques instants"},
+        headers={"Retry-After": "1"},
+    )
 
 @app.on_event("startup")
 async def startup_event():
-    init_db()
-    print("Base de données initialisée")
+    # Une lecture de t_schema_migrations (create_all inspectait chaque table à chaque démarrage)
+    check_schema()
+    print("Schéma de la base à jour")
+    # Numérotation du flux t_events hors des lectures de GET /events
+    sequencer.start(EventService().sequence_pending)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    sequencer.stop()
+    if query_log.QUERY_LOG_ENABLED and query_log.QUERY_LOG_REPORT:
+        query_log.report.write(query_log.QUERY_LOG_REPORT)
+        print(f"Rapport des requêtes SQL : {query_log.QUERY_LOG_REPORT}")
 
 app.include_router(router_auth, tags=["Authentification"])
 app.include_router(router_users, tags=["Utilisateurs"])
 app.include_router(router_accounts, tags=["Comptes"])
 app.include_router(router_transactions, tags=["Transactions"])
+app.include_router(router_events, tags=["Événements"])
+app.include_router(router_live, tags=["Notifications"])
 
 @app.get("/")
 def root():
     return {"message": "Banking API is running", "version": "1.0"}
 
 @app.get("/health")
-def health_check():
-    return {"status": "healthy"}
+def health_check(ready: bool = False):
+    """Vivacité par défaut ; ?ready=true vérifie aussi que le service peut servir (pool, base)."""
+    if not ready:
+        return {"status": "healthy"}
+    problems = metrics.readiness_problems()
+    # Pool plein : le ping attendrait une connexion, la saturation passagère ne rend pas indisponible
+    if not problems and not metrics.pool_at_capacity("primary"):
+        try:
+            with LocalSession() as session:
+                session.execute(text("SELECT 1"))
+        except SQLAlchemyError as e:
+            problems.append(f"base de données injoignable: {e}")
+    if problems:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "problems": problems})
+    return {"status": "ready"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8080, reload=True)
+    # Sans compression WebSocket : ~300 Ko de contexte zlib par connexion pour des messages de
+    # quelques dizaines d'octets (en ligne de commande, railway.toml compris : --ws-per-message-deflate false)
+    uvicorn.run("main:app", host="0.0.0.0", port=8080, reload=True, ws_per_message_deflate=False)
@@ -0,0 +1,106 @@
+from typing import Optional, Type, TypeVar
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from cache import create_backend
+from dal import UserDao, AccountDao
+from dal_async import AsyncUserDao, AsyncAccountDao
+from dto import UserResponse, AccountInfo
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class MetadataCache:
+    """
+    Cache read-through devant UserDao.get_by_id, AccountDao.get_by_id et get_by_account_number.
+    Il ne contient que des métadonnées (propriétaire, numéro, type...) sérialisées en JSON :
+    les soldes sont toujours lus en base. Les absences ne sont pas mises en cache.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _user_key(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    @staticmethod
+    def _account_key(account_id: int) -> str:
+        return f"account:{account_id}"
+
+    @staticmethod
+    def _number_key(account_number: str) -> str:
+        return f"account_number:{account_number}"
+
+    def _get(self, key: str, model: Type[M]) -> Optional[M]:
+        raw = self.backend.get(key)
+        return model.parse_raw(raw) if raw is not None else None
+
+    def _put_account(self, info: AccountInfo) -> AccountInfo:
+        self.backend.set(self._account_key(info.id), info.json())
+        self.backend.set(self._number_key(info.account_number), str(info.id))
+        return info
+
+    def get_user(self, session: Session, user_id: int) -> Optional[UserResponse]:
+        info = self._get(self._user_key(user_id), UserResponse)
+        if info is None:
+            user = UserDao.get_by_id(session, user_id)
+            if not user:
+                return None
+            info = UserResponse.from_orm(user)
+            self.backend.set(self._user_key(user_id), info.json())
+        return info
+
+    def get_account(self, session: Session, account_id: int) -> Optional[AccountInfo]:
+        info = self._get(self._account_key(account_id), AccountInfo)
+        if info is None:
+            account = AccountDao.get_by_id(session, account_id)
+            if not account:
+                return None
+            info = self._put_account(AccountInfo.from_orm(account))
+        return info
+
+    def get_account_by_number(self, session: Session, account_number: str) -> Optional[AccountInfo]:
+        account_id = self.backend.get(self._number_key(account_number))
+        if account_id is not None:
+            return self.get_account(session, int(account_id))
+        account = AccountDao.get_by_account_number(session, account_number)
+        return self._put_account(AccountInfo.from_orm(account)) if account else None
+
+    async def aget_user(self, session: AsyncSession, user_id: int) -> Optional[UserResponse]:
+        info = self._get(self._user_key(user_id), UserResponse)
+        if info is None:
+            user = await AsyncUserDao.get_by_id(session, user_id)
+            if not user:
+                return None
+            info = UserResponse.from_orm(user)
+            self.backend.set(self._user_key(user_id), info.json())
+        return info
+
+    async def aget_account(self, session: AsyncSession, account_id: int) -> Optional[AccountInfo]:
+        info = self._get(self._account_key(account_id), AccountInfo)
+        if info is None:
+            account = await AsyncAccountDao.get_by_id(session, account_id)
+            if not account:
+                return None
+            info = self._put_account(AccountInfo.from_orm(account))
+        return info
+
+    async def aget_account_by_number(self, session: AsyncSession, account_number: str) -> Optional[AccountInfo]:
+        account_id = self.backend.get(self._number_key(account_number))
+        if account_id is not None:
+            return await self.aget_account(session, int(account_id))
+        account = await AsyncAccountDao.get_by_account_number(session, account_number)
+        return self._put_account(AccountInfo.from_orm(account)) if account else None
+
+    def invalidate_user(self, user_id: int) -> None:
+        self.backend.delete(self._user_key(user_id))
+
+    def invalidate_account(self, account_id: int, account_number: Optional[str] = None) -> None:
+        keys = [self._account_key(account_id)]
+        if account_number:
+            keys.append(self._number_key(account_number))
+        self.backend.delete(*keys)
+
+
+# Instance partagée par les services ; remplacer .backend pour changer de stockage (tests, benchmarks)
+metadata_cache = MetadataCache(create_backend())
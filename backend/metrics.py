@@ -0,0 +1,404 @@
+"""
+Métriques du processus au format texte Prometheus (exposition 0.0.4), exposées par GET /metrics.
+Compteurs, jauges et histogrammes en mémoire, sans dépendance : avec plusieurs workers,
+chaque processus expose les siens (à agréger côté Prometheus).
+"""
+import functools
+import inspect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.routing import Match
+
+# Requête SQL comptée comme lente au-delà de ce délai (secondes)
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "0.1"))
+# /health?ready=true échoue si des requêtes attendent une connexion du pool depuis plus longtemps
+POOL_SATURATION_SECONDS = float(os.getenv("POOL_SATURATION_SECONDS", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+REGISTRY: List["Metric"] = []
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> LabelKey:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Collected(Metric):
+    """Valeurs lues à chaque collecte : collect() retourne {valeurs des labels: valeur}."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], collect: Callable[[], Dict[LabelKey, float]],
+                 kind: str = "gauge"):
+        super().__init__(name, help, labels)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(self.collect().items())
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # Par jeu de labels : [compte par tranche (non cumulé), somme, nombre]
+        self._values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# --- Requêtes HTTP ---------------------------------------------------------------------------
+
+http_requests_in_flight = Gauge("http_requests_in_flight", "Requêtes HTTP en cours", ("route",))
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP (corps de réponse compris)", ("method", "route", "status")
+)
+http_request_queries = Histogram(
+    "http_request_queries", "Requêtes SQL exécutées par requête HTTP", ("route",), buckets=QUERY_COUNT_BUCKETS
+)
+
+# Compteur de requêtes SQL de la requête HTTP en cours (liste partagée avec les threads du threadpool)
+request_queries: ContextVar[Optional[List[int]]] = ContextVar("request_queries", default=None)
+
+
+def route_template(routes, scope) -> str:
+    """Chemin déclaré de la route (/accounts/{account_id}) : cardinalité bornée, pas d'id dans les labels."""
+    partial = None
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or "<inconnue>"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI : latence, requêtes en cours et nombre de requêtes SQL par route."""
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route = route_template(self.routes, scope)
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        queries = [0]
+        reset = request_queries.set(queries)
+        http_requests_in_flight.inc(route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec(route=route)
+            http_request_seconds.observe(time.perf_counter() - started, method=scope["method"], route=route, status=status[0])
+            http_request_queries.observe(queries[0], route=route)
+            request_queries.reset(reset)
+
+
+# --- Base de données -------------------------------------------------------------------------
+
+db_queries = Counter("db_queries_total", "Requêtes SQL exécutées", ("pool",))
+db_slow_queries = Counter("db_slow_queries_total", f"Requêtes SQL de plus de {SLOW_QUERY_SECONDS}s", ("pool",))
+db_query_seconds = Histogram("db_query_duration_seconds", "Durée des requêtes SQL", ("pool",))
+db_checkout_seconds = Histogram(
+    "db_pool_checkout_wait_seconds", "Attente d'une connexion du pool (ouverture comprise)", ("pool",)
+)
+
+# Engines instrumentés, par nom de pool
+_engines: Dict[str, object] = {}
+# Requêtes en attente d'une connexion, et depuis quand il y en a sans interruption
+_waiting: Dict[str, int] = {}
+_waiting_since: Dict[str, float] = {}
+_waiting_lock = threading.Lock()
+
+
+def _track_waiting(name: str, delta: int) -> None:
+    with _waiting_lock:
+        waiting = _waiting.get(name, 0) + delta
+        _waiting[name] = waiting
+        if waiting > 0:
+            _waiting_since.setdefault(name, time.monotonic())
+        else:
+            _waiting_since.pop(name, None)
+
+
+class _TimedPoolMixin:
+    """Mesure l'attente d'une connexion ; le nom du pool est son logging_name (conservé par recreate())."""
+    def _do_get(self):
+        name = self.logging_name or "default"
+        started = time.perf_counter()
+        _track_waiting(name, 1)
+        try:
+            return super()._do_get()
+        finally:
+            _track_waiting(name, -1)
+            db_checkout_seconds.observe(time.perf_counter() - started, pool=name)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class AsyncTimedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(name: str, asynchronous: bool = False) -> Dict:
+    """Arguments de create_engine / create_async_engine pour un pool instrumenté."""
+    return {"poolclass": AsyncTimedQueuePool if asynchronous else TimedQueuePool, "pool_logging_name": name}
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Compte les requêtes SQL (totales, par requête HTTP, lentes) et expose l'état du pool de l'engine."""
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+        db_queries.inc(pool=name)
+        counter = request_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("query_started", time.perf_counter())
+        db_query_seconds.observe(elapsed, pool=name)
+        if elapsed > SLOW_QUERY_SECONDS:
+            db_slow_queries.inc(pool=name)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    _engines[name] = engine
+
+
+def _pool_stats() -> Dict[str, Dict[str, float]]:
+    stats = {}
+    for name, engine in list(_engines.items()):
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        stats[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "waiting": _waiting.get(name, 0),
+        }
+    return stats
+
+
+def _pool_gauge(field: str) -> Callable[[], Dict[LabelKey, float]]:
+    return lambda: {(name, ): values[field] for name, values in _pool_stats().items()}
+
+
+Collected("db_pool_size", "Taille nominale du pool", ("pool",), _pool_gauge("size"))
+Collected("db_pool_checked_out", "Connexions empruntées au pool", ("pool",), _pool_gauge("checked_out"))
+Collected("db_pool_overflow", "Connexions ouvertes au-delà de pool_size", ("pool",), _pool_gauge("overflow"))
+Collected("db_pool_waiting", "Requêtes en attente d'une connexion", ("pool",), _pool_gauge("waiting"))
+Collected(
+    "db_pool_saturated_seconds", "Durée ininterrompue avec des requêtes en attente d'une connexion", ("pool",),
+    lambda: {(name, ): time.monotonic() - since for name, since in list(_waiting_since.items())},
+)
+
+
+def pool_at_capacity(name: str) -> bool:
+    engine = _engines.get(name)
+    pool = engine.pool if engine is not None else None
+    if not isinstance(pool, QueuePool) or pool._max_overflow < 0:
+        return False
+    return pool.checkedout() >= pool.size() + pool._max_overflow
+
+
+def readiness_problems() -> List[str]:
+    """Pools saturés depuis plus de POOL_SATURATION_SECONDS (vide si prêt)."""
+    now = time.monotonic()
+    return [
+        f"pool {name} saturé depuis {now - since:.1f}s"
+        for name, since in sorted(_waiting_since.items())
+        if now - since > POOL_SATURATION_SECONDS
+    ]
+
+
+# --- Notifications en direct (push) ----------------------------------------------------------
+
+live_connections = Gauge("live_connections", "Connexions de notification ouvertes", ("transport",))
+live_messages = Counter("live_messages_total", "Messages de notification publiés, par issue", ("outcome",))
+
+
+# --- Opérations bancaires et caches ----------------------------------------------------------
+
+bank_operations = Counter("bank_operations_total", "Opérations bancaires par type et issue", ("operation", "outcome"))
+
+
+def _succeeded(result) -> bool:
+    # Les lots de virements retournent une réponse portant un code d'erreur en cas de rejet
+    return bool(result) and not getattr(result, "error", None)
+
+
+def count_operation(operation: str):
+    """Compte les appels d'une méthode de service : success si le résultat est vrai, failure sinon."""
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                outcome = "failure"
+                try:
+                    result = await func(*args, **kwargs)
+                    outcome = "success" if _succeeded(result) else "failure"
+                    return result
+                finally:
+                    bank_operations.inc(operation=operation, outcome=outcome)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            outcome = "failure"
+            try:
+                result = func(*args, **kwargs)
+                outcome = "success" if _succeeded(result) else "failure"
+                return result
+            finally:
+                bank_operations.inc(operation=operation, outcome=outcome)
+        return wrapper
+    return decorate
+
+
+_caches: Dict[str, Callable[[], Dict[str, int]]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], Dict[str, int]]) -> None:
+    """stats() suit TTLCache.stats() / backends du cache : hits, misses, evictions, size (clés optionnelles)."""
+    _caches[name] = stats
+
+
+def _cache_stat(field: str) -> Callable[[], Dict[LabelKey, float]]:
+    def collect():
+        values = {}
+        for name, stats in list(_caches.items()):
+            snapshot = stats()
+            if field in snapshot:
+                values[(name, )] = snapshot[field]
+        return values
+    return collect
+
+
+Collected("cache_hits_total", "Lectures servies par le cache", ("cache",), _cache_stat("hits"), kind="counter")
+Collected("cache_misses_total", "Lectures absentes du cache", ("cache",), _cache_stat("misses"), kind="counter")
+Collected("cache_evictions_total", "Entrées évincées (LRU)", ("cache",), _cache_stat("evictions"), kind="counter")
+Collected("cache_entries", "Entrées en cache", ("cache",), _cache_stat("size"))
@@ -0,0 +1,215 @@
+"""
+Migrations versionnées du schéma : fichiers migrations/NNNN_nom.py appliqués dans l'ordre des numéros,
+chaque version appliquée enregistrée dans t_schema_migrations.
+
+Une migration définit upgrade(connection) : DDL rapide et rejouable (MySQL valide chaque DDL
+immédiatement, une interruption avant l'enregistrement de la version le fera rejouer). Si elle doit
+réécrire des données, elle définit aussi backfill(session, position, batch_size) : traite un lot après
+position et retourne la position suivante, ou None quand il n'y a plus rien à faire. Le backfill tourne en ligne : chaque lot est
+validé avec sa position (reprise exacte après interruption), suivi d'une pause proportionnelle à sa
+durée (BACKFILL_DUTY_CYCLE) pour laisser la base aux requêtes. Les migrations suivantes attendent la
+fin du backfill : elles peuvent en dépendre (colonne remplie puis passée en NOT NULL).
+
+Au démarrage de l'API, check_schema() lit la table des versions en une requête. S'il reste des
+migrations (MIGRATE_ON_STARTUP), leur DDL est appliqué, mais un backfill de plus d'un lot reste à
+terminer avec python migrate.py.
+
+Usage : python migrate.py [status] [--batch-size N] [--duty-cycle X]
+"""
+import argparse
+import importlib.util
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from config import LocalSession
+from entities import SchemaMigration
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "1000"))
+# Part du temps passée dans les lots : 0.5 -> un lot de 40 ms est suivi de 40 ms de pause
+BACKFILL_DUTY_CYCLE = float(os.getenv("BACKFILL_DUTY_CYCLE", "0.5"))
+# Verrou nommé MySQL : une seule instance applique les migrations, les autres attendent
+MIGRATION_LOCK = "t_schema_migrations"
+MIGRATION_LOCK_TIMEOUT = 600
+
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+
+class Migration:
+    def __init__(self, version: int, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+        self._module = None
+
+    @property
+    def module(self):
+        # Chargé seulement quand la migration est à appliquer : la vérification du démarrage n'importe rien
+        if self._module is None:
+            spec = importlib.util.spec_from_file_location(f"migration_{self.version:04d}", self.path)
+            self._module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(self._module)
+        return self._module
+
+    def __str__(self) -> str:
+        return f"{self.version:04d}_{self.name}"
+
+
+def available_migrations() -> List[Migration]:
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    migrations.sort(key=lambda migration: migration.version)
+    return migrations
+
+
+def applied_versions(connection) -> Dict[int, bool]:
+    """{version: backfill terminé} des migrations appliquées ; vide si la table n'existe pas encore."""
+    try:
+        # Colonnes de la table (Core) : pas de configuration des mappers ORM dans le chemin du démarrage
+        table = SchemaMigration.__table__
+        return dict(connection.execute(select(table.c.version, table.c.backfill_done)).all())
+    except (OperationalError, ProgrammingError):
+        return {}
+
+
+def pending_migrations(applied: Dict[int, bool]) -> List[Migration]:
+    return [migration for migration in available_migrations() if not applied.get(migration.version)]
+
+
+def _engine():
+    # Engine de LocalSession : celui de config, ou celui rebranché par les benchmarks
+    return LocalSession.kw["bind"]
+
+
+@contextmanager
+def migration_lock(connection):
+    if connection.dialect.name != "mysql":
+        # SQLite : un seul nœud, les migrations sont appliquées avant de servir
+        yield
+        return
+    locked = connection.execute(
+        text("SELECT GET_LOCK(:name, :timeout)"), {"name": MIGRATION_LOCK, "timeout": MIGRATION_LOCK_TIMEOUT}
+    ).scalar()
+    if not locked:
+        raise RuntimeError("Verrou des migrations non obtenu : une autre instance migre encore")
+    try:
+        yield
+    finally:
+        connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK})
+
+
+def run_backfill(
+    migration: Migration,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+    duty_cycle: float = BACKFILL_DUTY_CYCLE,
+    max_batches: Optional[int] = None,
+) -> bool:
+    """Lots du backfill depuis la dernière position validée ; True quand il est terminé."""
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        started = time.perf_counter()
+        with LocalSession() as session:
+            position = session.execute(
+                select(SchemaMigration.backfill_position).where(SchemaMigration.version == migration.version)
+            ).scalar_one()
+            position = migration.module.backfill(session, position, batch_size)
+            session.execute(
+                update(SchemaMigration)
+                .where(SchemaMigration.version == migration.version)
+                .values(backfill_position=position, backfill_done=position is None)
+            )
+            session.commit()
+        batches += 1
+        if position is None:
+            return True
+        if batches % 100 == 0:
+            print(f"{migration} : {batches} lots, position {position}")
+        time.sleep((time.perf_counter() - started) * (1 - duty_cycle) / duty_cycle)
+    return False
+
+
+def upgrade(
+    backfills: bool = True,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+    duty_cycle: float = BACKFILL_DUTY_CYCLE,
+) -> List[str]:
+    """
+    Applique les migrations en attente dans l'ordre ; retourne celles terminées par cet appel.
+    backfills=False : un seul lot par backfill, la suite des migrations attend sa fin.
+    """
+    done = []
+    with _engine().connect() as connection, migration_lock(connection):
+        SchemaMigration.__table__.create(connection, checkfirst=True)
+        # Relu sous le verrou : une autre instance a pu migrer pendant l'attente
+        applied = applied_versions(connection)
+        for migration in pending_migrations(applied):
+            if migration.version not in applied:
+                started = time.perf_counter()
+                with connection.begin():
+                    migration.module.upgrade(connection)
+                    connection.execute(insert(SchemaMigration.__table__), {
+                        "version": migration.version,
+                        "name": migration.name,
+                        "backfill_done": not hasattr(migration.module, "backfill"),
+                    })
+                print(f"✓ {migration} ({time.perf_counter() - started:.2f}s)")
+                if not hasattr(migration.module, "backfill"):
+                    done.append(str(migration))
+                    continue
+            if not run_backfill(migration, batch_size, duty_cycle, None if backfills else 1):
+                print(f"Backfill de {migration} en cours : lancer python migrate.py pour le terminer")
+                break
+            print(f"✓ backfill de {migration}")
+            done.append(str(migration))
+    return done
+
+
+def check_schema() -> None:
+    """Démarrage de l'API : une requête si le schéma est à jour."""
+    with _engine().connect() as connection:
+        pending = pending_migrations(applied_versions(connection))
+    if not pending:
+        return
+    if not MIGRATE_ON_STARTUP:
+        raise RuntimeError(f"Schéma en retard ({', '.join(map(str, pending))}) : lancer python migrate.py")
+    upgrade(backfills=False)
+
+
+def status() -> None:
+    with _engine().connect() as connection:
+        applied = applied_versions(connection)
+    for migration in available_migrations():
+        state = {True: "appliquée", False: "backfill en cours", None: "en attente"}[applied.get(migration.version)]
+        print(f"{migration}  {state}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrations du schéma")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status"], default="upgrade")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE, help="lignes par lot de backfill")
+    parser.add_argument("--duty-cycle", type=float, default=BACKFILL_DUTY_CYCLE,
+                        help="part du temps passée dans les lots (1 = sans pause)")
+    args = parser.parse_args()
+    try:
+        if args.command == "status":
+            status()
+            return 0
+        done = upgrade(True, args.batch_size, args.duty_cycle)
+        print(f"✅ {len(done)} migration(s) terminée(s)")
+    except Exception as e:
+        print(f"❌ Erreur migration: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+"""
+Schéma de référence : crée les tables des entités absentes de la base. Une base existante garde ses
+tables telles quelles (les migrations suivantes les mettent à niveau) ; une base neuve est créée
+directement dans sa forme finale, les migrations suivantes vérifient donc l'état avant de modifier.
+"""
+from config import Base
+import entities  # noqa: F401 (enregistre les tables dans Base.metadata)
+
+
+def upgrade(connection):
+    Base.metadata.create_all(connection)
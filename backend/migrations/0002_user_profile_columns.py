@@ -0,0 +1,11 @@
+"""Colonnes first_name, last_name et phone de t_users (bases antérieures au profil utilisateur)."""
+from sqlalchemy import inspect, text
+
+COLUMNS = [("first_name", "VARCHAR(128)"), ("last_name", "VARCHAR(128)"), ("phone", "VARCHAR(20)")]
+
+
+def upgrade(connection):
+    existing = {column["name"] for column in inspect(connection).get_columns("t_users")}
+    for name, sql_type in COLUMNS:
+        if name not in existing:
+            connection.execute(text(f"ALTER TABLE t_users ADD COLUMN {name} {sql_type} NULL"))
@@ -0,0 +1,39 @@
+"""
+Numéros de compte, étape 1 : colonne account_number nullable, puis numérotation en ligne des comptes
+sans numéro par blocs de la séquence t_sequences. La contrainte NOT NULL vient avec 0004.
+"""
+from typing import Optional
+from sqlalchemy import bindparam, inspect, select, text, update
+from sqlalchemy.orm import Session
+from account_numbers import ACCOUNT_NUMBER_SEQUENCE, with_check_digit
+from dal import SequenceDao
+from entities import Account
+
+number_accounts_stmt = (
+    update(Account.__table__)
+    .where(Account.__table__.c.id == bindparam("b_id"))
+    .values(account_number=bindparam("b_number"))
+)
+
+
+def upgrade(connection):
+    if "account_number" not in {column["name"] for column in inspect(connection).get_columns("t_accounts")}:
+        connection.execute(text("ALTER TABLE t_accounts ADD COLUMN account_number VARCHAR(20) NULL"))
+
+
+def backfill(session: Session, position: Optional[str], batch_size: int) -> Optional[str]:
+    # Parcours par clé primaire : chaque lot lit et verrouille au plus batch_size comptes
+    ids = list(session.execute(
+        select(Account.id)
+        .where(Account.account_number.is_(None), Account.id > int(position or 0))
+        .order_by(Account.id)
+        .limit(batch_size)
+    ).scalars())
+    if not ids:
+        return None
+    # Numéros d'un bloc de la séquence : jamais de collision, pas de SELECT de vérification
+    start = SequenceDao.allocate(session, ACCOUNT_NUMBER_SEQUENCE, len(ids))
+    session.execute(number_accounts_stmt, [
+        {"b_id": account_id, "b_number": with_check_digit(start + offset)} for offset, account_id in enumerate(ids)
+    ])
+    return str(ids[-1])
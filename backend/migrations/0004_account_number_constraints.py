@@ -0,0 +1,14 @@
+"""Numéros de compte, étape 2 (après le backfill de 0003) : account_number NOT NULL et unique."""
+from sqlalchemy import inspect, text
+
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    column = next(column for column in inspector.get_columns("t_accounts") if column["name"] == "account_number")
+    # SQLite ne modifie pas une colonne existante : ses bases viennent de 0001, déjà en NOT NULL
+    if column["nullable"] and connection.dialect.name == "mysql":
+        connection.execute(text("ALTER TABLE t_accounts MODIFY COLUMN account_number VARCHAR(20) NOT NULL"))
+    unique = [index["column_names"] for index in inspector.get_indexes("t_accounts") if index["unique"]]
+    unique += [constraint["column_names"] for constraint in inspector.get_unique_constraints("t_accounts")]
+    if ["account_number"] not in unique:
+        connection.execute(text("CREATE UNIQUE INDEX ix_t_accounts_account_number ON t_accounts (account_number)"))
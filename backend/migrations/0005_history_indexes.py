@@ -0,0 +1,16 @@
+"""Index de la pagination par clé : historique d'un compte (account_id, created_at, id), liste des utilisateurs."""
+from sqlalchemy import inspect, text
+
+INDEXES = [
+    ("t_transactions", "ix_transactions_account_created_id", "account_id, created_at, id"),
+    ("t_users", "ix_users_created_id", "created_at, id"),
+]
+
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    # MySQL : construction en place, lectures et écritures continuent pendant la création
+    online = " ALGORITHM=INPLACE LOCK=NONE" if connection.dialect.name == "mysql" else ""
+    for table, name, columns in INDEXES:
+        if name not in {index["name"] for index in inspector.get_indexes(table)}:
+            connection.execute(text(f"CREATE INDEX {name} ON {table} ({columns}){online}"))
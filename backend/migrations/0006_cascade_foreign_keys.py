@@ -0,0 +1,41 @@
+"""
+ON DELETE CASCADE des clés étrangères vers t_users et t_accounts (MySQL ; les bases SQLite viennent
+de 0001 et ont déjà leurs clés en cascade, SQLite ne sait pas modifier une clé existante).
+"""
+from sqlalchemy import text
+
+# (table, colonne, table référencée)
+CASCADE_FOREIGN_KEYS = [
+    ("t_accounts", "user_id", "t_users"),
+    ("t_transactions", "account_id", "t_accounts"),
+    ("t_balance_snapshots", "account_id", "t_accounts"),
+    ("t_monthly_rollups", "account_id", "t_accounts"),
+]
+
+
+def upgrade(connection):
+    if connection.dialect.name != "mysql":
+        return
+    # Même contrainte, seule la règle ON DELETE change : les lignes existantes sont déjà valides.
+    # Avec foreign_key_checks = 0, InnoDB ajoute la clé en place (ALGORITHM=INPLACE), sans
+    # recopier t_transactions ni bloquer les écritures.
+    connection.execute(text("SET SESSION foreign_key_checks = 0"))
+    try:
+        for table, column, referenced in CASCADE_FOREIGN_KEYS:
+            constraints = connection.execute(text(
+                "SELECT rc.CONSTRAINT_NAME, rc.DELETE_RULE FROM information_schema.REFERENTIAL_CONSTRAINTS rc "
+                "JOIN information_schema.KEY_COLUMN_USAGE k ON k.CONSTRAINT_SCHEMA = rc.CONSTRAINT_SCHEMA "
+                "AND k.CONSTRAINT_NAME = rc.CONSTRAINT_NAME AND k.TABLE_NAME = rc.TABLE_NAME "
+                "WHERE rc.CONSTRAINT_SCHEMA = DATABASE() AND rc.TABLE_NAME = :table AND k.COLUMN_NAME = :column "
+                "AND rc.REFERENCED_TABLE_NAME = :referenced"
+            ), {"table": table, "column": column, "referenced": referenced}).all()
+            if constraints and all(rule == "CASCADE" for _, rule in constraints):
+                continue
+            drops = "".join(f"DROP FOREIGN KEY `{name}`, " for name, _ in constraints)
+            connection.execute(text(
+                f"ALTER TABLE {table} {drops}"
+                f"ADD CONSTRAINT fk_{table[2:]}_{column}_cascade FOREIGN KEY ({column}) "
+                f"REFERENCES {referenced} (id) ON DELETE CASCADE, ALGORITHM=INPLACE, LOCK=NONE"
+            ))
+    finally:
+        connection.execute(text("SET SESSION foreign_key_checks = 1"))
@@ -0,0 +1,27 @@
+"""
+Curseur du flux t_events : colonne seq (numéro attribué après le commit, voir change_feed) et son index.
+Les événements existants sont numérotés par le backfill avec seq = id : les curseurs déjà rendus
+aux consommateurs (des ids) restent valides. Le séquenceur du flux numérote aussi, sous le même verrou.
+"""
+from typing import Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from dal import EventDao
+
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    if "seq" not in {column["name"] for column in inspector.get_columns("t_events")}:
+        # MySQL 8 : colonne nullable ajoutée en fin de table, sans recopie (INSTANT)
+        connection.execute(text("ALTER TABLE t_events ADD COLUMN seq BIGINT NULL"))
+    if "ix_events_seq" not in {index["name"] for index in inspector.get_indexes("t_events")}:
+        online = " ALGORITHM=INPLACE LOCK=NONE" if connection.dialect.name == "mysql" else ""
+        connection.execute(text(f"CREATE UNIQUE INDEX ix_events_seq ON t_events (seq){online}"))
+
+
+def backfill(session: Session, position: Optional[str], batch_size: int) -> Optional[str]:
+    # Même numérotation que le séquenceur du flux : un lot verrouille la séquence le temps de son UPDATE
+    numbered = EventDao.sequence_pending(session, batch_size)
+    if numbered < batch_size:
+        return None
+    return str(int(position or 0) + numbered)
@@ -0,0 +1,15 @@
+"""
+Lien des événements t_events vers leur transaction : colonne transaction_id et son index.
+Les événements existants gardent NULL (aucune correspondance fiable avec t_transactions).
+"""
+from sqlalchemy import inspect, text
+
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    if "transaction_id" not in {column["name"] for column in inspector.get_columns("t_events")}:
+        # MySQL 8 : colonne nullable ajoutée en fin de table, sans recopie (INSTANT)
+        connection.execute(text("ALTER TABLE t_events ADD COLUMN transaction_id INTEGER NULL"))
+    if "ix_events_transaction" not in {index["name"] for index in inspector.get_indexes("t_events")}:
+        online = " ALGORITHM=INPLACE LOCK=NONE" if connection.dialect.name == "mysql" else ""
+        connection.execute(text(f"CREATE INDEX ix_events_transaction ON t_events (transaction_id){online}"))
@@ -0,0 +1,47 @@
+import base64
+import json
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Curseur opaque pour la pagination par clé (created_at, id)."""
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("INVALID_CURSOR")
+
+
+def build_page(
+    rows: Sequence[T],
+    limit: int,
+    key: Callable[[T], Tuple[datetime, int]],
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+) -> Tuple[List[T], Optional[str], Optional[str]]:
+    """
+    Découpe le résultat d'une requête « limit + 1 » en (éléments, next_cursor, prev_cursor).
+    Les lignes arrivent en ordre décroissant, ou croissant si la page a été demandée avec `after`.
+    """
+    has_more = len(rows) > limit
+    items = list(rows[:limit])
+    if after:
+        items.reverse()
+    if not items:
+        return items, None, None
+    if after:
+        older_exists, newer_exists = True, has_more
+    else:
+        older_exists, newer_exists = has_more, before is not None
+    next_cursor = encode_cursor(*key(items[-1])) if older_exists else None
+    prev_cursor = encode_cursor(*key(items[0])) if newer_exists else None
+    return items, next_cursor, prev_cursor
@@ -0,0 +1,256 @@
+"""
+Notifications en direct des soldes et des mouvements : WebSocket /live/ws et SSE /live/stream.
+
+Les messages sont préparés dans la transaction du mouvement (stage / astage) et publiés après le
+commit aux connexions ouvertes sur ce processus : rien n'est envoyé pour un rollback. Chaque
+connexion a sa propre file bornée ; un client trop lent perd ses messages en attente et reçoit
+{"type": "resync"} (relire comptes et historique) au lieu de faire grossir la mémoire du worker.
+
+Une connexion inactive n'est qu'une tâche en attente sur sa file : aucun accès à la base, aucun
+réveil périodique (le maintien de connexion WebSocket est fait par uvicorn). Les connexions d'un
+autre worker ne sont pas notifiées : le client relit toujours comptes et historique après ses
+propres opérations, les notifications ne servent qu'aux mouvements venus d'ailleurs.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth import decode_access_token
+from config import RoutingSession
+from dal import AccountDao
+from dal_async import AsyncAccountDao
+from metrics import live_connections, live_messages
+
+# Messages en attente par connexion avant de basculer sur un resync
+PUSH_QUEUE_SIZE = int(os.getenv("PUSH_QUEUE_SIZE", "100"))
+# Délai pour envoyer {"type": "auth", "token": ...} après l'ouverture du WebSocket
+PUSH_AUTH_TIMEOUT = 10.0
+PUSH_KEEPALIVE_SECONDS = 25.0
+# Fermeture WebSocket : jeton absent, invalide ou expiré (plage 4000-4999 réservée aux applications)
+WS_UNAUTHORIZED = 4401
+
+RESYNC = {"type": "resync"}
+
+
+class Subscription:
+    """Une connexion : file bornée, remplie depuis n'importe quel thread via la boucle de la connexion."""
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(PUSH_QUEUE_SIZE)
+
+    def deliver(self, messages: List[Dict]) -> None:
+        # Exécuté dans la boucle de la connexion
+        for index, message in enumerate(messages):
+            try:
+                self.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait(RESYNC)
+                live_messages.inc(index, outcome="queued")
+                live_messages.inc(len(messages) - index, outcome="dropped")
+                live_messages.inc(outcome="resync")
+                return
+        live_messages.inc(len(messages), outcome="queued")
+
+
+class PushBroker:
+    """Abonnements du processus par utilisateur ; publish() est appelable depuis n'importe quel thread."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def subscribed(self, user_ids: Iterable[int]) -> Set[int]:
+        with self._lock:
+            return {user_id for user_id in user_ids if user_id in self._subscriptions}
+
+    def connections(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    @contextmanager
+    def subscribe(self, user_id: int):
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscriptions = self._subscriptions.get(user_id)
+                if subscriptions is not None:
+                    subscriptions.discard(subscription)
+                    if not subscriptions:
+                        del self._subscriptions[user_id]
+
+    def publish(self, messages_by_user: Dict[int, List[Dict]]) -> None:
+        with self._lock:
+            targets = [
+                (subscription, messages)
+                for user_id, messages in messages_by_user.items()
+                for subscription in self._subscriptions.get(user_id, ())
+            ]
+        for subscription, messages in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, messages)
+            except RuntimeError:
+                # Boucle fermée entre-temps
+                pass
+
+
+broker = PushBroker()
+
+
+def _stage_messages(session, rows: List[Dict], owners: List[Tuple[int, int, float]]) -> None:
+    subscribed = broker.subscribed({user_id for _, user_id, _ in owners})
+    if not subscribed:
+        return
+    owner_of = {account_id: user_id for account_id, user_id, _ in owners}
+    staged = session.info.setdefault("push", defaultdict(list))
+    for row in rows:
+        user_id = owner_of.get(row["account_id"])
+        if user_id in subscribed:
+            staged[user_id].append({"type": "transaction", **row})
+    for account_id, user_id, balance in owners:
+        if user_id in subscribed:
+            staged[user_id].append({"type": "balance", "account_id": account_id, "balance": balance})
+
+
+def stage(session: Session, rows: List[Dict]) -> None:
+    """Prépare les notifications des mouvements rows (format des transactions), publiées au commit."""
+    # Aucun abonné sur ce processus : pas de requête supplémentaire
+    if rows and broker.has_subscribers():
+        owners = AccountDao.get_owners_and_balances(session, {row["account_id"] for row in rows})
+        _stage_messages(session, rows, owners)
+
+
+async def astage(session: AsyncSession, rows: List[Dict]) -> None:
+    if rows and broker.has_subscribers():
+        owners = await AsyncAccountDao.get_owners_and_balances(session, {row["account_id"] for row in rows})
+        _stage_messages(session, rows, owners)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _publish_staged(session):
+    staged = session.info.pop("push", None)
+    if staged:
+        # Un lot plus long que la file déborderait de toute façon : resync direct
+        broker.publish({
+            user_id: messages if len(messages) <= PUSH_QUEUE_SIZE else [RESYNC]
+            for user_id, messages in staged.items()
+        })
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_staged(session):
+    session.info.pop("push", None)
+
+
+def authenticate(token: Optional[str]) -> Optional[Tuple[int, float]]:
+    """(user_id, expiration) d'un jeton d'accès valide, None sinon."""
+    payload = decode_access_token(token) if token else None
+    try:
+        return int(payload["sub"]), float(payload["exp"])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+@contextmanager
+def _connection(transport: str):
+    live_connections.inc(transport=transport)
+    try:
+        yield
+    finally:
+        live_connections.dec(transport=transport)
+
+
+async def _next_message(subscription: Subscription, expires_at: float, keepalive: Optional[float] = None) -> Optional[Dict]:
+    """Prochain message ; None à l'expiration du jeton ({} si keepalive secondes passent sans message)."""
+    remaining = expires_at - time.time()
+    if remaining <= 0:
+        return None
+    timeout = remaining if keepalive is None else min(remaining, keepalive)
+    try:
+        return await asyncio.wait_for(subscription.queue.get(), timeout)
+    except asyncio.TimeoutError:
+        return {} if timeout < remaining else None
+
+
+router_live = APIRouter(prefix="/live")
+
+
+@router_live.websocket("/ws")
+async def live_socket(websocket: WebSocket):
+    """Premier message attendu : {"type": "auth", "token": "<jeton d'accès>"} (pas de jeton dans l'URL)."""
+    await websocket.accept()
+    try:
+        hello = await asyncio.wait_for(websocket.receive_json(), PUSH_AUTH_TIMEOUT)
+    except (asyncio.TimeoutError, ValueError):
+        hello = None
+    except WebSocketDisconnect:
+        # Client parti avant de s'authentifier
+        return
+    identity = authenticate(hello.get("token")) if isinstance(hello, dict) and hello.get("type") == "auth" else None
+    if identity is None:
+        await websocket.close(code=WS_UNAUTHORIZED)
+        return
+    user_id, expires_at = identity
+
+    async def send_messages() -> None:
+        while True:
+            message = await _next_message(subscription, expires_at)
+            if message is None:
+                return
+            await websocket.send_text(json.dumps(message))
+
+    async def wait_disconnect() -> None:
+        # Les messages du client sont ignorés : seule la déconnexion compte
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    with broker.subscribe(user_id) as subscription, _connection("websocket"):
+        await websocket.send_text(json.dumps({"type": "ready"}))
+        sender = asyncio.ensure_future(send_messages())
+        receiver = asyncio.ensure_future(wait_disconnect())
+        done, pending = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if sender in done and not sender.exception():
+            # Jeton expiré : le client se reconnecte avec un jeton neuf
+            await websocket.close(code=WS_UNAUTHORIZED)
+
+
+async def _sse_messages(user_id: int, expires_at: float) -> AsyncIterator[str]:
+    with broker.subscribe(user_id) as subscription, _connection("sse"):
+        yield 'event: ready\ndata: {"type": "ready"}\n\n'
+        while True:
+            message = await _next_message(subscription, expires_at, PUSH_KEEPALIVE_SECONDS)
+            if message is None:
+                return
+            yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n" if message else ": keep-alive\n\n"
+
+
+@router_live.get("/stream")
+async def live_stream(token: str = Query(..., description="Jeton d'accès (EventSource ne peut pas envoyer d'en-tête)")):
+    """Variante SSE du WebSocket ; le flux se termine à l'expiration du jeton."""
+    identity = authenticate(token)
+    if identity is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token invalide ou expiré")
+    return StreamingResponse(
+        _sse_messages(*identity),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,245 @@
+"""
+Journal des requêtes SQL par requête HTTP (développement) : QUERY_LOG=true.
+
+Chaque instruction exécutée pendant une requête est enregistrée ; à la fin de la requête,
+les formes d'instruction répétées (motif N+1) et les dépassements du budget de la route
+sont signalés. Le rapport par route (nombres de requêtes uniquement, pas de durées) est
+déterministe : il s'écrit en JSON et se compare d'un commit à l'autre.
+
+Usage : python query_log.py diff avant.json apres.json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from metrics import route_template
+
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG", "false").lower() == "true"
+# Rapport écrit à l'arrêt de l'application (optionnel)
+QUERY_LOG_REPORT = os.getenv("QUERY_LOG_REPORT", "")
+# Budget par défaut d'une route, et nombre de répétitions d'une même forme signalé comme N+1
+DEFAULT_QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "10"))
+N_PLUS_ONE_REPEATS = int(os.getenv("N_PLUS_ONE_REPEATS", "3"))
+# Budgets plus stricts des routes chaudes (mouvements : +1 requête si des clients sont abonnés, voir push)
+ROUTE_QUERY_BUDGETS: Dict[str, int] = {
+    "/auth/me": 1,
+    "/accounts/{account_id}": 2,
+    "/accounts/{account_id}/deposit": 4,
+    "/accounts/{account_id}/withdraw": 4,
+    "/accounts/{account_id}/transfer": 7,
+    "/transactions/{transaction_id}": 2,
+}
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Forme d'une instruction : littéraux et listes IN (...) réduits, pour regrouper les répétitions."""
+    shape = statement.replace("%s", "?")
+    shape = _LITERALS.sub("?", shape)
+    shape = _PLACEHOLDER_LISTS.sub("(?)", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+class QueryLog:
+    """Instructions exécutées dans une unité (requête HTTP ou bloc capturé)."""
+    def __init__(self, route: str = ""):
+        self.route = route
+        self.statements: List[str] = []
+
+    def add(self, statement: str) -> None:
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int = N_PLUS_ONE_REPEATS) -> Dict[str, int]:
+        shapes = Counter(statement_shape(statement) for statement in self.statements)
+        return {shape: count for shape, count in shapes.items() if count >= threshold}
+
+    def problems(self, budget: Optional[int], threshold: int = N_PLUS_ONE_REPEATS) -> List[str]:
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append(f"{self.count} requêtes SQL pour un budget de {budget}")
+        for shape, count in self.repeated(threshold).items():
+            problems.append(f"N+1 probable ({count} fois) : {shape[:160]}")
+        return problems
+
+
+current_log: ContextVar[Optional[QueryLog]] = ContextVar("current_log", default=None)
+# Captures actives (assert_queries) : reçoivent les journaux des requêtes HTTP terminées
+_captures: List[List[QueryLog]] = []
+_installed = False
+
+
+def _record(conn, cursor, statement, parameters, context, executemany):
+    log = current_log.get()
+    if log is not None:
+        log.add(statement)
+
+
+def install() -> None:
+    """Enregistre les instructions de tous les engines (primaire, réplicas, async)."""
+    global _installed
+    if not _installed:
+        event.listen(Engine, "before_cursor_execute", _record)
+        _installed = True
+
+
+class QueryReport:
+    """Agrégat par route des requêtes observées, sérialisable en JSON stable."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes: Dict[str, Dict] = {}
+
+    def add(self, log: QueryLog, over_budget: bool) -> None:
+        with self._lock:
+            entry = self.routes.setdefault(
+                log.route, {"requests": 0, "queries": 0, "max_queries": 0, "over_budget": 0, "repeated": {}}
+            )
+            entry["requests"] += 1
+            entry["queries"] += log.count
+            entry["max_queries"] = max(entry["max_queries"], log.count)
+            entry["over_budget"] += int(over_budget)
+            for shape, count in log.repeated().items():
+                entry["repeated"][shape] = max(entry["repeated"].get(shape, 0), count)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                route: {**entry, "mean_queries": round(entry["queries"] / entry["requests"], 2)}
+                for route, entry in sorted(self.routes.items())
+            }
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    def clear(self) -> None:
+        with self._lock:
+            self.routes.clear()
+
+
+report = QueryReport()
+
+
+class QueryLogMiddleware:
+    """Middleware ASGI : journal SQL de chaque requête, avertissements N+1 et budget, rapport par route."""
+    def __init__(self, app, routes, budgets: Optional[Dict[str, int]] = None, default_budget: int = DEFAULT_QUERY_BUDGET):
+        self.app = app
+        self.routes = routes
+        self.budgets = ROUTE_QUERY_BUDGETS if budgets is None else budgets
+        self.default_budget = default_budget
+        install()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        log = QueryLog(f"{scope['method']} {route_template(self.routes, scope)}")
+        reset = current_log.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_log.reset(reset)
+            budget = self.budgets.get(route_template(self.routes, scope), self.default_budget)
+            problems = log.problems(budget)
+            report.add(log, over_budget=log.count > budget)
+            for problem in problems:
+                print(f"⚠️ {log.route} : {problem}")
+            for capture in list(_captures):
+                capture.append(log)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def assert_queries(max_queries: Optional[int] = None, repeats: int = N_PLUS_ONE_REPEATS):
+    """
+    Échoue (AssertionError) si une unité du bloc dépasse max_queries ou répète une forme N+1.
+    Unités : chaque requête HTTP passée par QueryLogMiddleware, et les appels directs du bloc.
+    """
+    install()
+    requests: List[QueryLog] = []
+    direct = QueryLog("<bloc>")
+    reset = current_log.set(direct)
+    _captures.append(requests)
+    try:
+        yield requests
+    finally:
+        _captures.remove(requests)
+        current_log.reset(reset)
+    failures = [
+        f"{log.route} : {problem}"
+        for log in ([direct] if direct.count else []) + requests
+        for problem in log.problems(max_queries, repeats)
+    ]
+    if failures:
+        raise QueryBudgetExceeded("\n".join(failures))
+
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def query_budget():
+        """Fixture pytest (pytest_plugins = ["query_log"]) : with query_budget(3): client.get(...)"""
+        return assert_queries
+
+
+def diff_reports(before: Dict, after: Dict) -> List[str]:
+    """Régressions entre deux rapports : plus de requêtes par appel, nouveaux N+1, nouveaux dépassements."""
+    regressions = []
+    for route, entry in sorted(after.items()):
+        previous = before.get(route)
+        if previous is None:
+            continue
+        if entry["mean_queries"] > previous["mean_queries"]:
+            regressions.append(f"{route} : {previous['mean_queries']} -> {entry['mean_queries']} requêtes par appel")
+        for shape in sorted(set(entry["repeated"]) - set(previous["repeated"])):
+            regressions.append(f"{route} : nouveau N+1 ({entry['repeated'][shape]} fois) {shape[:120]}")
+        if entry["over_budget"] and not previous["over_budget"]:
+            regressions.append(f"{route} : budget dépassé ({entry['max_queries']} requêtes)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparaison de rapports de requêtes SQL par route")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    diff = subparsers.add_parser("diff", help="régressions de apres.json par rapport à avant.json")
+    diff.add_argument("before")
+    diff.add_argument("after")
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    for route in sorted(set(before) | set(after)):
+        old = before.get(route, {}).get("mean_queries", "-")
+        new = after.get(route, {}).get("mean_queries", "-")
+        marker = "" if old == new else "  *"
+        print(f"{route:50} {old!s:>6} -> {new!s:>6}{marker}")
+    regressions = diff_reports(before, after)
+    for regression in regressions:
+        print(f"❌ {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,13 @@
 from config import engine, Base
 import entities
+from migrate import upgrade
 
 def reset_db():
     print("Dropping all tables...")
     # Drop in order: transactions -> accounts -> users
     Base.metadata.drop_all(engine)
     print("Tables dropped. Recreating...")
-    Base.metadata.create_all(engine)
+    upgrade()
     print("Database reset complete.")
 
 if __name__ == "__main__":
@@ -1,18 +1,405 @@
 from config import LocalSession
-from dal import UserDao, AccountDao, TransactionDao
+from dal import UserDao, AccountDao, TransactionDao, BalanceSnapshotDao, JobCheckpointDao, MonthlyRollupDao, EventDao
 from entities import User, Account, Transaction
-from dto import UserRequest, AccountRequest
-from auth import get_password_hash, verify_password
-from typing import Optional, List
-from datetime import datetime
+from dto import UserRequest, AccountRequest, AccountInfo, UserResponse, UserFilter, TransactionFilter, BatchTransferRequest, BatchTransferRejection, BatchTransferResponse, MonthlyAnalytics, TypeTotals, EventPage, EventResponse
+from pagination import encode_cursor, decode_cursor, build_page
+from metadata_cache import metadata_cache
+from metrics import count_operation
+from change_feed import EVENT_SEQUENCE_BATCH
+from push import stage
+from archive import transaction_archive
+from account_numbers import account_number_allocator, is_valid_account_number
+from auth import get_password_hash, verify_password, verify_and_update_password, invalidate_user_tokens, run_password_task
+from typing import Optional, List, Tuple, Iterator, Dict
+from datetime import date, datetime, time as day_time, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, OperationalError, IntegrityError
+from contextlib import contextmanager, nullcontext
+from collections import defaultdict
+from itertools import chain
+import random
+import time
 
-class UserService:
+# Colonnes des relevés exportés et taille des blocs lus en base
+STATEMENT_COLUMNS = ("created_at", "id", "transaction_type", "amount", "description", "balance")
+STATEMENT_CHUNK_SIZE = 5000
+# Export NDJSON de la liste des utilisateurs (administration)
+USER_EXPORT_COLUMNS = ("id", "email", "first_name", "last_name", "phone", "is_admin", "created_at", "updated_at")
+USER_EXPORT_CHUNK_SIZE = 5000
+
+# Soldes de fin de journée : nom du point de reprise, jours traités par transaction du job,
+# délai de grâce après minuit (transactions commencées la veille et validées juste après)
+SNAPSHOT_JOB = "balance_snapshots"
+SNAPSHOT_CHUNK_DAYS = 7
+SNAPSHOT_GRACE = timedelta(minutes=10)
+BALANCE_HISTORY_MAX_DAYS = 366
+# Taille des listes IN du report des soldes
+SNAPSHOT_ACCOUNTS_PER_QUERY = 1000
+
+# Suppression d'un compte ou d'un utilisateur : l'historique part d'abord par lots, chacun dans
+# une transaction courte (verrous brefs), puis la ligne du compte et le reste en cascade
+DELETE_CHUNK_SIZE = 5000
+
+# Nombre de nouvelles tentatives après un deadlock / lock wait timeout
+DEADLOCK_RETRIES = 3
+# MySQL : 1213 = deadlock détecté, 1205 = lock wait timeout
+_RETRYABLE_MYSQL_ERRORS = (1205, 1213)
+
+
+def is_retryable_error(error: OperationalError) -> bool:
+    if getattr(error.orig, "errno", None) in _RETRYABLE_MYSQL_ERRORS:
+        return True
+    return "database is locked" in str(error.orig)
+
+
+def plan_batch_transfer(
+    batch: BatchTransferRequest,
+    from_account_id: int,
+    from_number: str,
+    destinations: Dict[str, int],
+    available: Optional[float] = None,
+) -> Tuple[List[BatchTransferRejection], Dict[int, float], List[Dict], float]:
+    """
+    Valide chaque virement d'un lot et prépare les écritures en masse.
+    Retourne (rejets, crédits par compte, lignes de t_transactions, total débité).
+    `available` (solde + découvert, ligne verrouillée) n'est connu qu'en mode non atomique ;
+    en mode atomique le débit conditionnel unique fait office de contrôle des fonds.
+    """
+    rejections = []
+    credits = defaultdict(float)
+    rows = []
+    total = 0.0
+    for index, item in enumerate(batch.transfers):
+        to_id = destinations.get(item.to_account_number)
+        reason = None
+        if item.amount <= 0:
+            reason = "INVALID_AMOUNT"
+        elif not is_valid_account_number(item.to_account_number):
+            reason = "INVALID_ACCOUNT_NUMBER"
+        elif to_id is None:
+            reason = "UNKNOWN_ACCOUNT"
+        elif to_id == from_account_id:
+            reason = "SAME_ACCOUNT"
+        elif available is not None and total + item.amount > available:
+            reason = "INSUFFICIENT_FUNDS"
+        if reason:
+            rejections.append(BatchTransferRejection(
+                index=index, to_account_number=item.to_account_number, amount=item.amount, reason=reason
+            ))
+            continue
+        total += item.amount
+        credits[to_id] += item.amount
+        rows.append({
+            "account_id": from_account_id,
+            "transaction_type": "transfer",
+            "amount": -item.amount,
+            "description": item.description or f"Transfer to account {item.to_account_number}",
+        })
+        rows.append({
+            "account_id": to_id,
+            "transaction_type": "transfer",
+            "amount": item.amount,
+            "description": item.description or f"Transfer from account {from_number}",
+        })
+    return rejections, dict(credits), rows, total
+
+
+def event_rows(*transactions: Transaction) -> List[Dict]:
+    """Lignes du flux t_events pour des mouvements créés par l'ORM (même format que les insertions groupées)."""
+    return [
+        {
+            "transaction_id": t.id,
+            "account_id": t.account_id,
+            "transaction_type": t.transaction_type,
+            "amount": t.amount,
+            "description": t.description,
+        }
+        for t in transactions
+    ]
+
+
+def record_movements(session: Session, rows: List[Dict]) -> None:
+    """Flux t_events et notifications en direct des mouvements, dans la transaction en cours."""
+    EventDao.append(session, rows)
+    stage(session, rows)
+
+
+def record_transactions(session: Session, *transactions: Transaction) -> None:
+    """Mouvements ajoutés par l'ORM : flush d'abord, pour relier chaque événement à l'id de sa transaction."""
+    session.flush()
+    record_movements(session, event_rows(*transactions))
+
+
+def insert_movements(session: Session, rows: List[Dict]) -> None:
+    """Insertion groupée de transactions, avec leurs événements (copiés de t_transactions pour en avoir les ids)."""
+    after_id = TransactionDao.get_max_id(session)
+    TransactionDao.bulk_insert(session, rows)
+    EventDao.append_inserted(session, after_id)
+    stage(session, rows)
+
+
+def batch_response(
+    batch: BatchTransferRequest,
+    rejections: List[BatchTransferRejection],
+    total: float,
+    error: Optional[str] = None,
+) -> BatchTransferResponse:
+    if error:
+        # Lot refusé en bloc : aucun virement n'est appliqué
+        return BatchTransferResponse(
+            accepted=0, rejected=len(batch.transfers), total_amount=0.0, error=error, rejections=rejections
+        )
+    return BatchTransferResponse(
+        accepted=len(batch.transfers) - len(rejections),
+        rejected=len(rejections),
+        total_amount=round(total, 2),
+        rejections=rejections,
+    )
+
+
+def reject_batch(batch: BatchTransferRequest, reason: str) -> BatchTransferResponse:
+    """Lot refusé avant toute validation : chaque virement est rejeté avec le même motif."""
+    rejections = [
+        BatchTransferRejection(index=index, to_account_number=item.to_account_number, amount=item.amount, reason=reason)
+        for index, item in enumerate(batch.transfers)
+    ]
+    return batch_response(batch, rejections, 0.0, reason)
+
+
+def split_credits(credits: Dict[int, float], from_account_id: int) -> Tuple[List[Dict], List[Dict]]:
+    """Crédits avant / après le compte source dans l'ordre des ids (même ordre de verrouillage que transfer)."""
+    ordered = [{"b_id": account_id, "b_amount": amount} for account_id, amount in sorted(credits.items())]
+    return [c for c in ordered if c["b_id"] < from_account_id], [c for c in ordered if c["b_id"] > from_account_id]
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, day_time.min)
+
+
+def daily_balances(
+    start_day: date,
+    end_day: date,
+    opening: float,
+    snapshots: Dict[date, float],
+    tail_sums: Dict[date, float],
+) -> List[Tuple[date, float]]:
+    """
+    Soldes de fin de journée de start_day à end_day à partir du solde d'ouverture.
+    Un instantané fixe le solde du jour ; sinon on ajoute la somme des mouvements du jour
+    (uniquement connue pour les jours postérieurs au dernier jour traité par le job).
+    """
+    balances = []
+    balance = opening
+    day = start_day
+    while day <= end_day:
+        if day in snapshots:
+            balance = snapshots[day]
+        else:
+            balance += tail_sums.get(day, 0.0)
+        balances.append((day, round(balance, 2)))
+        day += timedelta(days=1)
+    return balances
+
+
+def month_start(moment: datetime) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def archive_horizon(start: Optional[datetime]) -> Optional[datetime]:
+    """Horizon de l'archive si un intervalle commençant à start y entre, None si la base suffit."""
+    horizon = transaction_archive.horizon()
+    if horizon is not None and (start is None or start < horizon):
+        return horizon
+    return None
+
+
+def archived_months(start: Optional[datetime], end: Optional[datetime], descending: bool = False) -> List[date]:
+    months = transaction_archive.months(month_start(start) if start else None, month_start(end) if end else None)
+    return months[::-1] if descending else months
+
+
+def matches_filters(row, filters: TransactionFilter) -> bool:
+    """Filtres de transaction_page_stmt appliqués à une ligne archivée."""
+    return (
+        (not filters.transaction_types or row.transaction_type in filters.transaction_types)
+        and (filters.start_date is None or row.created_at >= filters.start_date)
+        and (filters.end_date is None or row.created_at <= filters.end_date)
+        and (filters.min_amount is None or row.amount >= filters.min_amount)
+        and (filters.max_amount is None or row.amount <= filters.max_amount)
+    )
+
+
+def row_position(rows, key: Tuple[datetime, int]) -> int:
+    """Indice de la première ligne (triées par (created_at, id)) dont la clé n'est pas inférieure à key."""
+    low, high = 0, len(rows)
+    while low < high:
+        middle = (low + high) // 2
+        if (rows[middle].created_at, rows[middle].id) < key:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def archived_page(
+    account_id: int,
+    filters: TransactionFilter,
+    count: int,
+    before: Optional[Tuple[datetime, int]] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+) -> list:
+    """Jusqu'à count lignes archivées dans l'ordre de transaction_page_stmt (décroissant, croissant avec after)."""
+    if after is not None:
+        months = archived_months(max(after[0], filters.start_date or after[0]), filters.end_date)
+    else:
+        upper = min(before[0], filters.end_date or before[0]) if before else filters.end_date
+        months = archived_months(filters.start_date, upper, descending=True)
+    rows = []
+    for month in months:
+        month_rows = transaction_archive.account_rows(month, account_id)
+        # Le curseur se place par dichotomie : seules les lignes de la page sont parcourues
+        if after is not None:
+            positions = range(row_position(month_rows, (after[0], after[1] + 1)), len(month_rows))
+        else:
+            positions = range((row_position(month_rows, before) if before else len(month_rows)) - 1, -1, -1)
+        for position in positions:
+            row = month_rows[position]
+            if matches_filters(row, filters):
+                rows.append(row)
+                if len(rows) == count:
+                    return rows
+    return rows
+
+
+def archived_statement_rows(month: date, account_id: int, start_date: Optional[datetime], end_date: Optional[datetime]) -> list:
+    return [
+        row for row in transaction_archive.account_rows(month, account_id)
+        if (start_date is None or row.created_at >= start_date) and (end_date is None or row.created_at <= end_date)
+    ]
+
+
+def archived_statement_chunks(
+    account_id: int, start_date: Optional[datetime], end_date: Optional[datetime], chunk_size: int
+) -> Iterator[list]:
+    for month in archived_months(start_date, end_date):
+        rows = archived_statement_rows(month, account_id, start_date, end_date)
+        for offset in range(0, len(rows), chunk_size):
+            yield rows[offset:offset + chunk_size]
+
+
+def opening_balance(session: Session, account_id: int, start: Optional[datetime]) -> Optional[float]:
+    """TransactionDao.get_opening_balance, mouvements archivés postérieurs à start compris."""
+    horizon = archive_horizon(start)
+    if horizon is None:
+        return TransactionDao.get_opening_balance(session, account_id, start)
+    balance = TransactionDao.get_opening_balance(session, account_id, horizon)
+    return None if balance is None else balance - transaction_archive.sum_amounts(account_id, start, horizon)
+
+
+def sum_movements(session: Session, account_id: int, start: Optional[datetime], end: datetime) -> float:
+    """TransactionDao.sum_amounts, mouvements archivés compris."""
+    horizon = archive_horizon(start)
+    if horizon is None:
+        return TransactionDao.sum_amounts(session, account_id, start, end)
+    total = transaction_archive.sum_amounts(account_id, start, min(end, horizon))
+    if end > horizon:
+        total += TransactionDao.sum_amounts(session, account_id, horizon, end)
+    return total
+
+
+def monthly_analytics(rows: List[Dict]) -> List[MonthlyAnalytics]:
+    """Regroupe les agrégats (mois, type) en une entrée par mois, du plus ancien au plus récent."""
+    by_month = defaultdict(list)
+    for row in rows:
+        by_month[row["month"]].append(row)
+    months = []
+    for month in sorted(by_month):
+        types = sorted(by_month[month], key=lambda row: row["transaction_type"])
+        months.append(MonthlyAnalytics(
+            month=month,
+            count=sum(row["count"] for row in types),
+            income=round(sum(row["credits"] for row in types), 2),
+            spending=round(-sum(row["debits"] for row in types), 2),
+            net=round(sum(row["total"] for row in types), 2),
+            min_amount=min(row["min_amount"] for row in types),
+            max_amount=max(row["max_amount"] for row in types),
+            by_type=[
+                TypeTotals(
+                    transaction_type=row["transaction_type"],
+                    count=row["count"],
+                    total=round(row["total"], 2),
+                    min_amount=row["min_amount"],
+                    max_amount=row["max_amount"],
+                )
+                for row in types
+            ],
+        ))
+    return months
+
+
+class BaseService:
+    """
+    Les services acceptent une session optionnelle (unit of work de la requête HTTP).
+    Sans session, chaque appel ouvre et ferme sa propre LocalSession comme avant.
+    """
+    def __init__(self, session: Optional[Session] = None):
+        self._shared_session = session
+
+    @contextmanager
+    def _session(self, read_only: bool = False):
+        """read_only=True : lectures seules, routées vers un réplica s'il y en a (voir RoutingSession)."""
+        if self._shared_session is None:
+            with LocalSession() as session, (session.read_only() if read_only else nullcontext()):
+                yield session
+            return
+        try:
+            with self._shared_session.read_only() if read_only else nullcontext():
+                yield self._shared_session
+        except Exception:
+            # Toute erreur (HTTPException, ValueError...) : rien ne doit rester verrouillé ou en attente
+            # de flush sur la session partagée pour la suite de la requête
+            self._shared_session.rollback()
+            raise
+        else:
+            # Termine la transaction de lecture : la connexion retourne au pool avant que
+            # FastAPI ne sérialise la réponse (qui attend elle aussi un thread du threadpool).
+            self._shared_session.commit()
+
+    def _purge_transactions(self, account_ids: List[int]) -> int:
+        """Supprime l'historique des comptes par lots de DELETE_CHUNK_SIZE, un commit par lot, et masque leurs mois archivés."""
+        transaction_archive.forget_accounts(account_ids)
+        purged = 0
+        for account_id in account_ids:
+            deleted = DELETE_CHUNK_SIZE
+            while deleted == DELETE_CHUNK_SIZE:
+                with self._session() as session:
+                    deleted = TransactionDao.delete_oldest(session, account_id, DELETE_CHUNK_SIZE)
+                    session.commit()
+                purged += deleted
+        return purged
+
+    def _run_with_retry(self, unit):
+        """Exécute unit(session) dans une transaction, rejouée (borné) en cas de deadlock."""
+        for attempt in range(DEADLOCK_RETRIES + 1):
+            try:
+                with self._session() as session:
+                    return unit(session)
+            except OperationalError as e:
+                if attempt == DEADLOCK_RETRIES or not is_retryable_error(e):
+                    raise
+                time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+
+class UserService(BaseService):
     def create_user(self, user_request: UserRequest) -> Optional[User]:
+        # Hachage dans le pool dédié, avant d'ouvrir la transaction
+        hashed_password = run_password_task(get_password_hash, user_request.password)
         try:
-            with LocalSession() as session:
-                hashed_password = get_password_hash(user_request.password)
+            with self._session() as session:
                 user = User(
                     email=user_request.email,
                     password=hashed_password,
@@ -36,64 +423,109 @@ class UserService:
             raise
     
     def search_by_email(self, email: str) -> Optional[User]:
-        with LocalSession() as session:
+        with self._session(read_only=True) as session:
             return UserDao.search_by_email(session, email)
 
     def get_by_id(self, user_id: int) -> Optional[User]:
-        with LocalSession() as session:
+        with self._session(read_only=True) as session:
             return UserDao.get_by_id(session, user_id)
+
+    def get_user_info(self, user_id: int) -> Optional[UserResponse]:
+        """Profil public de l'utilisateur, servi par le cache des métadonnées."""
+        with self._session(read_only=True) as session:
+            return metadata_cache.get_user(session, user_id)
     
     def delete_user(self, email: str) -> bool:
         try:
-            with LocalSession() as session:
-                return UserDao.delete_user(session, email)
+            with self._session() as session:
+                user = UserDao.search_by_email(session, email)
+                if not user:
+                    return False
+                user_id = user.id
+                # Les comptes partent en cascade : leurs entrées de cache aussi
+                accounts = [(account.id, account.account_number) for account in user.accounts]
+            self._purge_transactions([account_id for account_id, _ in accounts])
+            with self._session() as session:
+                deleted = UserDao.delete_user(session, email)
+            if deleted:
+                # Un jeton déjà vérifié ne doit plus résoudre vers l'utilisateur supprimé
+                invalidate_user_tokens(user_id)
+                metadata_cache.invalidate_user(user_id)
+                for account_id, account_number in accounts:
+                    metadata_cache.invalidate_account(account_id, account_number)
+            return deleted
         except SQLAlchemyError as e:
             print(f"Erreur suppression utilisateur: {e}")
             return False
     
-    def get_all(self) -> List[User]:
-        with LocalSession() as session:
-            return UserDao.get_all_users(session)
+    def get_users_page(
+        self, filters: UserFilter, limit: int, cursor: Optional[str] = None, descending: bool = True
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Page d'utilisateurs (colonnes de UserResponse, sans hash) et curseur de la page suivante."""
+        key = decode_cursor(cursor) if cursor else None
+        with self._session(read_only=True) as session:
+            rows = UserDao.get_page(session, filters, limit + 1, key, descending)
+        items = [dict(row._mapping) for row in rows[:limit]]
+        next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["id"]) if len(rows) > limit else None
+        return items, next_cursor
+
+    def iter_users(
+        self, filters: UserFilter, descending: bool = True, chunk_size: int = USER_EXPORT_CHUNK_SIZE
+    ) -> Iterator[List[Dict]]:
+        with self._session(read_only=True) as session:
+            for chunk in UserDao.iter_chunks(session, filters, chunk_size, descending):
+                yield [dict(row._mapping) for row in chunk]
 
 
-class AuthService:
+class AuthService(BaseService):
     def authenticate_user(self, email: str, password: str) -> Optional[User]:
-        with LocalSession() as session:
+        with self._session() as session:
             user = UserDao.search_by_email(session, email)
-            if user and verify_password(password, user.password):
-                return user
+        # La connexion est rendue au pool avant bcrypt
+        if not user:
             return None
+        valid, new_hash = run_password_task(verify_and_update_password, password, user.password)
+        if not valid:
+            return None
+        if new_hash:
+            # Coût bcrypt modifié : mise à niveau transparente du hachage
+            try:
+                with self._session() as session:
+                    UserDao.update_password(session, user.id, new_hash)
+                    session.commit()
+            except SQLAlchemyError as e:
+                print(f"Erreur mise à niveau du hachage: {e}")
+        return user
     
     def change_password(self, user_id: int, current_password: str, new_password: str) -> bool:
         try:
-            with LocalSession() as session:
+            with self._session() as session:
                 user = UserDao.get_by_id(session, user_id)
-                if not user:
-                    return False
-                if not verify_password(current_password, user.password):
-                    return False
-                user.password = get_password_hash(new_password)
+            if not user:
+                return False
+            if not run_password_task(verify_password, current_password, user.password):
+                return False
+            new_hash = run_password_task(get_password_hash, new_password)
+            with self._session() as session:
+                UserDao.update_password(session, user_id, new_hash)
                 session.commit()
-                return True
+            # Les jetons déjà vérifiés de l'utilisateur repassent par jwt.decode
+            invalidate_user_tokens(user_id)
+            metadata_cache.invalidate_user(user_id)
+            return True
         except SQLAlchemyError as e:
             print(f"Erreur changement de mot de passe: {e}")
             return False
 
 
-class AccountService:
-    def _generate_account_number(self, session: Session) -> str:
-        import random
-        import string
-        while True:
-            # Generate a 10-digit random number
-            acc_num = ''.join(random.choices(string.digits, k=10))
-            if not AccountDao.get_by_account_number(session, acc_num):
-                return acc_num
-
+class AccountService(BaseService):
     def create_account(self, account_request: AccountRequest) -> Optional[Account]:
+        if account_request.account_number and not is_valid_account_number(account_request.account_number):
+            raise ValueError("INVALID_ACCOUNT_NUMBER")
         try:
-            with LocalSession() as session:
-                acc_num = account_request.account_number or self._generate_account_number(session)
+            with self._session() as session:
+                # Numéro tiré du bloc réservé par le processus : ni tirage aléatoire ni SELECT de vérification
+                acc_num = account_request.account_number or account_number_allocator.next_number()
                 account = Account(
                     user_id=account_request.user_id,
                     account_number=acc_num,
@@ -102,124 +534,409 @@ class AccountService:
                     overdraft_limit=account_request.overdraft_limit,
                     interest_rate=account_request.interest_rate
                 )
-                return AccountDao.create_account(session, account)
+                account = AccountDao.create_account(session, account)
+            metadata_cache.invalidate_account(account.id, account.account_number)
+            return account
         except SQLAlchemyError as e:
             print(f"Erreur création compte: {e}")
             return None
     
     def get_account_by_id(self, account_id: int) -> Optional[Account]:
-        with LocalSession() as session:
+        with self._session(read_only=True) as session:
             return AccountDao.get_by_id(session, account_id)
+
+    def get_account_info(self, account_id: int) -> Optional[AccountInfo]:
+        """Propriétaire, numéro et type du compte via le cache des métadonnées (sans le solde)."""
+        with self._session(read_only=True) as session:
+            return metadata_cache.get_account(session, account_id)
     
-    def get_accounts_by_user(self, user_id: int) -> List[Account]:
-        with LocalSession() as session:
-            return AccountDao.get_by_user_id(session, user_id)
+    def get_accounts_by_user(self, user_id: int) -> List[Dict]:
+        """Comptes de l'utilisateur au format de AccountResponse (lignes projetées)."""
+        with self._session(read_only=True) as session:
+            return [dict(row._mapping) for row in AccountDao.get_rows_by_user_id(session, user_id)]
     
     def delete_account(self, account_id: int) -> bool:
         try:
-            with LocalSession() as session:
-                return AccountDao.delete_account(session, account_id)
+            with self._session() as session:
+                account = AccountDao.get_by_id(session, account_id)
+                if not account:
+                    return False
+                account_number = account.account_number
+            self._purge_transactions([account_id])
+            with self._session() as session:
+                deleted = AccountDao.delete_account(session, account_id)
+            if deleted:
+                metadata_cache.invalidate_account(account_id, account_number)
+            return deleted
         except SQLAlchemyError as e:
             print(f"Erreur suppression compte: {e}")
             return False
     
+    @count_operation("deposit")
     def deposit(self, account_id: int, amount: float) -> bool:
         if amount <= 0:
             return False
-        try:
-            with LocalSession() as session:
-                account = AccountDao.get_by_id(session, account_id)
-                if not account:
-                    return False
-                new_balance = account.balance + amount
-                if AccountDao.update_balance(session, account_id, new_balance):
-                    transaction = Transaction(
-                        account_id=account_id,
-                        transaction_type='deposit',
-                        amount=amount,
-                        description=f'Deposit of {amount}'
-                    )
-                    TransactionDao.create_transaction(session, transaction)
-                    session.commit()
-                    return True
+
+        def unit(session: Session) -> bool:
+            if not AccountDao.credit(session, account_id, amount):
+                session.rollback()
                 return False
+            transaction = Transaction(
+                account_id=account_id,
+                transaction_type='deposit',
+                amount=amount,
+                description=f'Deposit of {amount}'
+            )
+            TransactionDao.create_transaction(session, transaction)
+            record_transactions(session, transaction)
+            session.commit()
+            return True
+
+        try:
+            return self._run_with_retry(unit)
         except SQLAlchemyError as e:
             print(f"Erreur dépôt: {e}")
             return False
     
+    @count_operation("withdraw")
     def withdraw(self, account_id: int, amount: float) -> bool:
         if amount <= 0:
             return False
-        try:
-            with LocalSession() as session:
-                account = AccountDao.get_by_id(session, account_id)
-                if not account:
-                    return False
-                max_withdrawal = account.balance + account.overdraft_limit
-                if amount > max_withdrawal:
-                    return False
-                new_balance = account.balance - amount
-                if AccountDao.update_balance(session, account_id, new_balance):
-                    transaction = Transaction(
-                        account_id=account_id,
-                        transaction_type='withdraw',
-                        amount=-amount,
-                        description=f'Withdrawal of {amount}'
-                    )
-                    TransactionDao.create_transaction(session, transaction)
-                    session.commit()
-                    return True
+
+        def unit(session: Session) -> bool:
+            if not AccountDao.debit(session, account_id, amount):
+                session.rollback()
                 return False
+            transaction = Transaction(
+                account_id=account_id,
+                transaction_type='withdraw',
+                amount=-amount,
+                description=f'Withdrawal of {amount}'
+            )
+            TransactionDao.create_transaction(session, transaction)
+            record_transactions(session, transaction)
+            session.commit()
+            return True
+
+        try:
+            return self._run_with_retry(unit)
         except SQLAlchemyError as e:
             print(f"Erreur retrait: {e}")
             return False
     
+    @count_operation("transfer")
     def transfer(self, from_account_id: int, to_account_number: str, amount: float) -> bool:
-        if amount <= 0:
+        if amount <= 0 or not is_valid_account_number(to_account_number):
             return False
+
+        def unit(session: Session) -> bool:
+            # Numéro source et id destinataire : métadonnées en cache, seuls les soldes sont écrits
+            from_account = metadata_cache.get_account(session, from_account_id)
+            to_account = metadata_cache.get_account_by_number(session, to_account_number)
+            if not from_account or not to_account:
+                return False
+            if from_account.id == to_account.id:
+                return False
+            from_number = from_account.account_number
+            to_id = to_account.id
+            # Verrouillage dans l'ordre des ids : deux virements croisés A->B et B->A
+            # prennent les verrous de ligne dans le même ordre et ne peuvent pas s'interbloquer.
+            if from_account_id < to_id:
+                applied = AccountDao.debit(session, from_account_id, amount) and AccountDao.credit(session, to_id, amount)
+            else:
+                applied = AccountDao.credit(session, to_id, amount) and AccountDao.debit(session, from_account_id, amount)
+            if not applied:
+                session.rollback()
+                return False
+            trans_from = Transaction(
+                account_id=from_account_id,
+                transaction_type='transfer',
+                amount=-amount,
+                description=f'Transfer to account {to_account_number}'
+            )
+            trans_to = Transaction(
+                account_id=to_id,
+                transaction_type='transfer',
+                amount=amount,
+                description=f'Transfer from account {from_number}'
+            )
+            session.add(trans_from)
+            session.add(trans_to)
+            record_transactions(session, trans_from, trans_to)
+            session.commit()
+            return True
+
         try:
-            with LocalSession() as session:
-                from_account = AccountDao.get_by_id(session, from_account_id)
-                to_account = AccountDao.get_by_account_number(session, to_account_number)
-                if not from_account or not to_account:
-                    return False
-                if from_account.id == to_account.id:
-                    return False
-                max_withdrawal = from_account.balance + from_account.overdraft_limit
-                if amount > max_withdrawal:
-                    return False
-                from_account.balance -= amount
-                to_account.balance += amount
-                trans_from = Transaction(
-                    account_id=from_account_id,
-                    transaction_type='transfer',
-                    amount=-amount,
-                    description=f'Transfer to account {to_account.account_number}'
-                )
-                trans_to = Transaction(
-                    account_id=to_account.id,
-                    transaction_type='transfer',
-                    amount=amount,
-                    description=f'Transfer from account {from_account.account_number}'
-                )
-                session.add(trans_from)
-                session.add(trans_to)
-                session.commit()
-                return True
+            return self._run_with_retry(unit)
         except SQLAlchemyError as e:
             print(f"Erreur transfert: {e}")
             return False
 
+    @count_operation("batch_transfer")
+    def batch_transfer(self, from_account_id: int, batch: BatchTransferRequest) -> Optional[BatchTransferResponse]:
+        def unit(session: Session) -> Optional[BatchTransferResponse]:
+            from_account = metadata_cache.get_account(session, from_account_id)
+            if not from_account:
+                return None
+            from_number = from_account.account_number
+            # Une seule requête IN pour résoudre tous les comptes destinataires
+            destinations = AccountDao.get_ids_by_account_numbers(
+                session, {item.to_account_number for item in batch.transfers if is_valid_account_number(item.to_account_number)}
+            )
+            available = None
+            if not batch.atomic:
+                funds = AccountDao.lock_funds(session, from_account_id)
+                if funds is None:
+                    # Compte source supprimé depuis sa lecture (cache de métadonnées)
+                    session.rollback()
+                    return reject_batch(batch, "ACCOUNT_NOT_FOUND")
+                balance, overdraft_limit = funds
+                available = balance + overdraft_limit
+            rejections, credits, rows, total = plan_batch_transfer(
+                batch, from_account_id, from_number, destinations, available
+            )
+            if batch.atomic and rejections:
+                session.rollback()
+                return batch_response(batch, rejections, total, "BATCH_REJECTED")
+            if total > 0:
+                credits_before, credits_after = split_credits(credits, from_account_id)
+                AccountDao.bulk_credit(session, credits_before)
+                if not AccountDao.debit(session, from_account_id, total):
+                    session.rollback()
+                    return batch_response(batch, rejections, total, "INSUFFICIENT_FUNDS")
+                AccountDao.bulk_credit(session, credits_after)
+                insert_movements(session, rows)
+            session.commit()
+            return batch_response(batch, rejections, total)
 
-class TransactionService:
+        try:
+            return self._run_with_retry(unit)
+        except SQLAlchemyError as e:
+            print(f"Erreur lot de virements: {e}")
+            return None
+
+
+class TransactionService(BaseService):
     def get_transaction_by_id(self, transaction_id: int) -> Optional[Transaction]:
-        with LocalSession() as session:
+        with self._session(read_only=True) as session:
             return TransactionDao.get_by_id(session, transaction_id)
     
+    def get_transaction_with_owner(self, transaction_id: int) -> Optional[Tuple[Transaction, int]]:
+        with self._session(read_only=True) as session:
+            return TransactionDao.get_with_owner(session, transaction_id)
+
     def get_transactions_by_account(self, account_id: int) -> List[Transaction]:
-        with LocalSession() as session:
+        with self._session(read_only=True) as session:
             return TransactionDao.get_by_account_id(session, account_id)
     
-    def get_transactions_by_account_and_date_range(self, account_id: int, start_date: datetime, end_date: datetime) -> List[Transaction]:
-        with LocalSession() as session:
-            return TransactionDao.get_by_account_id_and_date_range(session, account_id, start_date, end_date)
+    def get_transactions_page(
+        self,
+        account_id: int,
+        filters: TransactionFilter,
+        limit: int,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str], Optional[str]]:
+        """Page d'historique au format de TransactionResponse (lignes projetées) et ses curseurs."""
+        if before and after:
+            raise ValueError("INVALID_CURSOR")
+        before_key = decode_cursor(before) if before else None
+        after_key = decode_cursor(after) if after else None
+        with self._session(read_only=True) as session:
+            horizon = archive_horizon(filters.start_date)
+            if horizon is None:
+                rows = TransactionDao.get_page(session, account_id, filters, limit, before_key, after_key)
+            elif after_key is None:
+                # Plus récent d'abord : l'archive ne complète que si la base ne remplit pas la page
+                hot_filters = filters.copy(update={"start_date": horizon})
+                rows = TransactionDao.get_page(session, account_id, hot_filters, limit, before_key)
+                if len(rows) <= limit:
+                    rows += archived_page(account_id, filters, limit + 1 - len(rows), before_key)
+            else:
+                rows = archived_page(account_id, filters, limit + 1, after=after_key)
+                if len(rows) <= limit:
+                    hot_filters = filters.copy(update={"start_date": horizon})
+                    rows += TransactionDao.get_page(session, account_id, hot_filters, limit, after=after_key)
+        items, next_cursor, prev_cursor = build_page(rows, limit, lambda t: (t.created_at, t.id), before, after)
+        return [row._asdict() for row in items], next_cursor, prev_cursor
+
+    def iter_statement(
+        self,
+        account_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        chunk_size: int = STATEMENT_CHUNK_SIZE,
+    ) -> Iterator[List[Dict]]:
+        """Lignes du relevé par blocs, en ordre chronologique, avec le solde après chaque opération."""
+        with self._session(read_only=True) as session:
+            balance = opening_balance(session, account_id, start_date) or 0.0
+            horizon = archive_horizon(start_date)
+            if horizon is None:
+                chunks = TransactionDao.iter_statement_chunks(session, account_id, start_date, end_date, chunk_size)
+            else:
+                chunks = chain(
+                    archived_statement_chunks(account_id, start_date, end_date, chunk_size),
+                    TransactionDao.iter_statement_chunks(session, account_id, horizon, end_date, chunk_size),
+                )
+            for chunk in chunks:
+                lines = []
+                for row in chunk:
+                    balance += row.amount
+                    lines.append(statement_line(row, balance))
+                yield lines
+
+
+def statement_line(row, balance: float) -> Dict:
+    return {
+        "created_at": row.created_at,
+        "id": row.id,
+        "transaction_type": row.transaction_type,
+        "amount": row.amount,
+        "description": row.description,
+        "balance": round(balance, 2),
+    }
+
+
+class BalanceService(BaseService):
+    """Soldes historiques : instantané le plus proche + queue des transactions suivantes."""
+
+    @staticmethod
+    def _watermark(session: Session) -> Optional[date]:
+        position = JobCheckpointDao.get(session, SNAPSHOT_JOB)
+        return date.fromisoformat(position) if position else None
+
+    @staticmethod
+    def _balance_at(session: Session, account_id: int, at: datetime) -> Optional[float]:
+        snapshot = BalanceSnapshotDao.get_latest_before(session, account_id, at.date())
+        if snapshot:
+            day, balance = snapshot
+            return balance + sum_movements(session, account_id, day_start(day + timedelta(days=1)), at)
+        # Pas encore d'instantané : solde courant moins les mouvements depuis `at`
+        return opening_balance(session, account_id, at)
+
+    def get_balance_at(self, account_id: int, at: datetime) -> Optional[float]:
+        with self._session(read_only=True) as session:
+            balance = self._balance_at(session, account_id, at)
+        return round(balance, 2) if balance is not None else None
+
+    def get_balance_history(self, account_id: int, start_day: date, end_day: date) -> List[Tuple[date, float]]:
+        with self._session(read_only=True) as session:
+            opening = self._balance_at(session, account_id, day_start(start_day)) or 0.0
+            watermark = self._watermark(session)
+            snapshots = {}
+            tail_from = start_day
+            if watermark and watermark >= start_day:
+                snapshots = BalanceSnapshotDao.get_range(session, account_id, start_day, min(end_day, watermark))
+                tail_from = watermark + timedelta(days=1)
+            tail_sums = {}
+            if tail_from <= end_day:
+                tail_sums = {
+                    day: amount for _, day, amount in TransactionDao.get_daily_sums(
+                        session, day_start(tail_from), day_start(end_day + timedelta(days=1)), account_id
+                    )
+                }
+        return daily_balances(start_day, end_day, opening, snapshots, tail_sums)
+
+    def build_snapshots(self, through_day: Optional[date] = None, chunk_days: int = SNAPSHOT_CHUNK_DAYS) -> int:
+        """
+        Complète t_balance_snapshots jusqu'à through_day inclus (par défaut la veille) en ne traitant
+        que les jours postérieurs au point de reprise. Chaque bloc de jours est validé avec son
+        point de reprise : un job interrompu reprend au bloc suivant. Retourne le nombre de jours traités.
+        """
+        through_day = through_day or (datetime.now() - SNAPSHOT_GRACE).date() - timedelta(days=1)
+        processed = 0
+        while True:
+            with self._session() as session:
+                watermark = self._watermark(session)
+                if watermark is None:
+                    first_day = TransactionDao.get_first_day(session)
+                    if first_day is None:
+                        return processed
+                    watermark = first_day - timedelta(days=1)
+                start = watermark + timedelta(days=1)
+                if start > through_day:
+                    return processed
+                end = min(through_day, start + timedelta(days=chunk_days - 1))
+                sums = TransactionDao.get_daily_sums(session, day_start(start), day_start(end + timedelta(days=1)))
+                account_ids = sorted({account_id for account_id, _, _ in sums})
+                carried = {}
+                for offset in range(0, len(account_ids), SNAPSHOT_ACCOUNTS_PER_QUERY):
+                    carried.update(BalanceSnapshotDao.get_latest_balances(
+                        session, account_ids[offset:offset + SNAPSHOT_ACCOUNTS_PER_QUERY], start
+                    ))
+                rows = []
+                for account_id, day, amount in sums:
+                    balance = carried.get(account_id, 0.0) + amount
+                    carried[account_id] = balance
+                    rows.append({"account_id": account_id, "day": day, "balance": balance})
+                BalanceSnapshotDao.bulk_insert(session, rows)
+                JobCheckpointDao.set(session, SNAPSHOT_JOB, end.isoformat())
+                session.commit()
+            print(f"Soldes du {start} au {end} : {len(rows)} instantanés")
+            processed += (end - start).days + 1
+
+
+class AnalyticsService(BaseService):
+    """
+    Agrégats mensuels d'un compte. Les mois clos sont lus dans t_monthly_rollups : calculés
+    au premier appel qui les demande, puis jamais recalculés. Seul le mois en cours est agrégé en direct.
+    """
+
+    @staticmethod
+    def _closed_rollups(session: Session, account_id: int, current: date) -> List[Dict]:
+        """Agrégats des mois clos avant current, complétés dans t_monthly_rollups si besoin."""
+        rows = MonthlyRollupDao.get_all(session, account_id)
+        start = next_month(rows[-1]["month"]) if rows else None
+        if start is None or start < current:
+            closed = TransactionDao.get_monthly_aggregates(
+                session, account_id, day_start(start) if start else None, day_start(current)
+            )
+            if closed:
+                try:
+                    MonthlyRollupDao.bulk_insert(session, account_id, closed)
+                    session.commit()
+                except IntegrityError:
+                    # Mois agrégés au même moment par une autre requête : mêmes valeurs
+                    session.rollback()
+                rows += closed
+        return rows
+
+    def get_account_analytics(self, account_id: int, now: Optional[datetime] = None) -> List[MonthlyAnalytics]:
+        current = month_start((now or datetime.now()) - SNAPSHOT_GRACE)
+        with self._session() as session:
+            rows = self._closed_rollups(session, account_id, current)
+            rows += TransactionDao.get_monthly_aggregates(session, account_id, day_start(current), None)
+        return monthly_analytics(rows)
+
+    def build_rollups(self, account_ids: List[int], through: date) -> None:
+        """Agrège les mois clos jusqu'à through inclus (avant archivage : ils ne seraient plus calculables)."""
+        for account_id in account_ids:
+            with self._session() as session:
+                self._closed_rollups(session, account_id, next_month(through))
+
+
+class EventService(BaseService):
+    def get_events(self, after: int, limit: int) -> EventPage:
+        """Événements du flux après le curseur after (seq), dans l'ordre du flux. Lecture seule."""
+        with self._session(read_only=True) as session:
+            rows = EventDao.get_after(session, after, limit)
+        items = [EventResponse.from_orm(row) for row in rows]
+        return EventPage(items=items, next_cursor=items[-1].seq if items else after)
+
+    def sequence_pending(self) -> int:
+        """Numérote une passe d'événements validés (séquenceur de change_feed, sur le primaire)."""
+        for attempt in range(2):
+            try:
+                with self._session() as session:
+                    # Une lecture d'index quand tout est déjà numéroté : pas de verrou
+                    if not EventDao.has_unsequenced(session):
+                        return 0
+                    # Fin de la lecture : la numérotation commence par le verrou de la séquence
+                    session.commit()
+                    numbered = EventDao.sequence_pending(session, EVENT_SEQUENCE_BATCH)
+                    session.commit()
+                return numbered
+            except IntegrityError:
+                # Ligne de séquence créée au même moment par un autre worker (premier appel seulement)
+                if attempt:
+                    raise
@@ -0,0 +1,514 @@
+from dal_async import AsyncUserDao, AsyncAccountDao, AsyncTransactionDao, AsyncBalanceSnapshotDao, AsyncJobCheckpointDao, AsyncMonthlyRollupDao, AsyncEventDao
+from entities import User, Account, Transaction
+from dto import UserRequest, AccountRequest, AccountInfo, UserResponse, UserFilter, TransactionFilter, BatchTransferRequest, BatchTransferResponse, MonthlyAnalytics, EventPage, EventResponse
+from pagination import encode_cursor, decode_cursor, build_page
+from metadata_cache import metadata_cache
+from metrics import count_operation
+from push import astage
+from account_numbers import account_number_allocator, is_valid_account_number
+from auth import get_password_hash, verify_password, verify_and_update_password, invalidate_user_tokens, arun_password_task
+from services import (
+    DEADLOCK_RETRIES, DELETE_CHUNK_SIZE, STATEMENT_CHUNK_SIZE, USER_EXPORT_CHUNK_SIZE, is_retryable_error, statement_line,
+    plan_batch_transfer, batch_response, reject_batch, split_credits, SNAPSHOT_JOB, SNAPSHOT_GRACE, day_start, daily_balances,
+    month_start, next_month, monthly_analytics, event_rows, archive_horizon, archived_months, archived_page,
+    archived_statement_rows,
+)
+from archive import transaction_archive
+from typing import Optional, List, Tuple, AsyncIterator, Dict
+from datetime import date, datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError, OperationalError, IntegrityError
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import random
+
+
+async def arecord_movements(session: AsyncSession, rows: List[Dict]) -> None:
+    await AsyncEventDao.append(session, rows)
+    await astage(session, rows)
+
+
+async def arecord_transactions(session: AsyncSession, *transactions: Transaction) -> None:
+    await session.flush()
+    await arecord_movements(session, event_rows(*transactions))
+
+
+async def ainsert_movements(session: AsyncSession, rows: List[Dict]) -> None:
+    after_id = await AsyncTransactionDao.get_max_id(session)
+    await AsyncTransactionDao.bulk_insert(session, rows)
+    await AsyncEventDao.append_inserted(session, after_id)
+    await astage(session, rows)
+
+
+async def aopening_balance(session: AsyncSession, account_id: int, start: Optional[datetime]) -> Optional[float]:
+    horizon = archive_horizon(start)
+    if horizon is None:
+        return await AsyncTransactionDao.get_opening_balance(session, account_id, start)
+    balance = await AsyncTransactionDao.get_opening_balance(session, account_id, horizon)
+    if balance is None:
+        return None
+    return balance - await run_in_threadpool(transaction_archive.sum_amounts, account_id, start, horizon)
+
+
+async def asum_movements(session: AsyncSession, account_id: int, start: Optional[datetime], end: datetime) -> float:
+    horizon = archive_horizon(start)
+    if horizon is None:
+        return await AsyncTransactionDao.sum_amounts(session, account_id, start, end)
+    total = await run_in_threadpool(transaction_archive.sum_amounts, account_id, start, min(end, horizon))
+    if end > horizon:
+        total += await AsyncTransactionDao.sum_amounts(session, account_id, horizon, end)
+    return total
+
+
+class AsyncBaseService:
+    """Équivalents async des services : la session de la requête est obligatoire."""
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    def _read_only(self):
+        """Lectures seules, routées vers un réplica s'il y en a (voir config.RoutingSession)."""
+        return self.session.sync_session.read_only()
+
+    async def _purge_transactions(self, account_ids: List[int]) -> int:
+        await run_in_threadpool(transaction_archive.forget_accounts, account_ids)
+        purged = 0
+        for account_id in account_ids:
+            deleted = DELETE_CHUNK_SIZE
+            while deleted == DELETE_CHUNK_SIZE:
+                deleted = await AsyncTransactionDao.delete_oldest(self.session, account_id, DELETE_CHUNK_SIZE)
+                await self.session.commit()
+                purged += deleted
+        return purged
+
+    async def _run_with_retry(self, unit):
+        for attempt in range(DEADLOCK_RETRIES + 1):
+            try:
+                return await unit(self.session)
+            except OperationalError as e:
+                await self.session.rollback()
+                if attempt == DEADLOCK_RETRIES or not is_retryable_error(e):
+                    raise
+                await asyncio.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+
+class AsyncUserService(AsyncBaseService):
+    async def create_user(self, user_request: UserRequest) -> Optional[User]:
+        # bcrypt est coûteux en CPU : dans le pool de hachage, hors de la boucle d'événements
+        hashed_password = await arun_password_task(get_password_hash, user_request.password)
+        user = User(
+            email=user_request.email,
+            password=hashed_password,
+            is_admin=False,
+            first_name=user_request.first_name,
+            last_name=user_request.last_name,
+            phone=user_request.phone
+        )
+        try:
+            return await AsyncUserDao.create_user(self.session, user)
+        except SQLAlchemyError as e:
+            print(f"Erreur création utilisateur: {e}")
+            raise Exception(f"Erreur base de données: {str(e)}")
+
+    async def search_by_email(self, email: str) -> Optional[User]:
+        with self._read_only():
+            return await AsyncUserDao.search_by_email(self.session, email)
+
+    async def get_by_id(self, user_id: int) -> Optional[User]:
+        with self._read_only():
+            return await AsyncUserDao.get_by_id(self.session, user_id)
+
+    async def get_user_info(self, user_id: int) -> Optional[UserResponse]:
+        with self._read_only():
+            return await metadata_cache.aget_user(self.session, user_id)
+
+    async def delete_user(self, email: str) -> bool:
+        try:
+            user = await AsyncUserDao.search_by_email(self.session, email)
+            if not user:
+                return False
+            user_id = user.id
+            accounts = [(a.id, a.account_number) for a in await AsyncAccountDao.get_by_user_id(self.session, user_id)]
+            await self._purge_transactions([account_id for account_id, _ in accounts])
+            deleted = await AsyncUserDao.delete_user(self.session, email)
+            if deleted:
+                # Un jeton déjà vérifié ne doit plus résoudre vers l'utilisateur supprimé
+                invalidate_user_tokens(user_id)
+                metadata_cache.invalidate_user(user_id)
+                for account_id, account_number in accounts:
+                    metadata_cache.invalidate_account(account_id, account_number)
+            return deleted
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            print(f"Erreur suppression utilisateur: {e}")
+            return False
+
+    async def get_users_page(
+        self, filters: UserFilter, limit: int, cursor: Optional[str] = None, descending: bool = True
+    ) -> Tuple[List[Dict], Optional[str]]:
+        key = decode_cursor(cursor) if cursor else None
+        with self._read_only():
+            rows = await AsyncUserDao.get_page(self.session, filters, limit + 1, key, descending)
+        items = [dict(row._mapping) for row in rows[:limit]]
+        next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["id"]) if len(rows) > limit else None
+        return items, next_cursor
+
+    async def iter_users(
+        self, filters: UserFilter, descending: bool = True, chunk_size: int = USER_EXPORT_CHUNK_SIZE
+    ) -> AsyncIterator[List[Dict]]:
+        with self._read_only():
+            async for chunk in AsyncUserDao.iter_chunks(self.session, filters, chunk_size, descending):
+                yield [dict(row._mapping) for row in chunk]
+
+
+class AsyncAuthService(AsyncBaseService):
+    async def authenticate_user(self, email: str, password: str) -> Optional[User]:
+        user = await AsyncUserDao.search_by_email(self.session, email)
+        # Fin de la transaction de lecture : la connexion est rendue au pool avant bcrypt
+        await self.session.commit()
+        if not user:
+            return None
+        valid, new_hash = await arun_password_task(verify_and_update_password, password, user.password)
+        if not valid:
+            return None
+        if new_hash:
+            try:
+                await AsyncUserDao.update_password(self.session, user.id, new_hash)
+                await self.session.commit()
+            except SQLAlchemyError as e:
+                await self.session.rollback()
+                print(f"Erreur mise à niveau du hachage: {e}")
+        return user
+
+    async def change_password(self, user_id: int, current_password: str, new_password: str) -> bool:
+        try:
+            user = await AsyncUserDao.get_by_id(self.session, user_id)
+            await self.session.commit()
+            if not user:
+                return False
+            if not await arun_password_task(verify_password, current_password, user.password):
+                return False
+            new_hash = await arun_password_task(get_password_hash, new_password)
+            await AsyncUserDao.update_password(self.session, user_id, new_hash)
+            await self.session.commit()
+            invalidate_user_tokens(user_id)
+            metadata_cache.invalidate_user(user_id)
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            print(f"Erreur changement de mot de passe: {e}")
+            return False
+
+
+class AsyncAccountService(AsyncBaseService):
+    async def create_account(self, account_request: AccountRequest) -> Optional[Account]:
+        if account_request.account_number and not is_valid_account_number(account_request.account_number):
+            raise ValueError("INVALID_ACCOUNT_NUMBER")
+        try:
+            # La réservation d'un bloc (une fois par bloc) passe par l'engine synchrone
+            acc_num = account_request.account_number or await run_in_threadpool(account_number_allocator.next_number)
+            account = Account(
+                user_id=account_request.user_id,
+                account_number=acc_num,
+                account_type=account_request.account_type,
+                balance=0.0,
+                overdraft_limit=account_request.overdraft_limit,
+                interest_rate=account_request.interest_rate
+            )
+            account = await AsyncAccountDao.create_account(self.session, account)
+            metadata_cache.invalidate_account(account.id, account.account_number)
+            return account
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            print(f"Erreur création compte: {e}")
+            return None
+
+    async def get_account_by_id(self, account_id: int) -> Optional[Account]:
+        with self._read_only():
+            return await AsyncAccountDao.get_by_id(self.session, account_id)
+
+    async def get_account_info(self, account_id: int) -> Optional[AccountInfo]:
+        with self._read_only():
+            return await metadata_cache.aget_account(self.session, account_id)
+
+    async def get_accounts_by_user(self, user_id: int) -> List[Dict]:
+        with self._read_only():
+            return [dict(row._mapping) for row in await AsyncAccountDao.get_rows_by_user_id(self.session, user_id)]
+
+    async def delete_account(self, account_id: int) -> bool:
+        try:
+            account = await AsyncAccountDao.get_by_id(self.session, account_id)
+            if not account:
+                return False
+            account_number = account.account_number
+            await self._purge_transactions([account_id])
+            deleted = await AsyncAccountDao.delete_account(self.session, account_id)
+            if deleted:
+                metadata_cache.invalidate_account(account_id, account_number)
+            return deleted
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            print(f"Erreur suppression compte: {e}")
+            return False
+
+    @count_operation("deposit")
+    async def deposit(self, account_id: int, amount: float) -> bool:
+        if amount <= 0:
+            return False
+
+        async def unit(session: AsyncSession) -> bool:
+            if not await AsyncAccountDao.credit(session, account_id, amount):
+                await session.rollback()
+                return False
+            transaction = AsyncTransactionDao.create_transaction(session, Transaction(
+                account_id=account_id,
+                transaction_type='deposit',
+                amount=amount,
+                description=f'Deposit of {amount}'
+            ))
+            await arecord_transactions(session, transaction)
+            await session.commit()
+            return True
+
+        try:
+            return await self._run_with_retry(unit)
+        except SQLAlchemyError as e:
+            print(f"Erreur dépôt: {e}")
+            return False
+
+    @count_operation("withdraw")
+    async def withdraw(self, account_id: int, amount: float) -> bool:
+        if amount <= 0:
+            return False
+
+        async def unit(session: AsyncSession) -> bool:
+            if not await AsyncAccountDao.debit(session, account_id, amount):
+                await session.rollback()
+                return False
+            transaction = AsyncTransactionDao.create_transaction(session, Transaction(
+                account_id=account_id,
+                transaction_type='withdraw',
+                amount=-amount,
+                description=f'Withdrawal of {amount}'
+            ))
+            await arecord_transactions(session, transaction)
+            await session.commit()
+            return True
+
+        try:
+            return await self._run_with_retry(unit)
+        except SQLAlchemyError as e:
+            print(f"Erreur retrait: {e}")
+            return False
+
+    @count_operation("transfer")
+    async def transfer(self, from_account_id: int, to_account_number: str, amount: float) -> bool:
+        if amount <= 0 or not is_valid_account_number(to_account_number):
+            return False
+
+        async def unit(session: AsyncSession) -> bool:
+            from_account = await metadata_cache.aget_account(session, from_account_id)
+            to_account = await metadata_cache.aget_account_by_number(session, to_account_number)
+            if not from_account or not to_account:
+                return False
+            if from_account.id == to_account.id:
+                return False
+            from_number = from_account.account_number
+            to_id = to_account.id
+            # Même ordre de verrouillage que AccountService.transfer
+            if from_account_id < to_id:
+                applied = (await AsyncAccountDao.debit(session, from_account_id, amount)
+                           and await AsyncAccountDao.credit(session, to_id, amount))
+            else:
+                applied = (await AsyncAccountDao.credit(session, to_id, amount)
+                           and await AsyncAccountDao.debit(session, from_account_id, amount))
+            if not applied:
+                await session.rollback()
+                return False
+            transactions = [
+                Transaction(
+                    account_id=from_account_id,
+                    transaction_type='transfer',
+                    amount=-amount,
+                    description=f'Transfer to account {to_account_number}'
+                ),
+                Transaction(
+                    account_id=to_id,
+                    transaction_type='transfer',
+                    amount=amount,
+                    description=f'Transfer from account {from_number}'
+                ),
+            ]
+            session.add_all(transactions)
+            await arecord_transactions(session, *transactions)
+            await session.commit()
+            return True
+
+        try:
+            return await self._run_with_retry(unit)
+        except SQLAlchemyError as e:
+            print(f"Erreur transfert: {e}")
+            return False
+
+    @count_operation("batch_transfer")
+    async def batch_transfer(self, from_account_id: int, batch: BatchTransferRequest) -> Optional[BatchTransferResponse]:
+        async def unit(session: AsyncSession) -> Optional[BatchTransferResponse]:
+            from_account = await metadata_cache.aget_account(session, from_account_id)
+            if not from_account:
+                return None
+            from_number = from_account.account_number
+            destinations = await AsyncAccountDao.get_ids_by_account_numbers(
+                session, {item.to_account_number for item in batch.transfers if is_valid_account_number(item.to_account_number)}
+            )
+            available = None
+            if not batch.atomic:
+                funds = await AsyncAccountDao.lock_funds(session, from_account_id)
+                if funds is None:
+                    # Compte source supprimé depuis sa lecture (cache de métadonnées)
+                    await session.rollback()
+                    return reject_batch(batch, "ACCOUNT_NOT_FOUND")
+                balance, overdraft_limit = funds
+                available = balance + overdraft_limit
+            rejections, credits, rows, total = plan_batch_transfer(
+                batch, from_account_id, from_number, destinations, available
+            )
+            if batch.atomic and rejections:
+                await session.rollback()
+                return batch_response(batch, rejections, total, "BATCH_REJECTED")
+            if total > 0:
+                credits_before, credits_after = split_credits(credits, from_account_id)
+                await AsyncAccountDao.bulk_credit(session, credits_before)
+                if not await AsyncAccountDao.debit(session, from_account_id, total):
+                    await session.rollback()
+                    return batch_response(batch, rejections, total, "INSUFFICIENT_FUNDS")
+                await AsyncAccountDao.bulk_credit(session, credits_after)
+                await ainsert_movements(session, rows)
+            await session.commit()
+            return batch_response(batch, rejections, total)
+
+        try:
+            return await self._run_with_retry(unit)
+        except SQLAlchemyError as e:
+            print(f"Erreur lot de virements: {e}")
+            return None
+
+
+class AsyncTransactionService(AsyncBaseService):
+    async def get_transaction_with_owner(self, transaction_id: int) -> Optional[Tuple[Transaction, int]]:
+        with self._read_only():
+            return await AsyncTransactionDao.get_with_owner(self.session, transaction_id)
+
+    async def get_transactions_page(
+        self,
+        account_id: int,
+        filters: TransactionFilter,
+        limit: int,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str], Optional[str]]:
+        if before and after:
+            raise ValueError("INVALID_CURSOR")
+        before_key = decode_cursor(before) if before else None
+        after_key = decode_cursor(after) if after else None
+        with self._read_only():
+            horizon = archive_horizon(filters.start_date)
+            if horizon is None:
+                rows = await AsyncTransactionDao.get_page(self.session, account_id, filters, limit, before_key, after_key)
+            elif after_key is None:
+                hot_filters = filters.copy(update={"start_date": horizon})
+                rows = await AsyncTransactionDao.get_page(self.session, account_id, hot_filters, limit, before_key)
+                if len(rows) <= limit:
+                    rows += await run_in_threadpool(archived_page, account_id, filters, limit + 1 - len(rows), before_key)
+            else:
+                rows = await run_in_threadpool(archived_page, account_id, filters, limit + 1, None, after_key)
+                if len(rows) <= limit:
+                    hot_filters = filters.copy(update={"start_date": horizon})
+                    rows += await AsyncTransactionDao.get_page(self.session, account_id, hot_filters, limit, after=after_key)
+        items, next_cursor, prev_cursor = build_page(rows, limit, lambda t: (t.created_at, t.id), before, after)
+        return [row._asdict() for row in items], next_cursor, prev_cursor
+
+    async def iter_statement(
+        self,
+        account_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        chunk_size: int = STATEMENT_CHUNK_SIZE,
+    ) -> AsyncIterator[List[Dict]]:
+        with self._read_only():
+            balance = await aopening_balance(self.session, account_id, start_date) or 0.0
+            horizon = archive_horizon(start_date)
+            if horizon is not None:
+                for month in archived_months(start_date, end_date):
+                    rows = await run_in_threadpool(archived_statement_rows, month, account_id, start_date, end_date)
+                    for offset in range(0, len(rows), chunk_size):
+                        lines = []
+                        for row in rows[offset:offset + chunk_size]:
+                            balance += row.amount
+                            lines.append(statement_line(row, balance))
+                        yield lines
+                start_date = horizon
+            async for chunk in AsyncTransactionDao.iter_statement_chunks(self.session, account_id, start_date, end_date, chunk_size):
+                lines = []
+                for row in chunk:
+                    balance += row.amount
+                    lines.append(statement_line(row, balance))
+                yield lines
+
+
+class AsyncBalanceService(AsyncBaseService):
+    async def _balance_at(self, account_id: int, at: datetime) -> Optional[float]:
+        snapshot = await AsyncBalanceSnapshotDao.get_latest_before(self.session, account_id, at.date())
+        if snapshot:
+            day, balance = snapshot
+            return balance + await asum_movements(self.session, account_id, day_start(day + timedelta(days=1)), at)
+        return await aopening_balance(self.session, account_id, at)
+
+    async def get_balance_at(self, account_id: int, at: datetime) -> Optional[float]:
+        with self._read_only():
+            balance = await self._balance_at(account_id, at)
+        return round(balance, 2) if balance is not None else None
+
+    async def get_balance_history(self, account_id: int, start_day: date, end_day: date) -> List[Tuple[date, float]]:
+        with self._read_only():
+            opening = await self._balance_at(account_id, day_start(start_day)) or 0.0
+            position = await AsyncJobCheckpointDao.get(self.session, SNAPSHOT_JOB)
+            watermark = date.fromisoformat(position) if position else None
+            snapshots = {}
+            tail_from = start_day
+            if watermark and watermark >= start_day:
+                snapshots = await AsyncBalanceSnapshotDao.get_range(self.session, account_id, start_day, min(end_day, watermark))
+                tail_from = watermark + timedelta(days=1)
+            tail_sums = {}
+            if tail_from <= end_day:
+                rows = await AsyncTransactionDao.get_daily_sums(
+                    self.session, day_start(tail_from), day_start(end_day + timedelta(days=1)), account_id
+                )
+                tail_sums = {day: amount for _, day, amount in rows}
+        return daily_balances(start_day, end_day, opening, snapshots, tail_sums)
+
+
+class AsyncAnalyticsService(AsyncBaseService):
+    async def get_account_analytics(self, account_id: int, now: Optional[datetime] = None) -> List[MonthlyAnalytics]:
+        current = month_start((now or datetime.now()) - SNAPSHOT_GRACE)
+        rows = await AsyncMonthlyRollupDao.get_all(self.session, account_id)
+        start = next_month(rows[-1]["month"]) if rows else None
+        if start is None or start < current:
+            closed = await AsyncTransactionDao.get_monthly_aggregates(
+                self.session, account_id, day_start(start) if start else None, day_start(current)
+            )
+            if closed:
+                try:
+                    await AsyncMonthlyRollupDao.bulk_insert(self.session, account_id, closed)
+                    await self.session.commit()
+                except IntegrityError:
+                    await self.session.rollback()
+                rows += closed
+        rows += await AsyncTransactionDao.get_monthly_aggregates(self.session, account_id, day_start(current), None)
+        return monthly_analytics(rows)
+
+
+class AsyncEventService(AsyncBaseService):
+    async def get_events(self, after: int, limit: int) -> EventPage:
+        with self._read_only():
+            rows = await AsyncEventDao.get_after(self.session, after, limit)
+        items = [EventResponse.from_orm(row) for row in rows]
+        return EventPage(items=items, next_cursor=items[-1].seq if items else after)
@@ -0,0 +1,26 @@
+"""
+Job des soldes de fin de journée (t_balance_snapshots), à lancer chaque nuit après minuit.
+Seuls les jours postérieurs au point de reprise (t_job_checkpoints) sont traités.
+
+Usage : python snapshot_balances.py [--through AAAA-MM-JJ] [--chunk-days N]
+"""
+import argparse
+import sys
+from datetime import date
+from services import BalanceService, SNAPSHOT_CHUNK_DAYS
+
+def main():
+    parser = argparse.ArgumentParser(description="Instantanés des soldes de fin de journée")
+    parser.add_argument("--through", type=date.fromisoformat, help="dernier jour à traiter (défaut : la veille)")
+    parser.add_argument("--chunk-days", type=int, default=SNAPSHOT_CHUNK_DAYS, help="jours validés par transaction")
+    args = parser.parse_args()
+    try:
+        days = BalanceService().build_snapshots(args.through, args.chunk_days)
+        print(f"✅ {days} jour(s) traité(s)")
+    except Exception as e:
+        print(f"❌ Erreur instantanés des soldes: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import date, datetime
+from sqlalchemy import func, select
+from archive import transaction_archive
+from archive_transactions import archive_transactions, main
+from config import AsyncLocalSession, LocalSession
+from dal import TransactionDao
+from dto import TransactionFilter
+from entities import Transaction
+from pagination import encode_cursor
+from services import AccountService, AnalyticsService, BalanceService, TransactionService, monthly_analytics
+from services_async import AsyncTransactionService
+
+# Données de 2024 ; gardés en base : octobre à décembre (3 mois clos au 1er janvier 2025)
+TODAY = date(2025, 1, 1)
+EVERYTHING = TransactionFilter()
+
+
+def walk(account_id: int, limit: int = 200) -> tuple:
+    service, newest_first, cursor = TransactionService(), [], None
+    while True:
+        items, cursor, _ = service.get_transactions_page(account_id, EVERYTHING, limit, before=cursor)
+        newest_first += items
+        if cursor is None:
+            break
+    oldest_first, cursor = [], encode_cursor(newest_first[-1]["created_at"], newest_first[-1]["id"])
+    while cursor:
+        items, _, cursor = service.get_transactions_page(account_id, EVERYTHING, limit, after=cursor)
+        oldest_first += items[::-1]
+    return newest_first, oldest_first
+
+
+def observe(account_id: int, archived: bool) -> dict:
+    service = TransactionService()
+    filtered = TransactionFilter(
+        transaction_types=["withdraw"], start_date=datetime(2024, 3, 10), end_date=datetime(2024, 11, 20, 12),
+        max_amount=0.0,
+    )
+    if archived:
+        analytics = AnalyticsService().get_account_analytics(account_id)
+    else:
+        # Calcul direct : les agrégats des mois clos sont écrits par le job d'archivage
+        with LocalSession() as session:
+            analytics = monthly_analytics(TransactionDao.get_monthly_aggregates(session, account_id, None, None))
+    return {
+        "pages": walk(account_id),
+        "filtered": service.get_transactions_page(account_id, filtered, 50)[0],
+        "statement": [line for chunk in service.iter_statement(account_id) for line in chunk],
+        "statement_range": [
+            line for chunk in service.iter_statement(account_id, datetime(2024, 3, 15, 8), datetime(2024, 11, 2))
+            for line in chunk
+        ],
+        "balance_at": [BalanceService().get_balance_at(account_id, datetime(2024, month, 15, 12, 30))
+                       for month in range(1, 13)],
+        "history": BalanceService().get_balance_history(account_id, date(2024, 9, 25), date(2024, 10, 5)),
+        "analytics": [month.dict() for month in analytics],
+    }
+
+
+def seed_accounts(seed_user, seed_transactions) -> list:
+    accounts = []
+    for index, count in enumerate((3000, 400, 400)):
+        _, account_id, _ = seed_user(email=f"archive-{index}@example.com")
+        seed_transactions(account_id, count)
+        accounts.append(account_id)
+    BalanceService().build_snapshots(date(2024, 12, 31))
+    return accounts
+
+
+def test_reads_are_identical_after_archiving(seed_user, seed_transactions):
+    accounts = seed_accounts(seed_user, seed_transactions)
+    before = {account_id: observe(account_id, False) for account_id in accounts}
+    months = archive_transactions(keep_months=3, today=TODAY)
+    assert months and months[-1] == date(2024, 9, 1)
+    with LocalSession() as session:
+        oldest = session.execute(select(func.min(Transaction.created_at)).where(Transaction.account_id.in_(accounts))).scalar()
+    assert oldest >= datetime(2024, 10, 1)
+    for account_id in accounts:
+        assert observe(account_id, True) == before[account_id], account_id
+
+    async def async_statement(account_id: int) -> list:
+        async with AsyncLocalSession() as session:
+            service = AsyncTransactionService(session)
+            return [line async for chunk in service.iter_statement(account_id) for line in chunk]
+
+    assert asyncio.run(async_statement(accounts[0])) == before[accounts[0]]["statement"]
+
+
+def test_recent_history_does_not_open_the_archive(seed_user, seed_transactions, monkeypatch):
+    accounts = seed_accounts(seed_user, seed_transactions)
+    archive_transactions(keep_months=3, today=TODAY)
+    reads = []
+    monkeypatch.setattr(transaction_archive, "account_rows", lambda *args: reads.append(args))
+    items, _, _ = TransactionService().get_transactions_page(accounts[0], EVERYTHING, 50)
+    assert items and not reads
+
+
+def test_deleted_account_archive_is_not_served(seed_user, seed_transactions):
+    accounts = seed_accounts(seed_user, seed_transactions)
+    months = archive_transactions(keep_months=3, today=TODAY)
+    gone, kept = accounts[1], accounts[2]
+    assert AccountService().delete_account(gone)
+    assert all(transaction_archive.account_rows(month, gone) == () for month in months)
+    assert transaction_archive.sum_amounts(gone, None, None) == 0
+    assert sum(len(transaction_archive.account_rows(month, kept)) for month in months) > 0
+
+
+def test_archiving_requires_an_absolute_archive_dir(seed_user, seed_transactions, monkeypatch):
+    accounts = seed_accounts(seed_user, seed_transactions)
+    with LocalSession() as session:
+        rows = session.execute(select(func.count()).select_from(Transaction)).scalar()
+    monkeypatch.setattr("sys.argv", ["archive_transactions.py", "--months", "3"])
+    for directory in ("", "archive"):
+        monkeypatch.setattr(transaction_archive, "directory", directory)
+        assert main() == 1
+        # Aucune ligne supprimée, et sans archive tout l'historique reste lu en base
+        with LocalSession() as session:
+            assert session.execute(select(func.count()).select_from(Transaction)).scalar() == rows
+    monkeypatch.setattr(transaction_archive, "directory", "")
+    assert transaction_archive.horizon() is None
+    assert len(walk(accounts[1])[0]) == 401
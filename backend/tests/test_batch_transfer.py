@@ -0,0 +1,51 @@
+from sqlalchemy import delete
+from config import LocalSession
+from dto import BatchTransferItem, BatchTransferRequest
+from entities import Account
+from services import AccountService
+from tests.test_ledger import assert_balanced, ledger
+
+
+def test_non_atomic_batch_applies_valid_transfers_only(seed_user):
+    _, source, _ = seed_user(email="batch@example.com", balance=100.0)
+    targets = [seed_user(email=f"batch{i}@example.com", balance=0.0)[2] for i in range(3)]
+    before = sum(pair[0] for pair in ledger().values())
+    batch = BatchTransferRequest(atomic=False, transfers=[
+        BatchTransferItem(to_account_number=targets[0], amount=30.0),
+        BatchTransferItem(to_account_number="0000000000", amount=10.0),
+        BatchTransferItem(to_account_number=targets[1], amount=-1.0),
+        BatchTransferItem(to_account_number=targets[2], amount=20.0),
+    ])
+    result = AccountService().batch_transfer(source, batch)
+    assert (result.accepted, result.rejected, result.total_amount) == (2, 2, 50.0)
+    assert [rejection.index for rejection in result.rejections] == [1, 2]
+    assert_balanced()
+    assert sum(pair[0] for pair in ledger().values()) == before
+
+
+def test_atomic_batch_is_all_or_nothing(seed_user):
+    _, source, _ = seed_user(email="batch@example.com", balance=100.0)
+    targets = [seed_user(email=f"batch{i}@example.com", balance=0.0)[2] for i in range(2)]
+    before = ledger()
+    batch = BatchTransferRequest(transfers=[
+        BatchTransferItem(to_account_number=targets[0], amount=10.0),
+        BatchTransferItem(to_account_number=targets[1], amount=1000.0),
+    ])
+    result = AccountService().batch_transfer(source, batch)
+    assert result.accepted == 0 and result.error
+    assert ledger() == before
+
+
+def test_batch_from_missing_account_is_rejected(seed_user):
+    _, source, target_number = seed_user()
+    batch = BatchTransferRequest(atomic=False, transfers=[BatchTransferItem(to_account_number=target_number, amount=5.0)])
+    assert AccountService().batch_transfer(10_000, batch) is None
+    # Compte encore dans le cache de métadonnées mais supprimé en base (autre worker)
+    assert AccountService().get_account_info(source)
+    with LocalSession() as session:
+        session.execute(delete(Account).where(Account.id == source))
+        session.commit()
+    result = AccountService().batch_transfer(source, batch)
+    assert result.error == "ACCOUNT_NOT_FOUND"
+    assert [rejection.reason for rejection in result.rejections] == ["ACCOUNT_NOT_FOUND"]
+    assert_balanced()
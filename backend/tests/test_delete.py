@@ -0,0 +1,73 @@
+import os
+import time
+import tracemalloc
+from datetime import date
+from sqlalchemy import event, func, insert, select
+from config import LocalSession
+from entities import Account, BalanceSnapshot, MonthlyRollup, Transaction
+from services import AccountService, UserService, DELETE_CHUNK_SIZE
+
+# Taille de l'historique supprimé (DELETE_TEST_ROWS=1000000 pour le cas d'un client de longue date)
+DELETE_TEST_ROWS = int(os.getenv("DELETE_TEST_ROWS", "200000"))
+# Budgets : temps proportionnel à l'historique, mémoire et verrous bornés par un lot
+DELETE_MICROSECONDS_PER_ROW = 100
+DELETE_MAX_PEAK_MB = 16
+DELETE_MAX_WRITE_SECONDS = 2.0
+
+
+def remaining(account_id: int) -> tuple:
+    """(transactions, soldes, agrégats, compte présent) restant en base pour account_id."""
+    with LocalSession() as session:
+        return tuple(
+            session.execute(select(func.count()).select_from(entity).where(entity.account_id == account_id)).scalar()
+            for entity in (Transaction, BalanceSnapshot, MonthlyRollup)
+        ) + (session.get(Account, account_id) is not None,)
+
+
+def add_history(account_id: int) -> None:
+    with LocalSession() as session:
+        session.execute(insert(BalanceSnapshot), [{"account_id": account_id, "day": date(2024, 1, 1), "balance": 1.0}])
+        session.execute(insert(MonthlyRollup), [{
+            "account_id": account_id, "month": date(2024, 1, 1), "transaction_type": "deposit", "count": 1,
+            "total": 1.0, "credits": 1.0, "debits": 0.0, "min_amount": 1.0, "max_amount": 1.0,
+        }])
+        session.commit()
+
+
+def test_deleting_a_large_account_is_chunked_and_bounded(database, seed_user, seed_transactions):
+    _, account_id, _ = seed_user()
+    seed_transactions(account_id, DELETE_TEST_ROWS)
+    add_history(account_id)
+    # Durée de chaque transaction d'écriture : le temps pendant lequel les verrous sont tenus
+    writes = []
+    on_begin = lambda conn: conn.info.__setitem__("began", time.perf_counter())
+    on_commit = lambda conn: writes.append(time.perf_counter() - conn.info["began"])
+    event.listen(database, "begin", on_begin)
+    event.listen(database, "commit", on_commit)
+    # Pic du tas Python (le RSS compterait aussi le cache de la base)
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        assert AccountService().delete_account(account_id)
+        elapsed = time.perf_counter() - started
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+        event.remove(database, "begin", on_begin)
+        event.remove(database, "commit", on_commit)
+
+    assert remaining(account_id) == (0, 0, 0, False)
+    assert elapsed < 5 + DELETE_TEST_ROWS * DELETE_MICROSECONDS_PER_ROW / 1e6
+    assert peak_mb < DELETE_MAX_PEAK_MB
+    assert len(writes) > DELETE_TEST_ROWS // DELETE_CHUNK_SIZE
+    assert max(writes) < DELETE_MAX_WRITE_SECONDS
+
+
+def test_deleting_a_user_removes_accounts_and_history(seed_user, seed_transactions):
+    user_id, account_id, _ = seed_user(email="delete-user@example.com")
+    seed_transactions(account_id, DELETE_CHUNK_SIZE * 2 + 1)
+    add_history(account_id)
+    assert UserService().delete_user("delete-user@example.com")
+    assert remaining(account_id) == (0, 0, 0, False)
+    with LocalSession() as session:
+        assert not session.execute(select(func.count()).select_from(Account).where(Account.user_id == user_id)).scalar()
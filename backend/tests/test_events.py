@@ -0,0 +1,114 @@
+import asyncio
+from contextlib import contextmanager
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.engine import Engine
+from config import AsyncLocalSession, LocalSession
+from dto import BatchTransferItem, BatchTransferRequest
+from entities import Event, Transaction
+from services import AccountService, EventService
+from services_async import AsyncAccountService, AsyncEventService
+
+
+def add_event(event_id: int, amount: float) -> None:
+    with LocalSession() as session:
+        session.execute(insert(Event), [{"id": event_id, "account_id": 1, "transaction_type": "deposit", "amount": amount}])
+        session.commit()
+
+
+def read(after: int = 0):
+    """Passe du séquenceur (pas démarré dans les tests), puis lecture du flux."""
+    EventService().sequence_pending()
+    return EventService().get_events(after, 1000)
+
+
+def linked_movements(page) -> list:
+    """(type, montant) de chaque événement, vérifié contre sa ligne de t_transactions."""
+    with LocalSession() as session:
+        transactions = {t.id: t for t in session.execute(select(Transaction)).scalars()}
+    movements = []
+    for item in page.items:
+        transaction = transactions[item.transaction_id]
+        assert (transaction.account_id, transaction.transaction_type, transaction.amount) == (
+            item.account_id, item.transaction_type, item.amount,
+        )
+        movements.append((item.transaction_type, item.amount))
+    return movements
+
+
+@contextmanager
+def statements():
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement.lstrip().split(None, 1)[0].upper())
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        yield executed
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+
+
+def test_feed_follows_movements(seed_user):
+    _, source, target_number = seed_user()
+    cursor = read().next_cursor
+    assert AccountService().deposit(source, 5.0)
+    # Retrait refusé : aucun événement ; virement : ses deux mouvements
+    assert not AccountService().withdraw(source, 1_000_000.0)
+    assert AccountService().transfer(source, target_number, 1.0)
+    page = read(cursor)
+    assert linked_movements(page) == [("deposit", 5.0), ("transfer", -1.0), ("transfer", 1.0)]
+    assert [item.seq for item in page.items] == sorted(item.seq for item in page.items)
+    assert read(page.next_cursor).items == []
+
+
+def test_bulk_movements_are_linked_to_their_transactions(seed_user):
+    _, source, _ = seed_user(email="batch@example.com", balance=100.0)
+    targets = [seed_user(email=f"batch{i}@example.com", balance=0.0)[2] for i in range(2)]
+    cursor = read().next_cursor
+    batch = BatchTransferRequest(atomic=False, transfers=[
+        BatchTransferItem(to_account_number=targets[0], amount=30.0),
+        BatchTransferItem(to_account_number=targets[1], amount=20.0),
+    ])
+    assert AccountService().batch_transfer(source, batch).accepted == 2
+
+    async def run():
+        async with AsyncLocalSession() as session:
+            service = AsyncAccountService(session)
+            assert await service.deposit(source, 7.0)
+            assert (await service.batch_transfer(source, batch)).accepted == 2
+
+    asyncio.run(run())
+    transfers = [("transfer", -30.0), ("transfer", 30.0), ("transfer", -20.0), ("transfer", 20.0)]
+    assert sorted(linked_movements(read(cursor))) == sorted(transfers + [("deposit", 7.0)] + transfers)
+
+
+def test_reading_the_feed_writes_nothing(seed_user):
+    _, source, _ = seed_user()
+    assert AccountService().deposit(source, 5.0)
+
+    async def read_async():
+        async with AsyncLocalSession() as session:
+            return await AsyncEventService(session).get_events(0, 100)
+
+    # Événement validé mais pas encore numéroté : les lectures ne le numérotent pas
+    with statements() as executed:
+        assert EventService().get_events(0, 100).items == []
+        assert asyncio.run(read_async()).items == []
+    assert not {"INSERT", "UPDATE", "DELETE"} & set(executed)
+    assert [item.amount for item in read().items] == [5.0]
+
+
+def test_late_commit_is_delivered_after_the_cursor(seed_user):
+    seed_user()
+    cursor = read().next_cursor
+    with LocalSession() as session:
+        last = session.execute(select(func.max(Event.id))).scalar() or 0
+    # last + 1, attribué avant last + 2, n'est validé qu'après la livraison de last + 2
+    add_event(last + 2, 1.0)
+    first = read(cursor)
+    add_event(last + 1, 2.0)
+    late = read(first.next_cursor)
+    assert [item.id for item in first.items] == [last + 2]
+    assert [item.id for item in late.items] == [last + 1]
+    assert late.items[0].seq > first.next_cursor
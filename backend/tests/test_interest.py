@@ -0,0 +1,56 @@
+from datetime import date, datetime
+import pytest
+from sqlalchemy import func, select, update
+from accrue_interest import accrue_interest
+from config import LocalSession
+from entities import Account, Event, Transaction
+from services import BalanceService
+from tests.test_ledger import assert_balanced
+
+
+@pytest.fixture
+def saver(seed_user):
+    _, account_id, _ = seed_user(balance=1000.0)
+    with LocalSession() as session:
+        session.execute(update(Account).where(Account.id == account_id).values(interest_rate=3.65))
+        session.commit()
+    return account_id
+
+
+def interest_rows() -> list:
+    with LocalSession() as session:
+        return session.execute(
+            select(Transaction.amount, Transaction.created_at).where(Transaction.transaction_type == "interest")
+            .order_by(Transaction.id)
+        ).all()
+
+
+def test_interest_is_credited_once_per_date(saver):
+    first = accrue_interest(date(2025, 3, 10))
+    again = accrue_interest(date(2025, 3, 10))
+    assert first["total"] == again["total"] == 0.1
+    with pytest.raises(ValueError):
+        accrue_interest(date(2025, 3, 9))
+    accrue_interest(date(2025, 3, 11))
+    with LocalSession() as session:
+        events = session.execute(
+            select(func.count()).select_from(Event).where(Event.transaction_type == "interest")
+        ).scalar()
+    assert len(interest_rows()) == events == 2
+    assert_balanced()
+
+
+def test_catch_up_run_is_dated_on_its_value_date(saver):
+    accrue_interest(date(2025, 3, 10))
+    assert interest_rows() == [(0.1, datetime(2025, 3, 10, 23, 59, 59))]
+    # Le solde du 10 au soir inclut les intérêts, pas celui du matin
+    assert BalanceService().get_balance_at(saver, datetime(2025, 3, 11)) - \
+        BalanceService().get_balance_at(saver, datetime(2025, 3, 10, 12)) == pytest.approx(0.1)
+
+
+def test_day_with_snapshots_is_refused(saver, seed_transactions):
+    seed_transactions(saver, 10)
+    assert BalanceService().build_snapshots(date(2025, 3, 10))
+    with pytest.raises(ValueError, match="Instantanés"):
+        accrue_interest(date(2025, 3, 10))
+    assert interest_rows() == []
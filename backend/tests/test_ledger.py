@@ -0,0 +1,68 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func, select
+from config import AsyncLocalSession, LocalSession
+from entities import Account, Transaction
+from services import AccountService
+from services_async import AsyncAccountService
+
+
+def ledger() -> dict:
+    """{account_id: (solde, somme des transactions)} de tous les comptes."""
+    with LocalSession() as session:
+        balances = dict(session.execute(select(Account.id, Account.balance)).all())
+        sums = dict(session.execute(
+            select(Transaction.account_id, func.sum(Transaction.amount)).group_by(Transaction.account_id)
+        ).all())
+    return {account_id: (round(balance, 2), round(sums.get(account_id) or 0.0, 2)) for account_id, balance in balances.items()}
+
+
+def assert_balanced() -> None:
+    unbalanced = {account_id: pair for account_id, pair in ledger().items() if pair[0] != pair[1]}
+    assert not unbalanced, f"solde différent de la somme des transactions : {unbalanced}"
+
+
+def account_id_of(number: str) -> int:
+    with LocalSession() as session:
+        return session.execute(select(Account.id).where(Account.account_number == number)).scalar_one()
+
+
+def test_movements_keep_balances_equal_to_history(seed_user):
+    service = AccountService()
+    _, source, target_number = seed_user(balance=1000.0)
+    target = account_id_of(target_number)
+    assert service.deposit(source, 250.0)
+    assert service.withdraw(source, 100.0)
+    assert service.transfer(source, target_number, 300.0)
+    # Refusés : rien n'est écrit
+    assert not service.withdraw(source, 1_000_000.0)
+    assert not service.transfer(source, target_number, 1_000_000.0)
+    assert not service.deposit(source, -5.0)
+    assert_balanced()
+    balances = {account_id: pair[0] for account_id, pair in ledger().items()}
+    assert balances[source] == 850.0 and balances[target] == 300.0
+
+
+def test_async_movements_keep_balances_equal_to_history(seed_user):
+    _, source, target_number = seed_user(balance=1000.0)
+
+    async def run():
+        async with AsyncLocalSession() as session:
+            service = AsyncAccountService(session)
+            assert await service.deposit(source, 250.0)
+            assert await service.withdraw(source, 100.0)
+            assert await service.transfer(source, target_number, 300.0)
+            assert not await service.withdraw(source, 1_000_000.0)
+
+    asyncio.run(run())
+    assert_balanced()
+
+
+def test_concurrent_withdrawals_never_overdraw(seed_user):
+    _, source, _ = seed_user(balance=100.0)
+    # 40 retraits de 5 en parallèle sur un solde de 100 : exactement 20 passent
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: AccountService().withdraw(source, 5.0), range(40)))
+    assert results.count(True) == 20
+    assert ledger()[source][0] == 0.0
+    assert_balanced()
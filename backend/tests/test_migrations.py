@@ -0,0 +1,71 @@
+import sys
+import pytest
+from sqlalchemy import inspect, text
+from config import Base
+import migrate
+
+
+def schema(engine) -> dict:
+    inspector = inspect(engine)
+    return {
+        table: (
+            sorted(column["name"] for column in inspector.get_columns(table)),
+            sorted((tuple(index["column_names"]), bool(index["unique"])) for index in inspector.get_indexes(table)),
+        )
+        for table in inspector.get_table_names()
+    }
+
+
+def test_migrations_build_the_create_all_schema(database):
+    expected = schema(database)
+    Base.metadata.drop_all(database)
+    applied = migrate.upgrade()
+    assert applied == [str(migration) for migration in migrate.available_migrations()]
+    assert schema(database) == expected
+    with database.connect() as connection:
+        assert migrate.pending_migrations(migrate.applied_versions(connection)) == []
+    # Rejouée sur une base à jour : rien à faire
+    assert migrate.upgrade() == []
+
+
+def test_interrupted_backfill_resumes(database):
+    if database.dialect.name != "sqlite":
+        pytest.skip("schéma historique écrit en DDL SQLite")
+    Base.metadata.drop_all(database)
+    with database.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE t_users (id INTEGER PRIMARY KEY AUTOINCREMENT, email VARCHAR(128) NOT NULL UNIQUE, "
+            "password VARCHAR(128) NOT NULL, is_admin BOOLEAN, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, "
+            "updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        connection.execute(text(
+            "CREATE TABLE t_accounts (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "user_id INTEGER NOT NULL REFERENCES t_users (id) ON DELETE CASCADE, account_type VARCHAR(20) NOT NULL, "
+            "balance FLOAT, overdraft_limit FLOAT, interest_rate FLOAT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        connection.execute(text("INSERT INTO t_users (email, password, is_admin) VALUES ('legacy@example.com', 'x', 0)"))
+        connection.execute(
+            text("INSERT INTO t_accounts (user_id, account_type, balance) VALUES (1, 'current', :balance)"),
+            [{"balance": float(index)} for index in range(250)],
+        )
+    # Démarrage de l'API : DDL appliqué, un seul lot de backfill, les migrations suivantes attendent
+    migrate.upgrade(backfills=False, batch_size=100)
+    with database.connect() as connection:
+        startup = migrate.applied_versions(connection)
+    assert startup.get(3) is False and 4 not in startup
+    migrate.upgrade(batch_size=100, duty_cycle=1.0)
+    with database.connect() as connection:
+        final = migrate.applied_versions(connection)
+        numbers = [number for (number,) in connection.execute(text("SELECT account_number FROM t_accounts"))]
+    assert len(final) == len(migrate.available_migrations()) and all(final.values())
+    assert len(set(numbers)) == 250 and None not in numbers
+
+
+def test_failed_migration_exits_non_zero(monkeypatch, capsys):
+    def broken(*args, **kwargs):
+        raise RuntimeError("base indisponible")
+
+    monkeypatch.setattr(migrate, "upgrade", broken)
+    monkeypatch.setattr(sys, "argv", ["migrate.py"])
+    assert migrate.main() == 1
+    assert "base indisponible" in capsys.readouterr().out
@@ -0,0 +1,56 @@
+import pytest
+from query_log import DEFAULT_QUERY_BUDGET, ROUTE_QUERY_BUDGETS, QueryBudgetExceeded
+from config import LocalSession
+from entities import Account, Transaction, User
+
+
+@pytest.fixture
+def seeded(seed_user, seed_transactions):
+    user_id, account_id, target_number = seed_user()
+    seed_transactions(account_id, 50)
+    with LocalSession() as session:
+        transaction_id = session.query(Transaction.id).filter_by(account_id=account_id).first()[0]
+    return user_id, account_id, target_number, transaction_id
+
+
+def route_calls(client, headers, seeded):
+    user_id, account_id, target_number, transaction_id = seeded
+    return [
+        ("/auth/me", lambda: client.get("/auth/me", headers=headers)),
+        ("/accounts/user/{user_id}", lambda: client.get(f"/accounts/user/{user_id}", headers=headers)),
+        ("/accounts/{account_id}", lambda: client.get(f"/accounts/{account_id}", headers=headers)),
+        ("/accounts/{account_id}/deposit",
+         lambda: client.post(f"/accounts/{account_id}/deposit", params={"amount": 1.0}, headers=headers)),
+        ("/accounts/{account_id}/withdraw",
+         lambda: client.post(f"/accounts/{account_id}/withdraw", params={"amount": 1.0}, headers=headers)),
+        ("/accounts/{account_id}/transfer",
+         lambda: client.post(f"/accounts/{account_id}/transfer",
+                             params={"to_account_number": target_number, "amount": 1.0}, headers=headers)),
+        ("/transactions/account/{account_id}", lambda: client.get(f"/transactions/account/{account_id}", headers=headers)),
+        ("/transactions/{transaction_id}", lambda: client.get(f"/transactions/{transaction_id}", headers=headers)),
+        ("/accounts/{account_id}/analytics", lambda: client.get(f"/accounts/{account_id}/analytics", headers=headers)),
+    ]
+
+
+def test_routes_stay_within_their_budget(client, auth_headers, seeded, query_budget):
+    for route, call in route_calls(client, auth_headers(seeded[0]), seeded):
+        budget = ROUTE_QUERY_BUDGETS.get(route, DEFAULT_QUERY_BUDGET)
+        # Deux appels : cache froid (jeton, métadonnées) puis chaud, même budget
+        for _ in range(2):
+            with query_budget(budget) as requests:
+                response = call()
+            assert response.status_code == 200, f"{route} : {response.text}"
+            assert len(requests) == 1
+
+
+def test_lazy_relationship_loop_is_reported(seeded, query_budget):
+    user_id = seeded[0]
+    with LocalSession() as session:
+        for i in range(5):
+            session.add(Account(user_id=user_id, account_number=f"3{i:09d}", account_type="savings"))
+        session.commit()
+    with pytest.raises(QueryBudgetExceeded, match="N\\+1"):
+        with query_budget(3):
+            with LocalSession() as session:
+                user = session.get(User, user_id)
+                sum(len(account.transactions) for account in user.accounts)
@@ -1,6 +1,6 @@
 import React, { useEffect, useState, useCallback } from 'react';
 import { useAuth } from '../context/AuthContext';
-import { accountAPI } from '../services/api';
+import { accountAPI, liveAPI } from '../services/api';
 import { toast } from 'react-toastify';
 import Accounts from './Accounts';
 import Transactions from './Transactions';
@@ -11,6 +11,8 @@ const Dashboard = () => {
   const [accounts, setAccounts] = useState([]);
   const [selectedAccount, setSelectedAccount] = useState(null);
   const [loading, setLoading] = useState(true);
+  // Compteur par compte des mouvements notifiés (resync : tous), qui recharge l'historique affiché
+  const [activity, setActivity] = useState({ all: 0 });
 
   const fetchAccounts = useCallback(async () => {
     if (!user) return;
@@ -38,6 +40,25 @@ const Dashboard = () => {
     fetchAccounts();
   }, [fetchAccounts]);
 
+  useEffect(() => {
+    if (!user) return undefined;
+    return liveAPI.connect({
+      onResync: () => {
+        fetchAccounts();
+        setActivity(prev => ({ ...prev, all: prev.all + 1 }));
+      },
+      onMessage: (message) => {
+        if (message.type === 'balance') {
+          const withBalance = a => (a.id === message.account_id ? { ...a, balance: message.balance } : a);
+          setAccounts(prev => prev.map(withBalance));
+          setSelectedAccount(prev => (prev ? withBalance(prev) : prev));
+        } else if (message.type === 'transaction') {
+          setActivity(prev => ({ ...prev, [message.account_id]: (prev[message.account_id] || 0) + 1 }));
+        }
+      },
+    });
+  }, [user, fetchAccounts]);
+
   if (loading) {
     return <div className="loading">Chargement...</div>;
   }
@@ -64,6 +85,7 @@ const Dashboard = () => {
             <Transactions
               account={selectedAccount}
               onRefresh={fetchAccounts}
+              activity={(activity[selectedAccount.id] || 0) + activity.all}
             />
           ) : (
             <div className="no-account">
@@ -5,7 +5,7 @@ import { useCurrency } from '../context/CurrencyContext';
 import { Download, Upload, ArrowLeftRight, History } from 'lucide-react';
 import './Transactions.css';
 
-const Transactions = ({ account, onRefresh }) => {
+const Transactions = ({ account, onRefresh, activity }) => {
   const [transactions, setTransactions] = useState([]);
   const [showDepositModal, setShowDepositModal] = useState(false);
   const [showWithdrawModal, setShowWithdrawModal] = useState(false);
@@ -21,19 +21,23 @@ const Transactions = ({ account, onRefresh }) => {
 
     try {
       const response = await transactionAPI.getAccountTransactions(account.id);
-      setTransactions(response.data);
+      setTransactions(response.data.items);
     } catch (error) {
       console.error('Erreur chargement transactions:', error);
     }
   }, [account?.id]);
 
+  // activity change à chaque mouvement notifié sur ce compte : l'historique n'est relu que dans ce cas
   useEffect(() => {
     fetchTransactions();
-  }, [fetchTransactions]);
+  }, [fetchTransactions, activity]);
 
-  useEffect(() => {
+  // Relecture explicite après chaque opération de l'utilisateur, même avec les notifications en direct :
+  // une opération traitée par un autre worker n'en produit aucune sur cette connexion
+  const refreshAfterOperation = () => {
+    onRefresh();
     fetchTransactions();
-  }, [fetchTransactions]);
+  };
 
   const handleDeposit = async (e) => {
     e.preventDefault();
@@ -42,8 +46,7 @@ const Transactions = ({ account, onRefresh }) => {
       toast.success('Dépôt effectué avec succès !');
       setShowDepositModal(false);
       setAmount('');
-      onRefresh();
-      fetchTransactions();
+      refreshAfterOperation();
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Erreur lors du dépôt');
     }
@@ -56,8 +59,7 @@ const Transactions = ({ account, onRefresh }) => {
       toast.success('Retrait effectué avec succès !');
       setShowWithdrawModal(false);
       setAmount('');
-      onRefresh();
-      fetchTransactions();
+      refreshAfterOperation();
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Erreur lors du retrait');
     }
@@ -71,8 +73,7 @@ const Transactions = ({ account, onRefresh }) => {
       setShowTransferModal(false);
       setAmount('');
       setToAccountNumber('');
-      onRefresh();
-      fetchTransactions();
+      refreshAfterOperation();
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Erreur lors du virement');
     }
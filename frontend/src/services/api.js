@@ -36,10 +36,55 @@ export const accountAPI = {
     deposit: (accountId, amount) => api.post(`/accounts/${accountId}/deposit?amount=${amount}`),
     withdraw: (accountId, amount) => api.post(`/accounts/${accountId}/withdraw?amount=${amount}`),
     transfer: (fromId, toNumber, amount) => api.post(`/accounts/${fromId}/transfer?to_account_number=${toNumber}&amount=${amount}`),
+    getAnalytics: (accountId) => api.get(`/accounts/${accountId}/analytics`),
 };
 
 export const transactionAPI = {
-    getAccountTransactions: (accountId) => api.get(`/transactions/account/${accountId}`),
+    getAccountTransactions: (accountId, params = {}) => api.get(`/transactions/account/${accountId}`, { params }),
+};
+
+// Notifications en direct (soldes et mouvements) : WebSocket authentifié par le premier message,
+// reconnexion avec délai croissant. onResync : des messages ont pu être perdus, tout relire.
+export const liveAPI = {
+    connect: ({ onMessage, onResync, onStatus = () => {} }) => {
+        let socket = null;
+        let retryDelay = 1000;
+        let retryTimer = null;
+        let closed = false;
+
+        const open = () => {
+            const token = localStorage.getItem('token');
+            if (!token || closed) return;
+            socket = new WebSocket(`${API_URL.replace(/^http/, 'ws')}/live/ws`);
+            socket.onopen = () => socket.send(JSON.stringify({ type: 'auth', token }));
+            socket.onmessage = (event) => {
+                const message = JSON.parse(event.data);
+                if (message.type === 'ready') {
+                    // Reconnexion : les mouvements de l'intervalle n'ont pas été reçus
+                    if (retryDelay > 1000) onResync();
+                    retryDelay = 1000;
+                    onStatus(true);
+                } else if (message.type === 'resync') {
+                    onResync();
+                } else {
+                    onMessage(message);
+                }
+            };
+            socket.onclose = () => {
+                onStatus(false);
+                if (closed) return;
+                retryTimer = setTimeout(open, retryDelay);
+                retryDelay = Math.min(retryDelay * 2, 30000);
+            };
+        };
+
+        open();
+        return () => {
+            closed = true;
+            clearTimeout(retryTimer);
+            if (socket) socket.close();
+        };
+    },
 };
 
 export default api;